@@ -33,9 +33,23 @@ class OpenSearchServerlessConfig:
     INDEX_NAME = f"{EnvSettings.RAG_PROJ_NAME}-kb-index"
 
 class RAGConfig:
+    RETRIEVER_BACKEND = "bedrock" # TODO: "bedrock" uses the deployed Knowledge Base, "local" uses an in-process index over data/kb-data (no AWS needed for retrieval)
+    LOCAL_INDEX_DIR = "data/output/local_index" # Persisted local index, rebuilt automatically when kb-data or the chunking settings change. None keeps it in memory
+    LOCAL_INDEX_DTYPE = "float32" # "float16" halves the size of the persisted embeddings
     MODEL_NAME = "llama3_8b_instruct"
     MODEL_ID = "meta.llama3-8b-instruct-v1:0"
     NUMBER_OF_RESULTS = 3  # TODO: You can try different context count for RAG
+    MAX_WORKERS = 1 # TODO: Number of test questions evaluated concurrently, 1 runs them one by one
+    STREAMING = False # Generate with converse_stream and record time-to-first-token, inter-token latency and output tokens/s
+    RETRIEVAL_CACHE_SIZE = 1024 # Number of retrieval results kept in memory, shared by RAG and Hybrid
+    RETRIEVAL_CACHE_DIR = "data/output/retrieval_cache" # Set to None to disable the on-disk cache, it is invalidated after each new ingestion job
+
+class BatchInferenceConfig:
+    ENABLED = False # TODO: Set to True to evaluate RAG with a Bedrock batch inference job instead of interactive converse calls
+    ROLE_ARN = "<<PLACEHOLDER>>" # TODO: Service role for model invocation jobs, needs read/write access to the bucket prefix below
+    S3_PREFIX = "batch-inference"
+    MAX_GEN_LEN = 2048
+    POLL_INTERVAL = 60 # Seconds between job status checks
 
 class FinetuningConfig:
     MODEL_NAME = "llama3_8b_instruct"
@@ -43,6 +57,53 @@ class FinetuningConfig:
     METHOD = "domain_adaptation" # TODO: Choose Finetuning method. eg:"domain_adaptation", "instruction_finetuning"
     INSTANCE = 'ml.g5.12xlarge'
     NUM_EPOCH = 8 # TODO: Adjust if needed, default is 8
+    MAX_WORKERS = 1 # TODO: Concurrent requests to the endpoint during evaluation, the TGI container batches them on the GPU
+    STREAMING = False # Stream endpoint responses and record time-to-first-token and decode tokens/s (finetuned and hybrid)
+    STOP_SEQUENCES = ["### Instruction:", "### Input:"] # Generation is cut as soon as one of these appears
+    EVALUATION_MODE = "endpoint" # TODO: "endpoint" deploys a real-time endpoint, "batch_transform" evaluates finetuned and hybrid with Batch Transform jobs
+    TRANSFORM_INSTANCE_COUNT = 1 # Batch Transform only
+    MAX_CONCURRENT_TRANSFORMS = 4 # Batch Transform only, concurrent requests per instance
+
+class HybridConfig:
+    PIPELINE = True # Prefetch contexts of upcoming questions while the endpoint generates, end-to-end time tends to max(retrieval, generation)
+    PIPELINE_QUEUE_DEPTH = 8 # Maximum number of retrieved contexts waiting for the endpoint
+    RETRIEVAL_WORKERS = 1 # TODO: Concurrent knowledge base retrievals
+    GENERATION_WORKERS = 1 # TODO: Concurrent endpoint requests, the TGI container batches them on the GPU
+    ROUTING = False # Route every question by its top retrieval score: no context, trimmed context or full context
+    NO_CONTEXT_SCORE_THRESHOLD = 0.5 # TODO: Top score below which the finetuned model gets no context
+    TRIM_SCORE_THRESHOLD = 0.75 # TODO: Top score from which only the chunks scoring at least this much are sent
+    TRIMMED_MAX_CHUNKS = 1 # Maximum number of chunks of a trimmed context
+
+class RunnerConfig:
+    SINGLE_PASS = False # Evaluate RAG, finetuned and hybrid in one pass: retrieve once per question and run the three generations concurrently. Endpoint mode without Bedrock batch inference only
+    MAX_WORKERS = 1 # TODO: Questions processed concurrently in the single pass, each one has three requests in flight
+
+class RateLimitConfig:
+    ENABLED = True # Process-wide adaptive (AIMD) rate limiting of Bedrock calls, one limiter per API and model/knowledge base
+    INITIAL_RATES = {
+        "converse": 2.0,
+        "retrieve": 5.0,
+    } # Starting requests per second per API, the limiter adapts to the account quota from there
+    DEFAULT_INITIAL_RATE = 2.0
+    MIN_RATE = 0.2
+    MAX_RATE = 100.0
+    ADDITIVE_INCREASE = 0.5 # Requests/s added per second of throttle-free traffic
+    MULTIPLICATIVE_DECREASE = 0.5 # Rate factor applied on ThrottlingException
+
+class HedgingConfig:
+    ENABLED = False # Send a duplicate of Bedrock converse and endpoint predict calls that are slower than PERCENTILE of the recent latencies, the first answer wins
+    PERCENTILE = 95 # TODO: Latency percentile after which a call is hedged
+    BUDGET_PERCENT = 5 # Maximum hedges in percent of the calls, caps the extra load
+    WINDOW_SIZE = 200 # Recent call latencies the percentile is computed over, per API and model/endpoint
+    MIN_SAMPLES = 20 # No hedging before this many calls completed
+
+class ContextConfig:
+    ENABLED = True # Merge overlapping chunks, drop near-duplicates and pack chunks into the token budget below. False concatenates all retrieved chunks
+    SIMILARITY_THRESHOLD = 0.9 # Chunks with a higher word-shingle Jaccard similarity to a better scored chunk are dropped
+    TOKEN_BUDGETS = {
+        RAGConfig.MODEL_ID: 4000,
+        FinetuningConfig.MODEL_ID: 2500, # The finetuned endpoint is trained with max_input_length 4096, leave room for the prompt template
+    } # TODO: Context budget per target model, in whitespace-delimited words
 
 class EvaluationConfig:
     MODELS_EVAL = {
@@ -73,6 +134,58 @@ class EvaluationConfig:
 
     SCORE_PATTERN = r'<output>(.*?)</output>' #TODO: Changes might needed for different prompt template
 
+    JUDGE_BATCH_SIZE = 1 # TODO: Samples packed into one judge request with BATCH_PROMPT_TEMPLATE, 1 sends PROMPT_TEMPLATE per sample. Must be 1 with CASCADE
+    BATCH_PROMPT_TEMPLATE = (
+        "You are an AI assistant to evaluate different AI-generated texts under consideration of the ground truth. "
+        "I will provide you several samples, each with a ground truth followed by different AI-generated answers for a question on a product catalog. "
+        "Evaluate every sample on its own. Your score range should be in the range 0-1. Evaluate the accuracy and quality of the LLM responses using the following criteria:\n\n"
+        "1. Correctness: Does the response match the ground truth answer? Are the facts and details aligned with what's provided in the ground truth?\n"
+        "2. Completeness: Does the response include all relevant points found in the ground truth answer? Are there any omissions or missing details?\n"
+        "3. Clarity and Readability: Is the response clear and easy to understand? Does it convey information in a way that would be understandable to the user?\n"
+        "4. No Hallucinations: Does the response avoid introducing any information that is not present in the ground truth? Ensure that no additional or fabricated details are present.\n\n"
+        "{samples}"
+        "Provide your evaluation scores as a json list with one object per sample, similar to the following output surrounded by <output> and </output>\n"
+        "<output>["
+        "{{\"sample\": 1, \"text1_score\": 0.5, \"text2_score\": 0.5, \"text3_score\": 0.5}}, "
+        "{{\"sample\": 2, \"text1_score\": 0.5, \"text2_score\": 0.5, \"text3_score\": 0.5}}"
+        "]</output>"
+    )  #TODO: Keep the criteria in sync with PROMPT_TEMPLATE
+    BATCH_SAMPLE_TEMPLATE = (
+        "Sample {index}:\n"
+        "Ground Truth: {ground_truth}\n\n"
+        "Text 1: {finetuning_text}\n\n"
+        "Text 2: {rag_text}\n\n"
+        "Text 3: {hybrid_text}\n\n"
+    )
+
+    JUDGE_MAX_WORKERS = {
+        "mistral_8_7b": 4,
+        "command_r_plus": 4,
+        "claude3_haiku": 8,
+    } # TODO: Concurrent judge calls per judge model, Bedrock quotas differ per model
+    DEFAULT_JUDGE_MAX_WORKERS = 2 # For judges missing from JUDGE_MAX_WORKERS
+    CASCADE = False # Run the cheapest judge first and consult the next judges only for unclear samples, instead of the full panel. Requires JUDGE_BATCH_SIZE = 1
+    JUDGE_ORDER = ["claude3_haiku", "mistral_8_7b", "command_r_plus"] # TODO: Judges of MODELS_EVAL from cheapest to most expensive
+    UNCERTAINTY_BAND = (0.3, 0.7) # Scores strictly inside this range are escalated to the next judge
+    DISAGREEMENT_THRESHOLD = 0.2 # A third judge is consulted when the first two differ by more than this on any response
+    EARLY_STOPPING = False # Score samples in random order and stop once bootstrap intervals settle the ranking of the approaches
+    EARLY_STOPPING_METRIC = "llm_evaluator_score" # Or "bert_score", the score the ranking is decided on
+    EARLY_STOPPING_STEP = 20 # Samples scored between two checks
+    EARLY_STOPPING_MIN_SAMPLES = 50 # Samples scored before the first check
+    EARLY_STOPPING_MAX_SAMPLES = None # TODO: Sample budget, None scores up to all samples
+    EARLY_STOPPING_CONFIDENCE = 0.95 # Family-wise confidence of the pairwise score difference intervals, over all looks
+    EARLY_STOPPING_SPENDING = "obrien_fleming" # Or "uniform", how 1 - EARLY_STOPPING_CONFIDENCE is split over the looks
+    BOOTSTRAP_RESAMPLES = 2000
+    EARLY_STOPPING_SEED = 0
+    RESULTS_STORE_DIR = "data/output/results_store" # Parquet store of all results and scores, one row per question and approach. None keeps the JSON files only
+    EXPORT_JSON = True # With the results store, export the scored *_results.json files at the end of the run
+    JUDGE_CACHE_PATH = "data/output/judge_cache.jsonl" # Append-only store of judge responses, reruns skip already judged prompts. None disables it
+
+    BERT_MODEL = "roberta-large" # TODO: Hugging Face model name, or a local directory with the downloaded model to run BERTScore without network access
+    BERT_NUM_LAYERS = 17 # Layer used by BERTScore, 17 is the default of roberta-large
+    BERT_BATCH_SIZE = 64 # Sentences encoded per forward pass
+    BERT_TORCH_THREADS = None # torch CPU threads for BERTScore, None keeps the torch default
+
 
 class Templates:
     FINETUNING_TEMPLATE = {
@@ -1,16 +1,46 @@
 #!/usr/bin/env python3
 import os,sys,subprocess,time
 
+from config import EnvSettings, KbConfig, DsConfig, RAGConfig, BatchInferenceConfig, ContextConfig, FinetuningConfig, HybridConfig, RunnerConfig, EvaluationConfig, Templates
+
+from utils.helpers import logger
+from src import evaluation
+
+
+if __name__ == "__main__" and "--quick" in sys.argv:
+    # Lexical metrics of the result files already written, without BERTScore, judges or any AWS call.
+    # The CDK, SageMaker and BERTScore dependencies of the full run are imported after this.
+    logger.info("START - Quick evaluation")
+    evaluation.Evaluation(
+        bedrock_region=EnvSettings.ACCOUNT_REGION,
+        evaluator_models = EvaluationConfig.MODELS_EVAL,
+        evaluator_prompt_template = EvaluationConfig.PROMPT_TEMPLATE,
+        score_pattern = EvaluationConfig.SCORE_PATTERN
+    ).calculate_quick_scores(
+        f'data/output/{FinetuningConfig.METHOD}_results.json',
+        'data/output/rag_results.json',
+        'data/output/hybrid_results.json',
+        'data/output/quick_summary.csv'
+    )
+    logger.info("FINISH - Quick evaluation")
+    sys.exit(0)
+
 import aws_cdk as cdk
 from constructs import DependencyGroup
 
-from config import EnvSettings, DsConfig, RAGConfig, FinetuningConfig, EvaluationConfig, Templates
-
-from utils.helpers import logger, upload_data_S3, create_summary_table
-from src import rag, finetuning, hybrid, llm_evaluator, evaluation
+from utils.helpers import upload_data_S3, create_summary_table
+from src import rag, finetuning, hybrid, llm_evaluator, batch_inference, runner
 
 import boto3
 from utils.helpers import json_to_jsonl, template_and_predict, get_stack_outputs
+from utils.local_retriever import LocalKnowledgeBase
+from utils.context import ContextAssembler
+from utils.routing import ScoreRouter
+from utils.bert_scorer import BertScorer
+from utils.judge_cache import JudgeCache
+from utils.results_store import ResultsStore
+from utils.rate_limiter import rate_limiter_stats
+from utils.hedging import hedging_stats
 
 
 
@@ -24,10 +54,16 @@ model_name_finetuning = FinetuningConfig.MODEL_NAME
 finetuning_method = FinetuningConfig.METHOD
 num_epoch = FinetuningConfig.NUM_EPOCH
 finetuning_instance = FinetuningConfig.INSTANCE
+finetuning_evaluation_mode = FinetuningConfig.EVALUATION_MODE
+single_pass = RunnerConfig.SINGLE_PASS and finetuning_evaluation_mode == "endpoint" and not BatchInferenceConfig.ENABLED
 
 number_of_results = RAGConfig.NUMBER_OF_RESULTS
 model_id_rag = RAGConfig.MODEL_ID
 model_name_rag = RAGConfig.MODEL_NAME
+max_workers_rag = RAGConfig.MAX_WORKERS
+retrieval_cache_size = RAGConfig.RETRIEVAL_CACHE_SIZE
+retrieval_cache_dir = RAGConfig.RETRIEVAL_CACHE_DIR
+retriever_backend = RAGConfig.RETRIEVER_BACKEND
 
 evaluator_models = EvaluationConfig.MODELS_EVAL
 evaluator_prompt_template = EvaluationConfig.PROMPT_TEMPLATE
@@ -44,38 +80,79 @@ data_folder_path = "data"
 
 if __name__ == "__main__":
     logger.info("Starting the application...")
-    stack_outputs = get_stack_outputs("KbInfraStack", region)
-
-    knowledge_base_id = stack_outputs['KnowledgeBaseId']
-    data_source_id = stack_outputs['DataSourceId']
-    logger.info(f"Knowledge Base ID: {knowledge_base_id}")
-    logger.info(f"Data Source ID: {data_source_id}")
-
     kb_configs = {
         "vectorSearchConfiguration": {
             "numberOfResults": number_of_results 
         }
     }
+    kb_data_path = f'{data_folder_path}/{kb_data_folder}'
+
+    if retriever_backend == "local":
+        logger.info("START - Building local knowledge base index")
+        knowledge_base_id = "local"
+        kb_client = LocalKnowledgeBase(
+            kb_data_path,
+            KbConfig.CHUNKING_STRATEGY,
+            KbConfig.MAX_TOKENS,
+            KbConfig.OVERLAP_PERCENTAGE,
+            index_dir = RAGConfig.LOCAL_INDEX_DIR,
+            dtype = RAGConfig.LOCAL_INDEX_DTYPE
+        )
+        logger.info(f"FINISH - Building local knowledge base index ({len(kb_client.chunk_texts)} chunks)")
+    else:
+        stack_outputs = get_stack_outputs("KbInfraStack", region)
+
+        knowledge_base_id = stack_outputs['KnowledgeBaseId']
+        data_source_id = stack_outputs['DataSourceId']
+        logger.info(f"Knowledge Base ID: {knowledge_base_id}")
+        logger.info(f"Data Source ID: {data_source_id}")
+        kb_client = None
+
+    context_assembler = ContextAssembler(
+        token_budgets = ContextConfig.TOKEN_BUDGETS,
+        similarity_threshold = ContextConfig.SIMILARITY_THRESHOLD
+    ) if ContextConfig.ENABLED else None
 
     rag_obj = rag.Rag(
         bedrock_region=region,
         kb_configs=kb_configs,
-        rag_template = rag_template
+        rag_template = rag_template,
+        max_workers = max_workers_rag,
+        retrieval_cache_size = retrieval_cache_size,
+        retrieval_cache_dir = retrieval_cache_dir,
+        kb_client = kb_client,
+        context_assembler = context_assembler,
+        streaming = RAGConfig.STREAMING
     )
-    kb_data_path = f'{data_folder_path}/{kb_data_folder}'
-    upload_data_S3(s3_client, data_folder_path, kb_data_path, bucket_name)
-    
-    logger.info("START - Knowledge base sync")
-    if not rag_obj.wait_for_kb_sync(
-        knowledge_base_id=knowledge_base_id,
-        data_source_id=data_source_id
-    ):
-        raise Exception("Knowledge base sync failed or timed out")
-    logger.info("FINISH - Knowledge base sync")
+
+    if retriever_backend != "local":
+        upload_data_S3(s3_client, data_folder_path, kb_data_path, bucket_name)
+        
+        logger.info("START - Knowledge base sync")
+        if not rag_obj.wait_for_kb_sync(
+            knowledge_base_id=knowledge_base_id,
+            data_source_id=data_source_id
+        ):
+            raise Exception("Knowledge base sync failed or timed out")
+        logger.info("FINISH - Knowledge base sync")
 
 
     logger.info("START - Evaluating RAG")
-    inference_time_rag = rag_obj.evaluate_rag(knowledge_base_id,model_name_rag, model_id_rag)
+    if single_pass:
+        logger.info("INFO - RAG is evaluated together with finetuned and hybrid in the single-pass run")
+    elif BatchInferenceConfig.ENABLED:
+        batch_obj = batch_inference.BatchInference(
+            bedrock_region=region,
+            rag_obj=rag_obj,
+            model_id=model_id_rag,
+            bucket_name=bucket_name,
+            role_arn=BatchInferenceConfig.ROLE_ARN,
+            s3_prefix=BatchInferenceConfig.S3_PREFIX,
+            max_gen_len=BatchInferenceConfig.MAX_GEN_LEN
+        )
+        inference_time_rag = batch_obj.evaluate_rag_batch(knowledge_base_id, poll_interval=BatchInferenceConfig.POLL_INTERVAL)
+    else:
+        inference_time_rag = rag_obj.evaluate_rag(knowledge_base_id,model_name_rag, model_id_rag)
     logger.info("FINISH - Evaluating RAG")
     
     finetuning_obj = finetuning.Finetuning(
@@ -86,8 +163,10 @@ if __name__ == "__main__":
         bucket_name = bucket_name,
         template = finetuning_template,
         num_epoch = num_epoch,
-        finetuning_instance = finetuning_instance
-
+        finetuning_instance = finetuning_instance,
+        max_workers = FinetuningConfig.MAX_WORKERS,
+        streaming = FinetuningConfig.STREAMING,
+        stop_sequences = FinetuningConfig.STOP_SEQUENCES
     )
     
     logger.info("START - Prepare data finetuning")
@@ -96,7 +175,8 @@ if __name__ == "__main__":
     logger.info("FINISH - Prepare data finetuning")
 
     logger.info("START - Finetune Model")
-    predictor, training_time = finetuning_obj.finetune_model(data_location, True) # It will also deploy the model, if you want to deploy it later, change True to False
+    # It will also deploy the model in "endpoint" mode, Batch Transform does not need an endpoint
+    predictor, training_time = finetuning_obj.finetune_model(data_location, finetuning_evaluation_mode == "endpoint")
     logger.info(f'INFO - Trainig_time: {training_time:.2f} seconds')
     #predictor= finetuning_obj.create_endpoint_from_saved_model(model_name = "llama-3-1-8b-instruct-2025-01-23-23-54-34-307") # Use this line if you already finetuned the model but don't have the endpoint, instead of above line.
     logger.info("FINISH - Finetune Model")
@@ -104,7 +184,15 @@ if __name__ == "__main__":
 
     #endpoint_name = "llama-3-1-8b-instruct-2025-01-30-10-03-55-806" #TODO: If you want to use already deployed model, find the correct endpoint name
     logger.info("START - Evaluating FINETUNING")
-    inference_time_finetuning = finetuning_obj.evaluate_finetuned_model(predictor, None)
+    if single_pass:
+        logger.info("INFO - Finetuned model is evaluated in the single-pass run")
+    elif finetuning_evaluation_mode == "batch_transform":
+        inference_time_finetuning = finetuning_obj.evaluate_finetuned_model_batch_transform(
+            instance_count = FinetuningConfig.TRANSFORM_INSTANCE_COUNT,
+            max_concurrent_transforms = FinetuningConfig.MAX_CONCURRENT_TRANSFORMS
+        )
+    else:
+        inference_time_finetuning = finetuning_obj.evaluate_finetuned_model(predictor, None)
     #inference_time_finetuning = finetuning_obj.test_finetuned_model(None, endpoint_name) #TODO: If you want to use endpoint_name instead of predictor obj.
 
     logger.info("FINISH - Evaluating FINETUNING")
@@ -116,32 +204,106 @@ if __name__ == "__main__":
         finetuning_obj,
         knowledge_base_id,
         model_id_rag,
-        hybrid_template
+        hybrid_template,
+        pipeline = HybridConfig.PIPELINE,
+        queue_depth = HybridConfig.PIPELINE_QUEUE_DEPTH,
+        retrieval_workers = HybridConfig.RETRIEVAL_WORKERS,
+        generation_workers = HybridConfig.GENERATION_WORKERS,
+        router = ScoreRouter(
+            no_context_threshold = HybridConfig.NO_CONTEXT_SCORE_THRESHOLD,
+            trim_threshold = HybridConfig.TRIM_SCORE_THRESHOLD,
+            trimmed_max_chunks = HybridConfig.TRIMMED_MAX_CHUNKS
+        ) if HybridConfig.ROUTING else None
     )
 
     logger.info("START - Evaluating RAG on Finetuned model")
-    inference_time_hybrid = hybrid_obj.evaluate_hybrid_model()
+    if single_pass:
+        runner_obj = runner.MultiStrategyRunner(
+            rag_obj,
+            finetuning_obj,
+            hybrid_obj,
+            knowledge_base_id,
+            model_id_rag,
+            max_workers = RunnerConfig.MAX_WORKERS
+        )
+        single_pass_times = runner_obj.run(predictor)
+        inference_time_rag = single_pass_times['rag']
+        inference_time_finetuning = single_pass_times[finetuning_method]
+        inference_time_hybrid = single_pass_times['hybrid']
+    elif finetuning_evaluation_mode == "batch_transform":
+        inference_time_hybrid = hybrid_obj.evaluate_hybrid_model_batch_transform(
+            instance_count = FinetuningConfig.TRANSFORM_INSTANCE_COUNT,
+            max_concurrent_transforms = FinetuningConfig.MAX_CONCURRENT_TRANSFORMS
+        )
+    else:
+        inference_time_hybrid = hybrid_obj.evaluate_hybrid_model()
     logger.info("FINISH - Evaluating RAG on Finetuned model")
 
 
+    finetuning_results = f'data/output/{finetuning_method}_results.json'
+    rag_results = 'data/output/rag_results.json'
+    hybrid_results = 'data/output/hybrid_results.json'
+    result_files = {
+        'finetuning': finetuning_results,
+        'rag': rag_results,
+        'hybrid': hybrid_results
+    }
+
+    results_store = None
+    if EvaluationConfig.RESULTS_STORE_DIR:
+        # Ingest the results of this run once, the evaluation and the summary read the columnar store.
+        # The generation steps still write the JSON files, they are converted here.
+        results_store = ResultsStore(EvaluationConfig.RESULTS_STORE_DIR)
+        results_store.clear()
+        for approach, file_path in result_files.items():
+            results_store.append_json(approach, file_path)
+
     eval_obj = evaluation.Evaluation(
         bedrock_region=region,
         evaluator_models = evaluator_models,
         evaluator_prompt_template = evaluator_prompt_template,
-        score_pattern = evaluator_score_pattern
+        score_pattern = evaluator_score_pattern,
+        bert_scorer = BertScorer(
+            model_type = EvaluationConfig.BERT_MODEL,
+            num_layers = EvaluationConfig.BERT_NUM_LAYERS,
+            batch_size = EvaluationConfig.BERT_BATCH_SIZE,
+            torch_threads = EvaluationConfig.BERT_TORCH_THREADS
+        ),
+        judge_max_workers = EvaluationConfig.JUDGE_MAX_WORKERS,
+        default_judge_max_workers = EvaluationConfig.DEFAULT_JUDGE_MAX_WORKERS,
+        judge_cache = JudgeCache(EvaluationConfig.JUDGE_CACHE_PATH) if EvaluationConfig.JUDGE_CACHE_PATH else None,
+        judge_batch_size = EvaluationConfig.JUDGE_BATCH_SIZE,
+        batch_prompt_template = EvaluationConfig.BATCH_PROMPT_TEMPLATE,
+        batch_sample_template = EvaluationConfig.BATCH_SAMPLE_TEMPLATE,
+        cascade = EvaluationConfig.CASCADE,
+        judge_order = EvaluationConfig.JUDGE_ORDER,
+        uncertainty_band = EvaluationConfig.UNCERTAINTY_BAND,
+        disagreement_threshold = EvaluationConfig.DISAGREEMENT_THRESHOLD,
+        results_store = results_store
     )
 
-    finetuning_results = f'data/output/{finetuning_method}_results.json'
-    rag_results = 'data/output/rag_results.json'
-    hybrid_results = 'data/output/hybrid_results.json'
-
     logger.info("START - Evaluation")
 
-    scores = eval_obj.calculate_scores(
-        finetuning_results,
-        rag_results,
-        hybrid_results
-    )
+    if EvaluationConfig.EARLY_STOPPING:
+        scores = eval_obj.calculate_scores_sequential(
+            finetuning_results,
+            rag_results,
+            hybrid_results,
+            metric = EvaluationConfig.EARLY_STOPPING_METRIC,
+            step = EvaluationConfig.EARLY_STOPPING_STEP,
+            min_samples = EvaluationConfig.EARLY_STOPPING_MIN_SAMPLES,
+            max_samples = EvaluationConfig.EARLY_STOPPING_MAX_SAMPLES,
+            confidence = EvaluationConfig.EARLY_STOPPING_CONFIDENCE,
+            n_resamples = EvaluationConfig.BOOTSTRAP_RESAMPLES,
+            seed = EvaluationConfig.EARLY_STOPPING_SEED,
+            spending = EvaluationConfig.EARLY_STOPPING_SPENDING
+        )
+    else:
+        scores = eval_obj.calculate_scores(
+            finetuning_results,
+            rag_results,
+            hybrid_results
+        )
     eval_obj.save_scores(
         scores,
         finetuning_results,
@@ -163,8 +325,17 @@ if __name__ == "__main__":
         'hybrid': inference_time_hybrid
     }
     print(inference_times)
-    create_summary_table(inference_times, finetuning_method, "data/output","summary_results.csv")
+    logger.info(f"Bedrock rate limiters: {rate_limiter_stats()}")
+    logger.info(f"Request hedging: {hedging_stats()}")
+    requests_per_second = {
+        f'{finetuning_method}': finetuning_obj.requests_per_second
+    }
+    create_summary_table(inference_times, finetuning_method, "data/output","summary_results.csv", requests_per_second, results_store)
     logger.info("FINISH - Summary Table Creation")
+
+    if results_store is not None and EvaluationConfig.EXPORT_JSON:
+        for approach, file_path in result_files.items():
+            results_store.export_json(approach, file_path)
     
     
     #Clean-up
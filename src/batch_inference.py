@@ -0,0 +1,335 @@
+import os, json, boto3, time, glob
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from utils.helpers import logger, load_json_file
+
+
+class LocalBatchRunner:
+    """
+    A local stand-in for a Bedrock batch inference job.
+
+    It reads model-invocation JSONL, calls invoke_fn for every record and writes the output JSONL in
+    the format Bedrock batch inference produces, so the rest of the batch path can run without AWS.
+    """
+
+    def __init__(self, invoke_fn: Callable[[str, dict], dict]):
+        """
+        Args:
+            invoke_fn (Callable): Takes (model_id, modelInput) and returns the model output body,
+                e.g. a wrapper around bedrock-runtime invoke_model or a fake model for tests.
+        """
+        self.invoke_fn = invoke_fn
+
+    def run(self, model_id: str, input_path: str, output_path: str) -> None:
+        """
+        Process every record of input_path and write the results to output_path.
+
+        Args:
+            model_id (str): Model the records are rendered for.
+            input_path (str): Model-invocation JSONL.
+            output_path (str): Output JSONL, one {"recordId", "modelInput", "modelOutput"|"error"} per line.
+        """
+        with open(input_path, 'r', encoding='utf-8') as infile, open(output_path, 'w', encoding='utf-8') as outfile:
+            for line in infile:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                try:
+                    record["modelOutput"] = self.invoke_fn(model_id, record["modelInput"])
+                except Exception as e:
+                    record["error"] = {"errorMessage": str(e)}
+                json.dump(record, outfile)
+                outfile.write('\n')
+
+
+class BatchInference:
+    """
+    A class to run the RAG evaluation as a Bedrock batch inference job.
+
+    Every test question is retrieved and rendered with the RAG template up front, the prompts are written
+    as model-invocation JSONL and processed offline by Bedrock. The job output is parsed back into the
+    rag_results.json schema, so the evaluation and summary steps work unchanged.
+
+    Note:
+        Bedrock batch inference requires a minimum number of records per job (100 for most models)
+        and a service role that can read and write the batch S3 prefix.
+    """
+
+    TERMINAL_STATUSES = ['Completed', 'PartiallyCompleted', 'Failed', 'Stopped', 'Expired']
+
+    def __init__(self, bedrock_region: str, rag_obj, model_id: str, bucket_name: str, role_arn: str,
+                 s3_prefix: str = "batch-inference", max_gen_len: int = 2048, output_dir: str = "data/output/batch"):
+        """
+        Initialize the batch inference class.
+
+        Args:
+            bedrock_region (str): AWS region for Bedrock.
+            rag_obj (Rag): RAG object used to retrieve and assemble the context.
+            model_id (str): Bedrock model ID used for generation.
+            bucket_name (str): S3 bucket for the batch input and output.
+            role_arn (str): Service role of the model invocation job.
+            s3_prefix (str): Prefix of the batch files in the bucket.
+            max_gen_len (int): Maximum number of generated tokens per record.
+            output_dir (str): Local directory for the JSONL files.
+        """
+        self.rag_obj = rag_obj
+        self.model_id = model_id
+        self.bucket_name = bucket_name
+        self.role_arn = role_arn
+        self.s3_prefix = s3_prefix
+        self.max_gen_len = max_gen_len
+        self.output_dir = output_dir
+
+        self.bedrock_client = boto3.client('bedrock', region_name=bedrock_region)
+        self.s3_client = boto3.client('s3', region_name=bedrock_region)
+
+    def build_model_input(self, prompt: str) -> dict:
+        """
+        Render a prompt into the native InvokeModel body of the model, which batch inference expects.
+
+        Args:
+            prompt (str): The RAG prompt.
+
+        Returns:
+            dict: The model input body.
+
+        Raises:
+            ValueError: If the model family is not supported.
+        """
+        if self.model_id.startswith("meta.llama3"):
+            return {
+                "prompt": (
+                    "<|begin_of_text|><|start_header_id|>user<|end_header_id|>\n\n"
+                    f"{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n"
+                ),
+                "max_gen_len": self.max_gen_len,
+                "temperature": 0.0,
+            }
+        if self.model_id.startswith("anthropic."):
+            return {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": self.max_gen_len,
+                "temperature": 0.0,
+                "messages": [{"role": "user", "content": [{"type": "text", "text": prompt}]}],
+            }
+        if self.model_id.startswith("mistral."):
+            return {
+                "prompt": f"<s>[INST] {prompt} [/INST]",
+                "max_tokens": self.max_gen_len,
+                "temperature": 0.0,
+            }
+        raise ValueError(f"Batch inference input format not implemented for model {self.model_id}")
+
+    def parse_model_output(self, model_output: dict) -> tuple:
+        """
+        Extract the generated text and token usage from a model output body.
+
+        Args:
+            model_output (dict): The "modelOutput" field of a batch output record.
+
+        Returns:
+            tuple: Generated text, input token count and output token count (None if not reported).
+        """
+        if self.model_id.startswith("meta.llama3"):
+            return (model_output["generation"], model_output.get("prompt_token_count"),
+                    model_output.get("generation_token_count"))
+        if self.model_id.startswith("anthropic."):
+            usage = model_output.get("usage", {})
+            return (model_output["content"][0]["text"], usage.get("input_tokens"), usage.get("output_tokens"))
+        if self.model_id.startswith("mistral."):
+            return (model_output["outputs"][0]["text"], None, None)
+        raise ValueError(f"Batch inference output format not implemented for model {self.model_id}")
+
+    def prepare_input(self, knowledge_base_id: str, test_data_path: str, input_path: str) -> List[dict]:
+        """
+        Retrieve the context of every test question and write the model-invocation JSONL.
+
+        Args:
+            knowledge_base_id (str): Knowledge base ID.
+            test_data_path (str): Test data JSON with "question" and "answer" fields.
+            input_path (str): Path of the JSONL to write.
+
+        Returns:
+            List[dict]: Per-record metadata (recordId, question, ground truth and context) needed to
+            rebuild the results.
+        """
+        data = load_json_file(test_data_path)
+        records = []
+        with open(input_path, 'w', encoding='utf-8') as outfile:
+            for i, product_data in enumerate(data):
+                question = product_data.get("question")
+                docs = self.rag_obj.retrieve(knowledge_base_id, question)
+                context = self.rag_obj.assemble_context(docs, self.model_id)
+                prompt = self.rag_obj.rag_template.format(question=question, context=context)
+
+                record_id = f"{i:011d}"
+                json.dump({"recordId": record_id, "modelInput": self.build_model_input(prompt)}, outfile)
+                outfile.write('\n')
+                records.append({
+                    'recordId': record_id,
+                    'input_text': question,
+                    'ground_truth': product_data.get("answer"),
+                    'context': context,
+                })
+
+        with open(f"{input_path}.records.json", 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=4)
+        return records
+
+    def submit_job(self, input_path: str, job_name: str) -> str:
+        """
+        Upload the JSONL to S3 and create the model invocation job.
+
+        Args:
+            input_path (str): Local model-invocation JSONL.
+            job_name (str): Name of the job.
+
+        Returns:
+            str: ARN of the model invocation job.
+        """
+        input_key = f"{self.s3_prefix}/input/{os.path.basename(input_path)}"
+        self.s3_client.upload_file(input_path, self.bucket_name, input_key)
+
+        response = self.bedrock_client.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self.role_arn,
+            modelId=self.model_id,
+            inputDataConfig={
+                "s3InputDataConfig": {
+                    "s3Uri": f"s3://{self.bucket_name}/{input_key}",
+                    "s3InputFormat": "JSONL",
+                }
+            },
+            outputDataConfig={
+                "s3OutputDataConfig": {"s3Uri": f"s3://{self.bucket_name}/{self.s3_prefix}/output/"}
+            },
+        )
+        logger.info(f"Submitted batch inference job: {response['jobArn']}")
+        return response['jobArn']
+
+    def wait_for_job(self, job_arn: str, poll_interval: int = 60, max_wait_time: int = 86400) -> str:
+        """
+        Wait until the model invocation job reaches a terminal status.
+
+        Args:
+            job_arn (str): ARN of the job.
+            poll_interval (int): Seconds between status checks.
+            max_wait_time (int): Maximum number of seconds to wait.
+
+        Returns:
+            str: Final job status, "Completed" or "PartiallyCompleted".
+
+        Raises:
+            RuntimeError: If the job failed, was stopped or expired, it has no output to download.
+            TimeoutError: If the job is still running after max_wait_time.
+        """
+        start_time = time.time()
+        while (time.time() - start_time) < max_wait_time:
+            response = self.bedrock_client.get_model_invocation_job(jobIdentifier=job_arn)
+            status = response['status']
+            logger.info(f"Batch inference job status: {status}")
+            if status in self.TERMINAL_STATUSES:
+                if status not in ['Completed', 'PartiallyCompleted']:
+                    raise RuntimeError(f"Batch inference job {job_arn} ended with status {status}: {response.get('message', '')}")
+                return status
+            time.sleep(poll_interval)
+        raise TimeoutError(f"Batch inference job {job_arn} did not finish after {max_wait_time} seconds")
+
+    def download_output(self, job_arn: str, input_path: str, output_path: str) -> None:
+        """
+        Download the job output JSONL. Bedrock writes it to <output prefix>/<job id>/<input file>.out
+
+        Args:
+            job_arn (str): ARN of the job.
+            input_path (str): Local input JSONL, its file name determines the output key.
+            output_path (str): Local path of the output JSONL.
+        """
+        job_id = job_arn.split('/')[-1]
+        output_key = f"{self.s3_prefix}/output/{job_id}/{os.path.basename(input_path)}.out"
+        self.s3_client.download_file(self.bucket_name, output_key, output_path)
+
+    def parse_output(self, output_path: str, records: List[dict]) -> List[dict]:
+        """
+        Rebuild rag_results.json records from the batch output.
+
+        Args:
+            output_path (str): Output JSONL of the job.
+            records (List[dict]): Metadata returned by prepare_input.
+
+        Returns:
+            List[dict]: Result records in input order. Failed records get an empty llm_response and
+            the error message under "batch_error".
+        """
+        outputs = {}
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    output = json.loads(line)
+                    outputs[output["recordId"]] = output
+
+        results = []
+        for record in records:
+            output = outputs.get(record['recordId'], {})
+            results_dict = {
+                'input_text': record['input_text'],
+                'ground_truth': record['ground_truth'],
+                'llm_response': "",
+                'context': record['context'],
+            }
+            if "modelOutput" in output:
+                text, input_tokens, output_tokens = self.parse_model_output(output["modelOutput"])
+                results_dict['llm_response'] = text
+                results_dict['input_tokens'] = input_tokens
+                results_dict['output_tokens'] = output_tokens
+            else:
+                results_dict['batch_error'] = output.get("error", {}).get("errorMessage", "Record missing from batch output")
+                logger.error(f"Batch record {record['recordId']} failed: {results_dict['batch_error']}")
+            results.append(results_dict)
+        return results
+
+    def evaluate_rag_batch(self, knowledge_base_id: str, local_runner: Optional[LocalBatchRunner] = None,
+                           poll_interval: int = 60) -> float:
+        """
+        Evaluate RAG on the test data with batch inference and write data/output/rag_results.json.
+
+        Args:
+            knowledge_base_id (str): Knowledge base ID.
+            local_runner (LocalBatchRunner, optional): Processes the JSONL locally instead of submitting a
+                Bedrock job. Defaults to None.
+            poll_interval (int): Seconds between job status checks.
+
+        Returns:
+            float: Wall time of the batch divided by the number of records, i.e. the amortized
+            inference time per question.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        input_path = os.path.join(self.output_dir, "rag_batch_input.jsonl")
+        output_path = os.path.join(self.output_dir, "rag_batch_output.jsonl")
+
+        json_files = glob.glob(os.path.join("data/test/", "*.json"))
+        if len(json_files) != 1:
+            raise ValueError("There should be exactly one JSON file in the directory.")
+
+        start_time = time.time()
+        records = self.prepare_input(knowledge_base_id, json_files[0], input_path)
+
+        if local_runner is not None:
+            local_runner.run(self.model_id, input_path, output_path)
+        else:
+            if len(records) < 100:
+                logger.warning(f"Only {len(records)} records, Bedrock batch inference jobs usually require at least 100")
+            job_name = f"rag-eval-{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}"
+            job_arn = self.submit_job(input_path, job_name)
+            self.wait_for_job(job_arn, poll_interval)
+            self.download_output(job_arn, input_path, output_path)
+
+        results = self.parse_output(output_path, records)
+        end_time = time.time()
+
+        results_file_path = "data/output/rag_results.json"
+        os.makedirs(os.path.dirname(results_file_path), exist_ok=True)
+        with open(results_file_path, 'w') as json_file:
+            json.dump(results, json_file, indent=4)
+
+        return (end_time - start_time) / len(results)
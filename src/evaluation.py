@@ -1,28 +1,62 @@
 import json
-from evaluate import load
 import numpy as np
-import os, json, boto3
+import pandas as pd
+import os, json, boto3, threading
 from src import llm_evaluator
-from utils.helpers import load_json_file
+from utils.helpers import load_json_file, logger
+from utils.chunking import count_tokens
+from utils.judge_cache import JudgeCache
+from utils.statistics import alpha_spending, pairwise_difference_intervals, ranking_settled
+from utils.results_store import ResultsStore
+from utils.lexical_metrics import lexical_scores, correlation_with
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 @dataclass
 class EvaluationResults:
     """Class to hold evaluation results"""
     bert_scores: Dict[str, List[float]]
     llm_evaluator_scores: Dict[str, List[Dict]]
+    sample_indices: Optional[List[int]] = None # Result records the scores belong to, None for all records in order
+    stopping: Optional[Dict] = None # Early stopping summary of calculate_scores_sequential
+    judges_consulted: Optional[List[List[str]]] = None # Judges of every sample with cascaded judging, None for the full panel
 
 class Evaluation:
 
-    def __init__(self, bedrock_region: str, evaluator_models: dict, evaluator_prompt_template: str, score_pattern: str):
+    def __init__(self, bedrock_region: str, evaluator_models: dict, evaluator_prompt_template: str, score_pattern: str,
+                 bert_scorer=None, judge_max_workers: Dict[str, int] = None, default_judge_max_workers: int = 1,
+                 judge_cache: JudgeCache = None, judge_batch_size: int = 1, batch_prompt_template: str = None,
+                 batch_sample_template: str = None, cascade: bool = False, judge_order: List[str] = None,
+                 uncertainty_band: Tuple[float, float] = (0.3, 0.7), disagreement_threshold: float = 0.2,
+                 results_store: ResultsStore = None):
         """
         Initialize the Evaluation class with required configurations.
         
         Args:
             bedrock_region (str): AWS region for Bedrock.
             evaluator_models (dict): Model names an ids in Bedrock will be used as an evaluator
+            bert_scorer (BertScorer, optional): BERTScore scorer, loaded once and reused for every approach.
+                Defaults to roberta-large from the Hugging Face hub.
+            judge_max_workers (dict, optional): Concurrent calls per judge model name.
+            default_judge_max_workers (int): Concurrent calls of judges missing from judge_max_workers.
+            judge_cache (JudgeCache, optional): Persistent store of judge responses, a rerun only sends the
+                (judge model, prompt) pairs that were not judged before.
+            judge_batch_size (int): Samples judged per request. Above 1, batch_prompt_template and
+                batch_sample_template are required.
+            batch_prompt_template (str, optional): Judge prompt with a {samples} placeholder.
+            batch_sample_template (str, optional): Per-sample block of the batched prompt.
+            cascade (bool): Judge every sample with the first judge of judge_order and consult the next
+                judges only for unclear samples, see judge_cascade. Judges one sample per request, so it
+                cannot be combined with judge_batch_size > 1.
+            judge_order (list, optional): Judge model names from cheapest to most expensive. Defaults to
+                the order of evaluator_models.
+            uncertainty_band (tuple): Scores strictly inside (low, high) are uncertain and escalated.
+            disagreement_threshold (float): Largest score difference between the first two judges that
+                does not need a third judge.
+            results_store (ResultsStore, optional): Columnar store the responses are read from and the
+                scores are appended to, instead of rewriting the JSON result files.
         """
 
         self.bedrock_runtime = boto3.client(
@@ -33,8 +67,35 @@ class Evaluation:
 
         self.llm_evaluator_obj = llm_evaluator.LLMEvaluator(
             self.bedrock_runtime,
+            judge_cache
         )
         self.score_pattern = score_pattern
+        if bert_scorer is None:
+            # Imported here, quick lexical runs do not need torch and bert_score
+            from utils.bert_scorer import BertScorer
+            bert_scorer = BertScorer()
+        self.bert_scorer = bert_scorer
+        self.judge_max_workers = judge_max_workers or {}
+        self.default_judge_max_workers = default_judge_max_workers
+        self.judge_batch_size = max(1, judge_batch_size)
+        self.batch_prompt_template = batch_prompt_template
+        self.batch_sample_template = batch_sample_template
+        if self.judge_batch_size > 1 and not (batch_prompt_template and batch_sample_template):
+            raise ValueError("Batched judging needs batch_prompt_template and batch_sample_template")
+
+        self.results_store = results_store
+        self.cascade = cascade
+        if self.cascade and self.judge_batch_size > 1:
+            raise ValueError("Cascaded judging decides per sample and cannot be combined with judge_batch_size > 1")
+        self.judge_order = judge_order or list(evaluator_models.keys())
+        self.uncertainty_band = uncertainty_band
+        self.disagreement_threshold = disagreement_threshold
+        unknown_judges = set(self.judge_order) - set(evaluator_models.keys())
+        if unknown_judges:
+            raise ValueError(f"judge_order contains judges missing from evaluator_models: {unknown_judges}")
+
+        self.judge_stats = {'batched_calls': 0, 'fallback_calls': 0, 'samples': 0, 'prompt_tokens': 0, 'single_prompt_tokens': 0}
+        self._judge_stats_lock = threading.Lock()
 
 
     def calculate_bert(self, ground_truth: List[str], llm_generated: List[str]) -> Dict[str, List[float]]:
@@ -48,13 +109,165 @@ class Evaluation:
         Returns:
             Dictionary containing BERT scores
         """
-        bertscore = load("bertscore")
-        return bertscore.compute(
-            predictions=llm_generated,
-            references=ground_truth,
-            lang="en"
+        return self.bert_scorer.score(ground_truth, llm_generated)
+
+
+    def build_evaluator_prompt(self, ground_truth: str, llm_response_finetuning: str,
+                               llm_response_rag: str, llm_response_hybrid: str) -> str:
+        """
+        Render the judge prompt of one sample.
+
+        Returns:
+            The evaluator prompt template filled with the ground truth and the three responses
+        """
+        return self.evaluator_prompt_template.format(
+            ground_truth=ground_truth,
+            finetuning_text=llm_response_finetuning,
+            rag_text=llm_response_rag,
+            hybrid_text=llm_response_hybrid
+        )
+
+    def judge(self, model_name: str, ground_truth: str, llm_response_finetuning: str,
+              llm_response_rag: str, llm_response_hybrid: str) -> Tuple[float, float, float]:
+        """
+        Score one sample with one judge model.
+
+        Args:
+            model_name: Key of the judge in evaluator_models
+            ground_truth: Ground truth text
+            llm_response_finetuning: Response from finetuning approach
+            llm_response_rag: Response from RAG approach
+            llm_response_hybrid: Response from hybrid approach
+
+        Returns:
+            Finetuning, RAG and hybrid scores
+        """
+        prompt = self.build_evaluator_prompt(ground_truth, llm_response_finetuning, llm_response_rag, llm_response_hybrid)
+        return self.llm_evaluator_obj.evaluate(
+            self.evaluator_models[model_name],
+            llm_response_finetuning,
+            llm_response_rag,
+            llm_response_hybrid,
+            ground_truth,
+            prompt,
+            self.score_pattern
+        )
+
+    def build_batch_prompt(self, samples: List[Tuple[str, str, str, str]]) -> str:
+        """
+        Render the judge prompt of several samples.
+
+        Args:
+            samples: (ground truth, finetuning, RAG, hybrid response) per sample
+
+        Returns:
+            The batched evaluator prompt, samples are numbered from 1
+        """
+        sample_texts = "".join(
+            self.batch_sample_template.format(
+                index=i + 1,
+                ground_truth=ground_truth,
+                finetuning_text=llm_response_finetuning,
+                rag_text=llm_response_rag,
+                hybrid_text=llm_response_hybrid
+            )
+            for i, (ground_truth, llm_response_finetuning, llm_response_rag, llm_response_hybrid) in enumerate(samples)
+        )
+        return self.batch_prompt_template.format(samples=sample_texts)
+
+    def judge_batch(self, model_name: str, samples: List[Tuple[str, str, str, str]]) -> List[Tuple[float, float, float]]:
+        """
+        Score several samples with one judge request, falling back to single-sample judging for the
+        samples whose scores cannot be parsed.
+
+        Args:
+            model_name: Key of the judge in evaluator_models
+            samples: (ground truth, finetuning, RAG, hybrid response) per sample
+
+        Returns:
+            Finetuning, RAG and hybrid scores per sample
+        """
+        prompt = self.build_batch_prompt(samples)
+        scores = self.llm_evaluator_obj.evaluate_batch(
+            self.evaluator_models[model_name],
+            prompt,
+            self.score_pattern,
+            len(samples)
         )
 
+        prompt_tokens = count_tokens(prompt)
+        fallback_calls = 0
+        for i, sample in enumerate(samples):
+            if scores[i] is None:
+                logger.warning(f"Judge {model_name}: sample {i + 1} of a batch could not be parsed, judging it alone")
+                scores[i] = self.judge(model_name, *sample)
+                prompt_tokens += count_tokens(self.build_evaluator_prompt(*sample))
+                fallback_calls += 1
+
+        with self._judge_stats_lock:
+            self.judge_stats['batched_calls'] += 1
+            self.judge_stats['fallback_calls'] += fallback_calls
+            self.judge_stats['samples'] += len(samples)
+            self.judge_stats['prompt_tokens'] += prompt_tokens
+            self.judge_stats['single_prompt_tokens'] += sum(count_tokens(self.build_evaluator_prompt(*sample)) for sample in samples)
+        return scores
+
+    def judge_batching_report(self) -> Dict[str, float]:
+        """
+        Compare the judge requests of batched judging to one request per sample and judge.
+
+        Tokens are prompt tokens counted as whitespace-delimited words.
+
+        Returns:
+            Calls and prompt tokens of both modes and the saved fraction of each
+        """
+        stats = dict(self.judge_stats)
+        calls = stats['batched_calls'] + stats['fallback_calls']
+        single_calls = stats['samples']
+        return {
+            'judge_calls': calls,
+            'single_sample_judge_calls': single_calls,
+            'fallback_calls': stats['fallback_calls'],
+            'calls_saved': round(1 - calls / single_calls, 3) if single_calls else 0.0,
+            'prompt_tokens': stats['prompt_tokens'],
+            'single_sample_prompt_tokens': stats['single_prompt_tokens'],
+            'prompt_tokens_saved': round(1 - stats['prompt_tokens'] / stats['single_prompt_tokens'], 3) if stats['single_prompt_tokens'] else 0.0,
+        }
+
+    def aggregate_judge_scores(self, judge_scores: Dict[str, Tuple[float, float, float]]) -> Dict[str, Dict]:
+        """
+        Combine the scores of all judges for one sample.
+
+        Judges are visited in the order of evaluator_models, so the averages do not depend on the
+        order in which the judge calls completed. A score of -1 means the judge response could not be
+        parsed, it is kept under the judge name but left out of the mean.
+
+        Args:
+            judge_scores: Finetuning, RAG and hybrid scores per judge model name, judges that were not
+                consulted are left out of the mean
+
+        Returns:
+            Dictionary containing the score of every judge, their mean "llm_evaluator_score" and the
+            number of "failed_judges" for each approach. The mean is -1 when every judge failed.
+        """
+        scores = {
+            "finetuning" : {},
+            "rag": {},
+            "hybrid": {}
+        }
+
+        for model_name in self.evaluator_models.keys():
+            if model_name not in judge_scores:
+                continue
+            for approach, score in zip(scores, judge_scores[model_name]):
+                scores[approach][model_name] = score
+
+        for approach_scores in scores.values():
+            valid = [score for score in approach_scores.values() if score is not None and score >= 0]
+            approach_scores['llm_evaluator_score'] = sum(valid) / len(valid) if valid else -1
+            approach_scores['failed_judges'] = len(approach_scores) - 1 - len(valid)
+
+        return scores
 
     def calculate_llm_evaluator(self,
                               ground_truth: str,
@@ -73,49 +286,196 @@ class Evaluation:
         Returns:
             Dictionary containing scores for each approach
         """
-        scores = {
-            "finetuning" : {},
-            "rag": {},
-            "hybrid": {}
+        judge_scores = {
+            model_name: self.judge(model_name, ground_truth, llm_response_finetuning, llm_response_rag, llm_response_hybrid)
+            for model_name in self.evaluator_models.keys()
         }
-        
-        finetuning_sum = 0
-        rag_sum = 0 
-        hybrid_sum = 0
+        return self.aggregate_judge_scores(judge_scores)
 
-        prompt = self.evaluator_prompt_template.format(
-            ground_truth=ground_truth,
-            finetuning_text=llm_response_finetuning,
-            rag_text=llm_response_rag,
-            hybrid_text=llm_response_hybrid
+    def needs_escalation(self, judge_scores: List[Tuple[float, float, float]]) -> bool:
+        """
+        Decide whether the judges consulted so far leave a sample unclear.
+
+        A sample is escalated when a score could not be parsed (-1), when the latest judge gave a score
+        inside the uncertainty band, or when the first two judges disagree by more than
+        disagreement_threshold.
+
+        Args:
+            judge_scores: Scores of the judges consulted so far, in cascade order
+
+        Returns:
+            True if the next judge should be consulted
+        """
+        latest = judge_scores[-1]
+        low, high = self.uncertainty_band
+        if any(score is None or score < 0 or low < score < high for score in latest):
+            return True
+
+        if len(judge_scores) >= 2:
+            first, second = judge_scores[0], judge_scores[1]
+            if max(abs(a - b) for a, b in zip(first, second)) > self.disagreement_threshold:
+                return True
+        return False
+
+    @staticmethod
+    def share_duplicate_scores(sample: Tuple[str, str, str, str], scores: Tuple[float, float, float]) -> Tuple[float, float, float]:
+        """
+        Give byte-identical responses of a sample the score of the first of them.
+
+        Args:
+            sample: (ground truth, finetuning, RAG, hybrid response)
+            scores: Finetuning, RAG and hybrid scores of one judge
+
+        Returns:
+            The scores, with every duplicate response scored like its first occurrence
+        """
+        responses = sample[1:]
+        return tuple(scores[responses.index(response)] for response in responses)
+
+    def judge_cascade(self, sample: Tuple[str, str, str, str],
+                      semaphores: Dict[str, threading.Semaphore] = None) -> Tuple[Dict[str, Dict], List[str]]:
+        """
+        Score one sample with the judges of judge_order, stopping as soon as the sample is clear.
+
+        Byte-identical responses share one judgement, so a judge scoring them differently does not
+        cause an escalation.
+
+        Args:
+            sample: (ground truth, finetuning, RAG, hybrid response)
+            semaphores (dict, optional): Concurrency limit per judge model name
+
+        Returns:
+            Dictionary containing scores for each approach, like calculate_llm_evaluator, and the
+            names of the consulted judges
+        """
+        judge_scores = {}
+        for model_name in self.judge_order:
+            if semaphores is not None:
+                with semaphores[model_name]:
+                    scores = self.judge(model_name, *sample)
+            else:
+                scores = self.judge(model_name, *sample)
+            judge_scores[model_name] = self.share_duplicate_scores(sample, scores)
+            if not self.needs_escalation(list(judge_scores.values())):
+                break
+
+        return self.aggregate_judge_scores(judge_scores), list(judge_scores.keys())
+
+    def calculate_llm_evaluator_cascade(self,
+                                        ground_truth: List[str],
+                                        llm_response_finetuning: List[str],
+                                        llm_response_rag: List[str],
+                                        llm_response_hybrid: List[str]) -> Tuple[Dict[str, List[Dict]], List[List[str]]]:
+        """
+        Calculate LLM evaluator scores of all samples with cascaded judging.
+
+        Samples are judged concurrently, the calls of every judge model are limited to judge_max_workers
+        at a time. Byte-identical samples are judged once and share the judgement. The number of judge
+        calls saved versus the full panel is logged.
+
+        Args:
+            ground_truth: Ground truth texts
+            llm_response_finetuning: Responses from finetuning approach
+            llm_response_rag: Responses from RAG approach
+            llm_response_hybrid: Responses from hybrid approach
+
+        Returns:
+            Dictionary containing the list of per-sample scores for each approach, and the judges
+            consulted for every sample
+        """
+        samples = list(zip(ground_truth, llm_response_finetuning, llm_response_rag, llm_response_hybrid))
+        unique_samples = list(dict.fromkeys(samples))
+        max_workers = {
+            model_name: self.judge_max_workers.get(model_name, self.default_judge_max_workers)
+            for model_name in self.judge_order
+        }
+        semaphores = {model_name: threading.Semaphore(workers) for model_name, workers in max_workers.items()}
+
+        with ThreadPoolExecutor(max_workers=sum(max_workers.values())) as executor:
+            judgements = dict(zip(
+                unique_samples,
+                executor.map(lambda sample: self.judge_cascade(sample, semaphores), unique_samples)
+            ))
+        per_sample_scores = [judgements[sample][0] for sample in samples]
+        judges_consulted = [judgements[sample][1] for sample in samples]
+
+        judge_calls = sum(len(judges) for _, judges in judgements.values())
+        full_panel_calls = len(samples) * len(self.judge_order)
+        calls_per_judge = {
+            model_name: sum(model_name in judges for _, judges in judgements.values())
+            for model_name in self.judge_order
+        }
+        logger.info(
+            f"Cascaded judging: {judge_calls} judge calls instead of {full_panel_calls} for the full panel "
+            f"({full_panel_calls - judge_calls} saved, {len(samples) - len(unique_samples)} duplicate samples), "
+            f"calls per judge: {calls_per_judge}"
         )
 
-        for model_name in self.evaluator_models.keys():
-            model_id = self.evaluator_models[model_name]
+        scores = {
+            approach: [scores[approach] for scores in per_sample_scores]
+            for approach in ['finetuning', 'rag', 'hybrid']
+        }
+        return scores, judges_consulted
 
-            score_finetuning, score_rag, score_hybrid = self.llm_evaluator_obj.evaluate(
-                model_id,
-                llm_response_finetuning,
-                llm_response_rag,
-                llm_response_hybrid,
-                ground_truth,
-                prompt,
-                self.score_pattern
+    def calculate_llm_evaluator_parallel(self,
+                                         ground_truth: List[str],
+                                         llm_response_finetuning: List[str],
+                                         llm_response_rag: List[str],
+                                         llm_response_hybrid: List[str]) -> Dict[str, List[Dict]]:
+        """
+        Calculate LLM evaluator scores of all samples, with the judge calls running concurrently.
+
+        Every judge model has its own thread pool sized by judge_max_workers, since Bedrock quotas
+        differ per model. Results are collected per sample and aggregated in judge order, so the output
+        is identical to calling calculate_llm_evaluator sample by sample. With judge_batch_size > 1
+        every request judges a batch of samples and the call and token savings are logged.
+
+        Args:
+            ground_truth: Ground truth texts
+            llm_response_finetuning: Responses from finetuning approach
+            llm_response_rag: Responses from RAG approach
+            llm_response_hybrid: Responses from hybrid approach
+
+        Returns:
+            Dictionary containing the list of per-sample scores for each approach
+        """
+        samples = list(zip(ground_truth, llm_response_finetuning, llm_response_rag, llm_response_hybrid))
+        executors = {
+            model_name: ThreadPoolExecutor(
+                max_workers=self.judge_max_workers.get(model_name, self.default_judge_max_workers)
             )
+            for model_name in self.evaluator_models.keys()
+        }
+        batches = [samples[i:i + self.judge_batch_size] for i in range(0, len(samples), self.judge_batch_size)]
+        if self.judge_batch_size > 1:
+            judge_fn = self.judge_batch
+        else:
+            judge_fn = lambda model_name, batch: [self.judge(model_name, *batch[0])]
 
-            scores['finetuning'][model_name] = score_finetuning 
-            scores['rag'][model_name] = score_rag 
-            scores['hybrid'][model_name] = score_hybrid 
-            finetuning_sum += score_finetuning
-            rag_sum += score_rag
-            hybrid_sum += score_hybrid
+        try:
+            futures = {
+                model_name: [executor.submit(judge_fn, model_name, batch) for batch in batches]
+                for model_name, executor in executors.items()
+            }
+            judge_scores = {
+                model_name: [scores for future in model_futures for scores in future.result()]
+                for model_name, model_futures in futures.items()
+            }
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
 
-        sample_count = len(scores['finetuning'].keys())
-        scores['finetuning']['llm_evaluator_score'] = finetuning_sum/sample_count
-        scores['rag']['llm_evaluator_score'] = rag_sum/sample_count
-        scores['hybrid']['llm_evaluator_score'] = hybrid_sum/sample_count
+        per_sample_scores = [
+            self.aggregate_judge_scores({model_name: scores[i] for model_name, scores in judge_scores.items()})
+            for i in range(len(samples))
+        ]
+        if self.judge_batch_size > 1:
+            logger.info(f"Batched judging: {self.judge_batching_report()}")
 
-        return scores
+        return {
+            approach: [scores[approach] for scores in per_sample_scores]
+            for approach in ['finetuning', 'rag', 'hybrid']
+        }
 
     def calculate_scores(self,
                         finetuning_file: str,
@@ -132,8 +492,36 @@ class Evaluation:
         Returns:
             Tuple containing BERT scores and LLM evaluator scores for each approach
         """
-       
-       # Load data
+        ground_truth, llm_response_finetuning, llm_response_rag, llm_response_hybrid = self.load_responses(
+            finetuning_file, rag_file, hybrid_file
+        )
+        return self.score_samples(ground_truth, llm_response_finetuning, llm_response_rag, llm_response_hybrid)
+
+    def load_responses(self, finetuning_file: str, rag_file: str, hybrid_file: str) -> Tuple[List[str], List[str], List[str], List[str]]:
+        """
+        Load the ground truths and the responses of every approach.
+
+        Args:
+            finetuning_file: Path to finetuning results
+            rag_file: Path to RAG results
+            hybrid_file: Path to hybrid results
+
+        Returns:
+            Ground truths and finetuning, RAG and hybrid responses, aligned by record
+        """
+        if self.results_store is not None:
+            columns = {
+                approach: self.results_store.load(approach, columns=['ground_truth', 'llm_response'])
+                for approach in ['finetuning', 'rag', 'hybrid']
+            }
+            return (
+                columns['finetuning']['ground_truth'].tolist(),
+                columns['finetuning']['llm_response'].tolist(),
+                columns['rag']['llm_response'].tolist(),
+                columns['hybrid']['llm_response'].tolist()
+            )
+
+        # Load data
         finetuning_data = load_json_file(finetuning_file)
         rag_data = load_json_file(rag_file)
         hybrid_data = load_json_file(hybrid_file)
@@ -144,36 +532,206 @@ class Evaluation:
         llm_response_finetuning = [entry["llm_response"] for entry in finetuning_data]
         llm_response_rag = [entry["llm_response"] for entry in rag_data]
         llm_response_hybrid = [entry["llm_response"] for entry in hybrid_data]
+        return ground_truth, llm_response_finetuning, llm_response_rag, llm_response_hybrid
 
-                # Calculate BERT scores
+    def score_samples(self,
+                      ground_truth: List[str],
+                      llm_response_finetuning: List[str],
+                      llm_response_rag: List[str],
+                      llm_response_hybrid: List[str]) -> EvaluationResults:
+        """
+        Calculate BERT and LLM evaluator scores of the given samples.
+
+        Returns:
+            EvaluationResults of the samples, in input order
+        """
+        # Calculate BERT scores of all approaches in one pass, every ground truth is encoded once
         bert_scores = {
-            'finetuning': self.calculate_bert(ground_truth, llm_response_finetuning)['f1'],
-            'rag': self.calculate_bert(ground_truth, llm_response_rag)['f1'],
-            'hybrid': self.calculate_bert(ground_truth, llm_response_hybrid)['f1']
+            approach: scores['f1']
+            for approach, scores in self.bert_scorer.score_approaches(
+                ground_truth,
+                {
+                    'finetuning': llm_response_finetuning,
+                    'rag': llm_response_rag,
+                    'hybrid': llm_response_hybrid
+                }
+            ).items()
         }
 
         # Calculate LLM evaluator scores
-        llm_evaluator_scores = {
-            'finetuning': [],
-            'rag': [],
-            'hybrid': []
-        }
-        
-        for i in range(len(ground_truth)):
-            scores = self.calculate_llm_evaluator(
-                ground_truth[i],
-                llm_response_finetuning[i],
-                llm_response_rag[i],
-                llm_response_hybrid[i]
+        judges_consulted = None
+        if self.cascade:
+            llm_evaluator_scores, judges_consulted = self.calculate_llm_evaluator_cascade(
+                ground_truth,
+                llm_response_finetuning,
+                llm_response_rag,
+                llm_response_hybrid
             )
-            
-            llm_evaluator_scores['finetuning'].append(scores['finetuning'])
-            llm_evaluator_scores['rag'].append(scores['rag'])
-            llm_evaluator_scores['hybrid'].append(scores['hybrid'])
+        else:
+            llm_evaluator_scores = self.calculate_llm_evaluator_parallel(
+                ground_truth,
+                llm_response_finetuning,
+                llm_response_rag,
+                llm_response_hybrid
+            )
+
+        return EvaluationResults(bert_scores, llm_evaluator_scores, judges_consulted=judges_consulted)
+
+    def calculate_scores_sequential(self,
+                                    finetuning_file: str,
+                                    rag_file: str,
+                                    hybrid_file: str,
+                                    metric: str = "llm_evaluator_score",
+                                    step: int = 20,
+                                    min_samples: int = 50,
+                                    max_samples: Optional[int] = None,
+                                    confidence: float = 0.95,
+                                    n_resamples: int = 2000,
+                                    seed: int = 0,
+                                    spending: str = "obrien_fleming") -> EvaluationResults:
+        """
+        Calculate evaluation scores on a random subset of the samples, stopping as soon as the ranking
+        of the approaches is settled.
+
+        Samples are scored in a random order, step at a time. From min_samples on, paired bootstrap
+        intervals of the metric difference of every pair of approaches are computed after each step,
+        and scoring stops once all of them exclude 0, or when max_samples or the end of the data is reached.
+
+        The intervals are rechecked at every look, so 1 - confidence is split over the planned looks
+        with an alpha spending function. The probability of stopping on a ranking that is not real
+        stays below 1 - confidence over the whole run.
+
+        Args:
+            finetuning_file: Path to finetuning results
+            rag_file: Path to RAG results
+            hybrid_file: Path to hybrid results
+            metric: "llm_evaluator_score" or "bert_score", the score the ranking is decided on
+            step: Samples scored between two checks
+            min_samples: Samples scored before the first check, guards against stopping on a lucky start
+            max_samples: Sample budget, None for all samples
+            confidence: Family-wise confidence level over all pairs and looks
+            n_resamples: Bootstrap resamples per check
+            seed: Seed of the sample order and the bootstrap
+            spending: Alpha spending function over the looks, see utils.statistics.alpha_spending
+
+        Returns:
+            EvaluationResults of the scored samples, with their record indices and the stopping summary
+        """
+        if metric not in ("llm_evaluator_score", "bert_score"):
+            raise ValueError(f"Unknown early stopping metric: {metric}")
+
+        responses = self.load_responses(finetuning_file, rag_file, hybrid_file)
+        sample_count = len(responses[0])
+        budget = min(sample_count, max_samples) if max_samples else sample_count
+
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(sample_count)
 
-        return EvaluationResults(bert_scores, llm_evaluator_scores)
+        # Looks happen after every step from min_samples on, the last one at the sample budget
+        looks = [min(n, budget) for n in range(step, budget + step, step) if min(n, budget) >= min_samples]
+        look_alphas = dict(zip(looks, alpha_spending([n / budget for n in looks], 1 - confidence, spending))) if looks else {}
 
+        approaches = ['finetuning', 'rag', 'hybrid']
+        bert_scores = {approach: [] for approach in approaches}
+        llm_evaluator_scores = {approach: [] for approach in approaches}
+        judges_consulted = [] if self.cascade else None
+        sample_indices = []
+        intervals = []
+        settled = False
 
+        while len(sample_indices) < budget and not settled:
+            batch = order[len(sample_indices):min(budget, len(sample_indices) + step)].tolist()
+            results = self.score_samples(*[[texts[i] for i in batch] for texts in responses])
+            sample_indices.extend(batch)
+            for approach in approaches:
+                bert_scores[approach].extend(results.bert_scores[approach])
+                llm_evaluator_scores[approach].extend(results.llm_evaluator_scores[approach])
+            if judges_consulted is not None:
+                judges_consulted.extend(results.judges_consulted)
+
+            if len(sample_indices) < min_samples:
+                continue
+            if metric == "bert_score":
+                metric_scores = {approach: np.asarray(bert_scores[approach]) for approach in approaches}
+            else:
+                metric_scores = {
+                    approach: np.array([scores['llm_evaluator_score'] for scores in llm_evaluator_scores[approach]])
+                    for approach in approaches
+                }
+            look_confidence = 1 - look_alphas[len(sample_indices)]
+            intervals = pairwise_difference_intervals(metric_scores, n_resamples, look_confidence, rng)
+            settled = ranking_settled(intervals)
+            logger.info(f"Early stopping: {len(sample_indices)}/{sample_count} samples scored, "
+                        f"look confidence {look_confidence:.6f}, ranking settled: {settled}")
+
+        stopping = {
+            'metric': metric,
+            'samples_scored': len(sample_indices),
+            'sample_count': sample_count,
+            'ranking_settled': settled,
+            'looks': len([n for n in looks if n <= len(sample_indices)]),
+            'spending': spending,
+            'intervals': intervals,
+        }
+        logger.info(f"Early stopping summary: {stopping}")
+        return EvaluationResults(bert_scores, llm_evaluator_scores, sample_indices, stopping, judges_consulted)
+
+
+    def calculate_quick_scores(self, finetuning_file: str, rag_file: str, hybrid_file: str,
+                               output_file: Optional[str] = None) -> pd.DataFrame:
+        """
+        Quick evaluation with lexical metrics only, no BERTScore model and no judge calls.
+
+        Computes token F1, ROUGE-L, exact match and contains match against the ground truth for every
+        results file that exists, so it can run after each stage. When the records already carry a
+        bert_score from a full evaluation, the correlation of every metric with it is reported too.
+
+        Args:
+            finetuning_file: Path to finetuning results
+            rag_file: Path to RAG results
+            hybrid_file: Path to hybrid results
+            output_file: Optional CSV path for the summary
+
+        Returns:
+            One row per approach with the mean of every metric and the BERTScore correlations
+        """
+        files_data = {
+            'finetuning': finetuning_file,
+            'rag': rag_file,
+            'hybrid': hybrid_file
+        }
+
+        rows = []
+        for approach, file_path in files_data.items():
+            if not os.path.exists(file_path):
+                logger.warning(f"{file_path} not found, skipping {approach}")
+                continue
+            data = load_json_file(file_path)
+            if not data:
+                continue
+
+            scores = lexical_scores(
+                [sample["ground_truth"] for sample in data],
+                [sample["llm_response"] for sample in data]
+            )
+            row = {'approach': approach, 'samples': len(data)}
+            row.update({metric: round(float(values.mean()), 4) for metric, values in scores.items()})
+
+            scored = [i for i, sample in enumerate(data) if sample.get('bert_score') is not None]
+            if len(scored) > 2:
+                row['bert_score'] = round(float(np.mean([data[i]['bert_score'] for i in scored])), 4)
+                row.update(correlation_with(
+                    {metric: values[scored] for metric, values in scores.items()},
+                    np.array([data[i]['bert_score'] for i in scored])
+                ))
+            rows.append(row)
+
+        summary = pd.DataFrame(rows)
+        print(summary.to_string(index=False))
+        if output_file:
+            os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+            summary.to_csv(output_file, index=False)
+        return summary
 
     def save_scores(self, results: EvaluationResults, finetuning_file: str, rag_file: str, hybrid_file: str) -> None:
         """
@@ -191,12 +749,36 @@ class Evaluation:
             'hybrid': (hybrid_file, results.bert_scores['hybrid'], results.llm_evaluator_scores['hybrid'])
         }
 
+        def record_scores(bert_score, llm_scores, position):
+            scores = {"bert_score": bert_score[position], **llm_scores[position]}
+            if results.judges_consulted is not None:
+                scores["judges_consulted"] = results.judges_consulted[position]
+            return scores
+
         for approach, (file_path, bert_score, llm_scores) in files_data.items():
+            if self.results_store is not None:
+                sample_indices = results.sample_indices if results.sample_indices is not None else range(len(bert_score))
+                self.results_store.append_scores(
+                    approach,
+                    list(sample_indices),
+                    [record_scores(bert_score, llm_scores, position) for position in range(len(bert_score))]
+                )
+                continue
+
             data = load_json_file(file_path)
-            
+            sample_indices = results.sample_indices if results.sample_indices is not None else range(len(data))
+            scored = set(sample_indices)
+
+            # Records skipped by early stopping must not keep the scores of an earlier run
             for i, entry in enumerate(data):
-                entry["bert_score"] = bert_score[i]
-                entry.update(llm_scores[i])
+                if i not in scored or results.judges_consulted is None:
+                    entry.pop("judges_consulted", None)
+                if i not in scored:
+                    entry.pop("bert_score", None)
+                    entry.pop("llm_evaluator_score", None)
+
+            for position, i in enumerate(sample_indices):
+                data[i].update(record_scores(bert_score, llm_scores, position))
             
             with open(file_path, 'w', encoding='utf-8') as file:
                 json.dump(data, file, ensure_ascii=False, indent=4)
@@ -217,13 +799,25 @@ class Evaluation:
             'hybrid': hybrid_file
         }
 
+        if self.results_store is not None:
+            aggregated = self.results_store.aggregate(['bert_score', 'llm_evaluator_score'])
+            for approach in files_data:
+                if approach not in aggregated.index:
+                    continue
+                print(f"\n{approach.upper()} Scores ({aggregated.loc[approach, 'samples']} samples):")
+                print(f"BERT Score: {aggregated.loc[approach, 'bert_score']:.4f}")
+                print(f"LLM Evaluator Score: {aggregated.loc[approach, 'llm_evaluator_score']:.4f}")
+                print("--------------------")
+            return
+
         for approach, file_path in files_data.items():
-            data = load_json_file(file_path)
+            # With early stopping only part of the records are scored
+            data = [sample for sample in load_json_file(file_path) if 'bert_score' in sample]
             
             bert_score = np.mean([sample['bert_score'] for sample in data])
             llm_eval_score = np.mean([sample['llm_evaluator_score'] for sample in data])
             
-            print(f"\n{approach.upper()} Scores:")
+            print(f"\n{approach.upper()} Scores ({len(data)} samples):")
             print(f"BERT Score: {bert_score:.4f}")
             print(f"LLM Evaluator Score: {llm_eval_score:.4f}")
             print("--------------------")
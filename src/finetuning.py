@@ -1,4 +1,4 @@
-from utils.helpers import json_to_jsonl, template_and_predict, logger 
+from utils.helpers import json_to_jsonl, template_and_predict, template_and_predict_stream, build_finetuned_payload, logger, map_concurrently
 
 import sagemaker
 
@@ -6,6 +6,7 @@ from sagemaker import Session
 from sagemaker import Predictor
 from sagemaker.s3 import S3Uploader
 from sagemaker.s3 import S3Downloader
+from sagemaker.utils import name_from_base
 from sagemaker.jumpstart.estimator import JumpStartEstimator
 from sagemaker.jumpstart.model import JumpStartModel
 from sagemaker.session import Session
@@ -14,6 +15,8 @@ from sagemaker.exceptions import UnexpectedStatusException
 from sagemaker.serializers import JSONSerializer
 from sagemaker.deserializers import JSONDeserializer
 
+from botocore.config import Config
+
 import os, json, boto3, time, shutil
 from datetime import datetime, timezone, timedelta
 
@@ -32,6 +35,9 @@ class Finetuning():
         bucket_name (str): S3 bucket name for storing training data and model artifacts
         template (dict): Template configuration for model input/output formatting
         num_epoch (int): Number of training epochs
+        max_workers (int): Number of concurrent requests sent to the endpoint during evaluation
+        streaming (bool): Whether endpoint responses are streamed, recording time-to-first-token
+        stop_sequences (list): Sequences that end generation early
         role_arn (str): ARN of the IAM role used for SageMaker execution
     """
     def __init__(self, bedrock_region: str, 
@@ -41,7 +47,10 @@ class Finetuning():
                 bucket_name: str,
                 template: dict,
                 num_epoch: int,
-                finetuning_instance:str
+                finetuning_instance:str,
+                max_workers: int = 1,
+                streaming: bool = False,
+                stop_sequences: list = None
                 ):
         self.bedrock_region = bedrock_region
         self.finetuning_method = finetuning_method
@@ -51,6 +60,10 @@ class Finetuning():
         self.template = template
         self.num_epoch = num_epoch
         self.finetuning_instance = finetuning_instance
+        self.max_workers = max_workers
+        self.streaming = streaming
+        self.stop_sequences = stop_sequences
+        self.requests_per_second = None
     
 
         
@@ -209,16 +222,15 @@ class Finetuning():
         
         print(f"Model information saved to data/output/model_info/{self.model_name}_info.json")
 
-    def create_endpoint_from_saved_model(self, model_name: str) -> Predictor:
+    def load_saved_model(self, model_name: str) -> JumpStartModel:
         """
-        Create an endpoint using previously saved model artifacts.
-        
+        Build a JumpStart model from the artifacts recorded in data/output/model_info.
+
         Args:
-            model_name (str): Name of the saved model to deploy
-            
+            model_name (str): Name of the saved model
+
         Returns:
-            sagemaker.predictor.Predictor: Predictor object for the deployed endpoint
-            
+            sagemaker.jumpstart.model.JumpStartModel: Model object, not deployed yet
         """
         # Load model information
         with open(f'data/output/model_info/{model_name}_info.json', 'r') as f:
@@ -229,14 +241,28 @@ class Finetuning():
             TrainingJobName=model_info['training_job_name']
         )
 
-        model = JumpStartModel(
+        return JumpStartModel(
             model_id=model_info['model_id'],
             model_version='2.2.2',
             region=self.bedrock_region,
             model_data={"S3DataSource": model_info['model_data_url']['S3DataSource']},
-            role = self.role_arn
+            role = self.role_arn,
+            sagemaker_session = self.sagemaker_session
         )
 
+    def create_endpoint_from_saved_model(self, model_name: str) -> Predictor:
+        """
+        Create an endpoint using previously saved model artifacts.
+        
+        Args:
+            model_name (str): Name of the saved model to deploy
+            
+        Returns:
+            sagemaker.predictor.Predictor: Predictor object for the deployed endpoint
+            
+        """
+        model = self.load_saved_model(model_name)
+
         endpoint_name = f'{model_name}-endpoint'.replace('_', '-')
 
         # Deploy the model
@@ -370,12 +396,93 @@ class Finetuning():
             print(f"Error deleting endpoint: {str(e)}")
             raise
 
+    def create_predictor(self, endpoint_name: str, max_workers: int = None) -> Predictor:
+        """
+        Create a Predictor whose sagemaker-runtime client has a connection pool sized for the workers.
+
+        Args:
+            endpoint_name (str): Name of the deployed model endpoint
+            max_workers (int, optional): Number of threads sharing the predictor. Defaults to self.max_workers.
+
+        Returns:
+            sagemaker.predictor.Predictor: Predictor object for the endpoint
+        """
+        config = Config(
+            connect_timeout=300,
+            read_timeout=300,
+            max_pool_connections=max(10, max_workers or self.max_workers)
+        )
+        sagemaker_runtime_client = boto3.client("sagemaker-runtime", region_name=self.bedrock_region, config=config)
+        sagemaker_session = Session(
+            boto_session=boto3.Session(region_name=self.bedrock_region),
+            sagemaker_client=self.sagemaker_client,
+            sagemaker_runtime_client=sagemaker_runtime_client
+        )
+        return Predictor(
+            endpoint_name=endpoint_name,
+            sagemaker_session=sagemaker_session,
+            serializer=JSONSerializer(),
+            deserializer=JSONDeserializer(),
+        )
+
+    def predict(self, predictor: Predictor, template: dict, question: str, context: str, ground_truth: str) -> tuple:
+        """
+        Send a templated question to the endpoint, streaming the response if enabled.
+
+        Args:
+            predictor (sagemaker.predictor.Predictor): Predictor object for model endpoint
+            template (dict): Prompt template
+            question (str): Question of the test record
+            context (str): Retrieved context, empty for the finetuning-only approach
+            ground_truth (str): Reference answer
+
+        Returns:
+            tuple: The prompt text, the ground truth and the endpoint response. Streamed responses also
+            carry time-to-first-token and decode metrics under "metrics".
+        """
+        if self.streaming:
+            return template_and_predict_stream(predictor, template, question, context, ground_truth, self.stop_sequences)
+        return template_and_predict(predictor, template, question, context, ground_truth)
+
+    def evaluate_question(self, predictor: Predictor, product_data: dict) -> dict:
+        """
+        Send a single test question to the finetuned model.
+
+        Args:
+            predictor (sagemaker.predictor.Predictor): Predictor object for model endpoint
+            product_data (dict): Test record with "question" and "answer" fields
+
+        Returns:
+            dict: The result record, including the inference time of the request
+        """
+        question = product_data.get("question")
+        ground_truth = product_data.get("answer")
+        start_time = time.time()
+        input_text, ground_truth, llm_response = self.predict(predictor, self.template, question, "", ground_truth)
+        end_time = time.time()
+        stream_metrics = llm_response.get('metrics', {}) if isinstance(llm_response, dict) else {}
+        try:
+            llm_response  = llm_response['generated_text']
+        except Exception as e:
+            logger.error("Error! Llm response does not have generated_text field")
+
+        results_dict = {
+            'input_text': input_text,
+            'ground_truth': ground_truth,
+            'llm_response': llm_response,
+            'inference_time': end_time - start_time,
+        }
+        results_dict.update(stream_metrics)
+        return results_dict
+
     def evaluate_finetuned_model(self,predictor,endpoint_name):
         """
         Test the finetuned model with test dataset.
 
         Can work with either a predictor object or an endpoint name.
-        Processes test data and saves results to a JSON file.
+        Processes test data and saves results to a JSON file. With max_workers > 1 the requests are
+        sent from a thread pool sharing one sagemaker-runtime client, and the achieved requests/s is
+        logged and kept in self.requests_per_second.
 
         Args:
             predictor (sagemaker.predictor.Predictor, optional): Predictor object for model endpoint
@@ -384,51 +491,153 @@ class Finetuning():
         Note:
             Either predictor or endpoint_name must be provided
         """
-
-        counter = 1
         test_data_path = f"data/{self.finetuning_method}/test.jsonl"
 
         if predictor is None and endpoint_name is not None:
-            # Create a Predictor instance
-            predictor = Predictor(
-                endpoint_name=endpoint_name,
-                serializer=JSONSerializer(),  
-                deserializer=JSONDeserializer(),
-            )
+            predictor = self.create_predictor(endpoint_name)
+        elif self.max_workers > 1:
+            # The default client only keeps 10 connections, rebuild it with a pool sized to the workers
+            predictor = self.create_predictor(predictor.endpoint_name)
 
-           
         with open(test_data_path, 'r') as file:
-            results = []
-            inference_times = []
-            for line in file:
-                step_start_1 = time.time()
-                # Parse each line as a JSON object
-                product_data = json.loads(line)
-                
-                question = product_data.get("question")
-                ground_truth = product_data.get("answer")
-                start_time = time.time() 
-                input_text, ground_truth, llm_response = template_and_predict(predictor, self.template, question,"", ground_truth)
-                end_time = time.time()
-                inference_time = end_time - start_time
-                inference_times.append(inference_time)
-                try:
-                    llm_response  = llm_response['generated_text']
-                except Exception as e:
-                    logger.Error("Error! Llm response does not have generated_text field")
-
-                results_dict = {
-                    'input_text': input_text,
-                    'ground_truth': ground_truth,
-                    'llm_response': llm_response,
-                }
-                results.append(results_dict)
+            test_data = [json.loads(line) for line in file if line.strip()]
+
+        start_time = time.time()
+        results = map_concurrently(
+            lambda product_data: self.evaluate_question(predictor, product_data),
+            test_data,
+            self.max_workers
+        )
+        wall_time = time.time() - start_time
+
+        inference_times = [result['inference_time'] for result in results]
         avg_inference_time = sum(inference_times)/ len(inference_times)
+        self.requests_per_second = len(results) / wall_time
+        logger.info(
+            f"Finetuned model: {len(results)} requests in {wall_time:.2f} seconds with {self.max_workers} workers, "
+            f"{self.requests_per_second:.2f} requests/s, average latency {avg_inference_time:.2f} seconds"
+        )
 
         with open( f"data/output/{self.finetuning_method}_results.json", 'w') as json_file:
             json.dump(results, json_file, indent=4)
         
         
         return avg_inference_time
-        
-                
+
+    def run_batch_transform(self, model_name: str, payloads: list, job_name: str,
+                            instance_count: int = 1, max_concurrent_transforms: int = 4,
+                            instance_type: str = None) -> list:
+        """
+        Run endpoint payloads through a SageMaker Batch Transform job instead of a real-time endpoint.
+
+        Args:
+            model_name (str): Name of the saved model, see save_model_info
+            payloads (list): Endpoint payloads, one per record
+            job_name (str): Prefix of the S3 locations and the transform job name
+            instance_count (int): Number of transform instances
+            max_concurrent_transforms (int): Concurrent requests sent to the container of each instance
+            instance_type (str, optional): Transform instance type. Defaults to the finetuning instance.
+
+        Returns:
+            list: Generated text of every payload, in input order
+        """
+        local_input = f"data/{self.finetuning_method}/{job_name}_input.jsonl"
+        with open(local_input, 'w') as f:
+            for payload in payloads:
+                json.dump(payload, f)
+                f.write('\n')
+
+        s3_prefix = f"s3://{self.bucket_name}/{self.finetuning_method}/batch_transform/{job_name}"
+        input_location = S3Uploader.upload(local_input, f"{s3_prefix}/input", sagemaker_session=self.sagemaker_session)
+
+        model = self.load_saved_model(model_name)
+        transformer = model.transformer(
+            instance_count=instance_count,
+            instance_type=instance_type or self.finetuning_instance,
+            strategy="SingleRecord",
+            assemble_with="Line",
+            accept="application/json",
+            max_concurrent_transforms=max_concurrent_transforms,
+            output_path=f"{s3_prefix}/output",
+        )
+        transformer.transform(
+            data=input_location,
+            content_type="application/json",
+            split_type="Line",
+            job_name=name_from_base(job_name.replace('_', '-')),
+            wait=True,
+            logs=False,
+        )
+
+        # Each output line holds the response to the input line at the same position
+        output = S3Downloader.read_file(
+            f"{s3_prefix}/output/{os.path.basename(local_input)}.out",
+            sagemaker_session=self.sagemaker_session
+        )
+        generated_texts = []
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            response = json.loads(line)
+            if isinstance(response, list):
+                response = response[0]
+            generated_texts.append(response.get('generated_text', ''))
+
+        if len(generated_texts) != len(payloads):
+            raise ValueError(f"Batch transform returned {len(generated_texts)} responses for {len(payloads)} records")
+        return generated_texts
+
+    def evaluate_finetuned_model_batch_transform(self, model_name: str = None, instance_count: int = 1,
+                                                 max_concurrent_transforms: int = 4, instance_type: str = None):
+        """
+        Test the finetuned model with the test dataset through SageMaker Batch Transform.
+
+        Uses the model recorded in data/output/model_info/<model_name>_info.json, so no real-time endpoint is
+        needed. Writes the same results file as evaluate_finetuned_model.
+
+        Args:
+            model_name (str, optional): Name of the saved model. Defaults to self.model_name.
+            instance_count (int): Number of transform instances
+            max_concurrent_transforms (int): Concurrent requests sent to the container of each instance
+            instance_type (str, optional): Transform instance type. Defaults to the finetuning instance.
+
+        Returns:
+            float: Wall time of the transform job divided by the number of records
+        """
+        test_data_path = f"data/{self.finetuning_method}/test.jsonl"
+        with open(test_data_path, 'r') as file:
+            test_data = [json.loads(line) for line in file if line.strip()]
+
+        prompts, payloads = [], []
+        for product_data in test_data:
+            inputs, payload = build_finetuned_payload(self.template, product_data.get("question"), "")
+            prompts.append(inputs)
+            payloads.append(payload)
+
+        start_time = time.time()
+        generated_texts = self.run_batch_transform(
+            model_name or self.model_name,
+            payloads,
+            f"{self.finetuning_method}_eval",
+            instance_count,
+            max_concurrent_transforms,
+            instance_type
+        )
+        wall_time = time.time() - start_time
+
+        results = [
+            {
+                'input_text': inputs,
+                'ground_truth': product_data.get("answer"),
+                'llm_response': llm_response,
+            }
+            for inputs, product_data, llm_response in zip(prompts, test_data, generated_texts)
+        ]
+        self.requests_per_second = len(results) / wall_time
+        logger.info(f"Batch transform: {len(results)} records in {wall_time:.2f} seconds, {self.requests_per_second:.2f} records/s")
+
+        os.makedirs("data/output", exist_ok=True)
+        with open( f"data/output/{self.finetuning_method}_results.json", 'w') as json_file:
+            json.dump(results, json_file, indent=4)
+
+        return wall_time / len(results)
@@ -7,7 +7,9 @@ from utils.bedrock import BedrockHandler
 
 import os, json, boto3, glob, time
 
-from utils.helpers import json_to_jsonl, template_and_predict
+from utils.helpers import json_to_jsonl, template_and_predict, build_finetuned_payload, run_pipeline, logger
+from utils.latency import StageTimer
+from utils.routing import ScoreRouter
 
 from botocore.config import Config
 from sagemaker import Session
@@ -26,10 +28,23 @@ class Hybrid():
                 finetuning_obj,
                 knowledge_base_id,
                 model_id,
-                template
+                template,
+                pipeline: bool = False,
+                queue_depth: int = 8,
+                retrieval_workers: int = 1,
+                generation_workers: int = 1,
+                router: ScoreRouter = None
                 ):
         """
-
+        Initialize the Hybrid evaluation.
+
+        Args:
+            pipeline (bool): Overlap retrieval of upcoming questions with endpoint generation.
+            queue_depth (int): Maximum number of retrieved contexts waiting for generation.
+            retrieval_workers (int): Concurrent knowledge base retrievals in pipeline mode.
+            generation_workers (int): Concurrent endpoint requests in pipeline mode.
+            router (ScoreRouter, optional): Chooses no, trimmed or full context per question from the
+                retrieval scores. None always sends the full context.
         """
         self.predictor = predictor
         self.endpoint_name = endpoint_name
@@ -37,12 +52,105 @@ class Hybrid():
         self.finetuning_obj = finetuning_obj
         self.knowledge_base_id = knowledge_base_id
         self.template = template
+        self.pipeline = pipeline
+        self.queue_depth = queue_depth
+        self.retrieval_workers = retrieval_workers
+        self.generation_workers = generation_workers if pipeline else 1
+        self.router = router
 
         self.bedrock_handler = BedrockHandler(
             self.rag_obj.bedrock_runtime, model_id
         )
 
 
+    def retrieve_context(self, product_data: dict, docs: list = None, retrieve_time: float = None) -> dict:
+        """
+        Retrieval stage of a hybrid request: retrieve the documents and assemble the context.
+
+        Args:
+            product_data (dict): Test record with "question" and "answer" keys
+            docs (list, optional): Documents already retrieved for the question, skips retrieval
+            retrieve_time (float, optional): Time it took to retrieve docs, reported as the retrieve stage
+
+        Returns:
+            dict: "context", the StageTimer "timer" of the request and, with a router, "routing"
+        """
+        question = product_data.get("question")
+        timer = StageTimer()
+        if docs is None:
+            with timer.stage('retrieve'):
+                docs = self.rag_obj.retrieve(self.knowledge_base_id, question)
+        else:
+            timer.timings['retrieve'] = retrieve_time or 0.0
+        routing = {}
+        with timer.stage('context_assembly'):
+            if self.router is not None:
+                route, routed_docs = self.router.route(docs)
+                routing = {
+                    'route': route,
+                    'context_tokens': self.router.context_tokens(routed_docs),
+                    'tokens_saved': self.router.context_tokens(docs) - self.router.context_tokens(routed_docs)
+                }
+                docs = routed_docs
+            context = self.rag_obj.assemble_context(docs, self.finetuning_obj.model_id) if docs else ""
+        return {'context': context, 'timer': timer, 'routing': routing}
+
+    def generate(self, product_data: dict, retrieved: dict) -> dict:
+        """
+        Generation stage of a hybrid request: call the finetuned endpoint with the retrieved context.
+
+        Args:
+            product_data (dict): Test record with "question" and "answer" keys
+            retrieved (dict): Output of retrieve_context
+
+        Returns:
+            dict: Result record. "inference_time" is the sum of the stage timings, time spent waiting in
+            the pipeline queue is not included.
+        """
+        question = product_data.get("question")
+        ground_truth = product_data.get("answer")
+        context = retrieved['context']
+        timer = retrieved['timer']
+
+        with timer.stage('model_call'):
+            input_text, ground_truth, llm_response = self.finetuning_obj.predict(self.predictor, self.template, question, context, ground_truth)
+        with timer.stage('response_parsing'):
+            stream_metrics = llm_response.get('metrics', {}) if isinstance(llm_response, dict) else {}
+            try:
+                llm_response  = llm_response['generated_text']
+            except Exception as e:
+                logger.error("Error! Llm responce does not have generated_text field")
+
+        results_dict = {
+            'input_text': input_text,
+            'ground_truth': ground_truth,
+            'llm_response': llm_response,
+            'context': context,
+            'stage_timings': timer.timings,
+            'inference_time': timer.total()
+        }
+        results_dict.update(retrieved.get('routing', {}))
+        results_dict.update(stream_metrics)
+        if 'route' in results_dict:
+            logger.info(f"Hybrid route: {results_dict['route']}, {results_dict['tokens_saved']} context tokens saved, {results_dict['inference_time']:.2f} seconds")
+        return results_dict
+
+    def log_routing_summary(self, results: list) -> dict:
+        """
+        Log how the router split the questions and estimate the latency it saved.
+
+        Args:
+            results (list): Hybrid result records, "latency_saved" is added to every routed record.
+
+        Returns:
+            dict: Routing summary, empty without a router.
+        """
+        if self.router is None:
+            return {}
+        summary = self.router.summarize(results)
+        logger.info(f"Hybrid routing summary: {summary}")
+        return summary
+
     def evaluate_hybrid_model(self):
         test_data_dir = f"data/test/"
         json_files = glob.glob(os.path.join(test_data_dir, "*.json"))
@@ -50,59 +158,95 @@ class Hybrid():
             raise ValueError("There should be exactly one JSON file in the directory.")
         test_data = json_files[0]
 
-        config = Config(
-            connect_timeout=300,  # Time in seconds to establish the connection
-            read_timeout=300     # Time in seconds to wait for a response
-        )
-
-       # Create a SageMaker runtime client with the custom configuration
-        sagemaker_runtime_client = boto3.client("sagemaker-runtime", config=config)
-
-        # Initialize the SageMaker session with the customized runtime client
-        sagemaker_session = Session(sagemaker_runtime_client=sagemaker_runtime_client)
-
         if self.predictor is None and self.endpoint_name is not None:
             # Create a Predictor instance
             print("Predictor is created using endpoint")
-            self.predictor = Predictor(
-                endpoint_name=self.endpoint_name,
-                sagemaker_session=sagemaker_session,
-                serializer=JSONSerializer(),  
-                deserializer=JSONDeserializer(),
-            )
+            self.predictor = self.finetuning_obj.create_predictor(self.endpoint_name, self.generation_workers)
+        elif self.pipeline and self.generation_workers > 1 and self.predictor is not None:
+            # Size the connection pool for the generation workers
+            self.predictor = self.finetuning_obj.create_predictor(self.predictor.endpoint_name, self.generation_workers)
 
         with open(test_data, 'r') as file:
             data = json.load(file)
-            results = []
-            inference_times = []
-            for product_data in data:
-                # Parse each line as a JSON object
-                question = product_data.get("question")
-                ground_truth = product_data.get("answer")
-
-                start_time = time.time()
-                context = self.rag_obj.get_context(self.knowledge_base_id, question)
-                input_text, ground_truth, llm_response = template_and_predict(self.predictor, self.template, question, context, ground_truth)
-                end_time = time.time()
-                inference_time = end_time - start_time
-                inference_times.append(inference_time)
-                try:
-                    llm_response  = llm_response['generated_text']
-                except Exception as e:
-                    logger.error("Error! Llm responce does not have generated_text field")
-
-
-                results_dict = {
-                    'input_text': input_text,
-                    'ground_truth': ground_truth,
-                    'llm_response': llm_response,
-                    'context': context
-                }
-                results.append(results_dict)
 
+        start_time = time.perf_counter()
+        if self.pipeline:
+            # Retrieval of the next questions overlaps with generation of the current ones
+            results = run_pipeline(
+                data,
+                self.retrieve_context,
+                self.generate,
+                queue_depth = self.queue_depth,
+                producer_workers = self.retrieval_workers,
+                consumer_workers = self.generation_workers
+            )
+        else:
+            results = [self.generate(product_data, self.retrieve_context(product_data)) for product_data in data]
+        wall_time = time.perf_counter() - start_time
+
+        inference_times = [result['inference_time'] for result in results]
         avg_inference_time = sum(inference_times)/ len(inference_times)
-                    
+        self.log_routing_summary(results)
+        logger.info(f"INFO - Hybrid evaluation wall time: {wall_time:.2f} seconds, sum of request latencies: {sum(inference_times):.2f} seconds")
+
         with open( f"data/output/hybrid_results.json", 'w') as json_file:
             json.dump(results, json_file, indent=4)
         return avg_inference_time
-        
+
+    def evaluate_hybrid_model_batch_transform(self, model_name: str = None, instance_count: int = 1,
+                                              max_concurrent_transforms: int = 4, instance_type: str = None):
+        """
+        Evaluate the hybrid approach through SageMaker Batch Transform, without a real-time endpoint.
+
+        Contexts are retrieved up front (served from the retrieval cache after the RAG evaluation) and
+        the prompts are generated by the saved finetuned model in a transform job.
+
+        Args:
+            model_name (str, optional): Name of the saved finetuned model. Defaults to the finetuning model name.
+            instance_count (int): Number of transform instances
+            max_concurrent_transforms (int): Concurrent requests sent to the container of each instance
+            instance_type (str, optional): Transform instance type. Defaults to the finetuning instance.
+
+        Returns:
+            float: Wall time of retrieval and the transform job divided by the number of records
+        """
+        test_data_dir = f"data/test/"
+        json_files = glob.glob(os.path.join(test_data_dir, "*.json"))
+        if len(json_files) != 1:
+            raise ValueError("There should be exactly one JSON file in the directory.")
+        with open(json_files[0], 'r') as file:
+            data = json.load(file)
+
+        start_time = time.time()
+        contexts, prompts, payloads = [], [], []
+        for product_data in data:
+            question = product_data.get("question")
+            context = self.rag_obj.get_context(self.knowledge_base_id, question, self.finetuning_obj.model_id)
+            inputs, payload = build_finetuned_payload(self.template, question, context)
+            contexts.append(context)
+            prompts.append(inputs)
+            payloads.append(payload)
+
+        generated_texts = self.finetuning_obj.run_batch_transform(
+            model_name or self.finetuning_obj.model_name,
+            payloads,
+            "hybrid_eval",
+            instance_count,
+            max_concurrent_transforms,
+            instance_type
+        )
+        wall_time = time.time() - start_time
+
+        results = [
+            {
+                'input_text': inputs,
+                'ground_truth': product_data.get("answer"),
+                'llm_response': llm_response,
+                'context': context
+            }
+            for inputs, product_data, llm_response, context in zip(prompts, data, generated_texts, contexts)
+        ]
+
+        with open( f"data/output/hybrid_results.json", 'w') as json_file:
+            json.dump(results, json_file, indent=4)
+        return wall_time / len(results)
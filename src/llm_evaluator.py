@@ -1,6 +1,13 @@
 import os, json, boto3,re, json
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception
 from utils.bedrock import BedrockHandler
 from utils.helpers import logger
+from utils.rate_limiter import is_throttling_exception
+from utils.judge_cache import JudgeCache
+
+# A number followed by a closing quote it never opened, e.g. 0.5". Fully quoted numbers such as "0.5"
+# are valid JSON and are converted by float()
+DANGLING_QUOTE = re.compile(r'(?<![\d."])(\d+(?:\.\d+)?)"(?=\s*[,}])')
 
 class LLMEvaluator:
     """
@@ -9,12 +16,67 @@ class LLMEvaluator:
     approaches: fine-tuning, RAG, and hybrid (finetuned model combined with rag) methods.
     """
 
-    def __init__(self, bedrock_runtime):
+    def __init__(self, bedrock_runtime, judge_cache: JudgeCache = None):
         """
         Initialize the LLM Evaluatior class with required configurations.
-        
+
+        Args:
+            bedrock_runtime: Bedrock runtime client
+            judge_cache (JudgeCache, optional): Persistent store of judge responses, judged prompts are not sent again
         """
         self.bedrock_runtime = bedrock_runtime
+        self.judge_cache = judge_cache
+
+    @retry(
+        retry=retry_if_exception(is_throttling_exception),
+        wait=wait_exponential(multiplier=1, min=2, max=30),
+        stop=stop_after_attempt(5),
+        reraise=True
+    )
+    def safe_invoke_model(self, bedrock_handler, messages):
+        return bedrock_handler.invoke_model(messages)
+
+    def get_judge_response(self, model_id, prompt):
+        """
+        Returns the judge response text of a prompt, from the judge cache if it was judged before.
+
+        Args:
+            model_id (str): The identifier of the Bedrock model to use as judge.
+            prompt (str): The prompt instructing the judge model how to evaluate.
+
+        Returns:
+            str: Text of the judge response.
+        """
+        if self.judge_cache is not None:
+            response_text = self.judge_cache.get(model_id, prompt)
+            if response_text is not None:
+                return response_text
+
+        bedrock_handler = BedrockHandler(
+            self.bedrock_runtime, model_id
+        )
+
+        message = [{
+            "role": "user",
+            "content": [{"text": f"Question: {prompt}"}],
+        }]
+        
+        response = self.safe_invoke_model(bedrock_handler, message)
+
+        response_text = response['output']['message']['content'][0]['text']
+
+        if self.judge_cache is not None:
+            self.judge_cache.put(model_id, prompt, response_text)
+        return response_text
+
+    @staticmethod
+    def _parse_score(json_object, key):
+        """Score under key as float, -1 if it is missing or not a number."""
+        try:
+            return float(json_object[key])
+        except (KeyError, TypeError, ValueError):
+            logger.error(f"Missing or invalid {key} in judge response: {json_object}")
+            return -1
 
     def evaluate(self,model_id, finetuning_text, rag_text, hybrid_text, ground_truth, prompt, pattern):
         """
@@ -41,18 +103,10 @@ class LLMEvaluator:
             The scoring pattern and scale should be clearly defined in the evaluation
             prompt to ensure consistent and meaningful results.
         """
-        bedrock_handler = BedrockHandler(
-            self.bedrock_runtime, model_id
-        )
-
-        message = [{
-            "role": "user",
-            "content": [{"text": f"Question: {prompt}"}],
-        }]
-        
-        response = bedrock_handler.invoke_model(message)
+        response_text = self.get_judge_response(model_id, prompt)
 
-        response_text = response['output']['message']['content'][0]['text']
+        # Reported when the response cannot be parsed
+        finetuning_score = rag_score = hybrid_score = -1
 
         scores = re.search(pattern, response_text, re.DOTALL)
 
@@ -68,31 +122,70 @@ class LLMEvaluator:
             # Fix common JSON formatting issues
             json_string = re.sub(r'"}*\s*$', '"}', json_string)  # Fix extra quotes at the end
             json_string = re.sub(r'"\s*,\s*}', '"}', json_string)  # Fix trailing comma
-            json_string = re.sub(r'(\d+)"(?=\s*[,}])', r'\1', json_string)  # Fix quoted numbers
+            json_string = DANGLING_QUOTE.sub(r'\1', json_string)  # Fix a dangling quote after a number, e.g. 0.5"
 
 
             try:
                 json_object = json.loads(json_string)
 
-                # Extract scores
-                finetuning_score = json_object.get('text1_score')
-                rag_score = json_object.get('text2_score')
-                hybrid_score = json_object.get('text3_score')
+                # Extract scores, a missing or non-numeric score keeps the -1 sentinel
+                finetuning_score, rag_score, hybrid_score = (
+                    self._parse_score(json_object, key) for key in ('text1_score', 'text2_score', 'text3_score')
+                )
 
             except IndexError as e:
-                logger.error("Error accessing the scores:", e)
+                logger.error(f"Error accessing the scores: {e}")
                 logger.error(f"Response text: {response_text}")
             except json.JSONDecodeError as e:
-                logger.error("Error parsing JSON:", e)
+                logger.error(f"Error parsing JSON: {e}")
                 logger.error(f"JSON string: {json_string}")
-                finetuning_score = rag_score = hybrid_score = -1
 
 
         else:
             logger.error("No matches found.")
-            logger.error(f"Scores: {scores}")
-            logger.error(f"Message: {message}")
-            logger.error(f"Response: {response}")
+            logger.error(f"Model ID: {model_id}")
             logger.error(f"Response text: {response_text}")
 
         return finetuning_score, rag_score, hybrid_score
+
+    def evaluate_batch(self, model_id, prompt, pattern, sample_count):
+        """
+        Judge several samples with one request.
+
+        The judge is asked for a list of {"sample": i, "text1_score": ..., "text2_score": ..., "text3_score": ...}
+        objects, one per sample and indexed from 1, surrounded by the markers of pattern.
+
+        Args:
+            model_id (str): The identifier of the Bedrock model to use as judge.
+            prompt (str): The batched judge prompt.
+            pattern (str): Regular expression pattern to extract the score list from the judge's response.
+            sample_count (int): Number of samples in the prompt.
+
+        Returns:
+            list: Per sample, a (finetuning_score, rag_score, hybrid_score) tuple, or None if the scores
+            of that sample are missing or cannot be parsed.
+        """
+        response_text = self.get_judge_response(model_id, prompt)
+        scores = [None] * sample_count
+
+        match = re.search(pattern, response_text, re.DOTALL)
+        if not match:
+            logger.error(f"No matches found in batched judge response of {model_id}")
+            return scores
+
+        # Parse every object on its own, so one malformed entry does not lose the whole batch
+        for json_string in re.findall(r'\{[^{}]*\}', match.group(1)):
+            json_string = re.sub(r'\s+', ' ', json_string).replace("'", '"')
+            json_string = re.sub(r',\s*}', '}', json_string)  # Fix trailing comma
+            json_string = DANGLING_QUOTE.sub(r'\1', json_string)  # Fix a dangling quote after a number
+            try:
+                # Quoted numbers are converted by float()
+                json_object = json.loads(json_string)
+                index = int(json_object['sample']) - 1
+                sample_scores = tuple(float(json_object[key]) for key in ('text1_score', 'text2_score', 'text3_score'))
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                logger.error(f"Error parsing batched judge scores: {json_string}")
+                continue
+            if 0 <= index < sample_count:
+                scores[index] = sample_scores
+        return scores
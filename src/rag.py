@@ -3,36 +3,55 @@ import json
 import botocore
 from typing import Optional
 import os, boto3, time, glob
+from botocore.config import Config
 from utils.bedrock import BedrockHandler, KBHandler
+from utils.helpers import map_concurrently
+from utils.retrieval_cache import RetrievalCache
+from utils.context import ContextAssembler
+from utils.latency import StageTimer
+from utils.rate_limiter import is_throttling_exception
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception, retry_if_exception_type
 from datetime import datetime, timezone, timedelta
 
 
-def is_throttling_exception(e):
-    return isinstance(e, botocore.exceptions.ClientError) and e.response['Error']['Code'] in [
-        'ThrottlingException', 'TooManyRequestsException'
-    ]
-
-
 class Rag:
     """
     A class to implement RAG with Knowledge Bases.
     """
-    def __init__(self, bedrock_region: str, kb_configs: dict, rag_template: dict):
+    def __init__(self, bedrock_region: str, kb_configs: dict, rag_template: dict, max_workers: int = 1,
+                 retrieval_cache_size: int = 1024, retrieval_cache_dir: Optional[str] = None, kb_client=None,
+                 context_assembler: Optional[ContextAssembler] = None, streaming: bool = False):
         """
         Initialize the RAG class with required configurations.
         
         Args:
             bedrock_region (str): AWS region for Bedrock.
             kb_configs (dict): Knowledge base configuration parameters.
+            rag_template (dict): Prompt template used for RAG.
+            max_workers (int): Number of test questions evaluated concurrently. 1 runs them serially.
+            retrieval_cache_size (int): Number of retrieval results kept in memory.
+            retrieval_cache_dir (str, optional): Directory for persisting retrieval results across runs. Defaults to None.
+            kb_client (optional): Client used for retrieval instead of bedrock-agent-runtime,
+                e.g. a utils.local_retriever.LocalKnowledgeBase. Defaults to None.
+            context_assembler (ContextAssembler, optional): De-duplicates and packs retrieved chunks into the
+                token budget of the target model. Defaults to None, which concatenates all chunks.
+            streaming (bool): Generate with converse_stream and record time-to-first-token metrics. Defaults to False.
         """
+        self.max_workers = max_workers
+        self.retrieval_cache = RetrievalCache(retrieval_cache_size, retrieval_cache_dir)
+        self._retrievers = {}
+        self.context_assembler = context_assembler
+        self.streaming = streaming
+
+        # botocore keeps 10 pooled connections by default, size the pool to the worker count
+        client_config = Config(max_pool_connections=max(10, max_workers))
 
-        self.bedrock_agent_runtime_client = boto3.client(
-            service_name="bedrock-agent-runtime", region_name=bedrock_region
+        self.bedrock_agent_runtime_client = kb_client or boto3.client(
+            service_name="bedrock-agent-runtime", region_name=bedrock_region, config=client_config
         )
 
         self.bedrock_runtime = boto3.client(
-            service_name="bedrock-runtime", region_name=bedrock_region
+            service_name="bedrock-runtime", region_name=bedrock_region, config=client_config
         )
 
         self.bedrock_agent = boto3.client(
@@ -65,6 +84,8 @@ class Rag:
             
             # Check if job recently succeeded
             if latest_job['status'] == 'SUCCEEDED':
+                if self.retrieval_cache.sync_ingestion_job(knowledge_base_id, latest_job['ingestionJobId']):
+                    print("Retrieval cache invalidated after new ingestion job")
                 job_end_time = latest_job.get('completionTime', datetime.now(timezone_offset))  # Note: different key name
                 if isinstance(job_end_time, str):
                     job_end_time = datetime.fromisoformat(job_end_time.replace('Z', '+00:00')).astimezone(timezone_offset)
@@ -91,6 +112,7 @@ class Rag:
                     
                     if status == 'SUCCEEDED':
                         print("Knowledge base sync completed successfully")
+                        self.retrieval_cache.sync_ingestion_job(knowledge_base_id, latest_job['ingestionJobId'])
                         return True
                     elif status in ['FAILED', 'CANCELLED']:
                         print(f"Ingestion job failed with status: {status}")
@@ -108,31 +130,88 @@ class Rag:
             print(f"Error checking sync status: {str(e)}")
             return False
 
-    def get_context(self, kb_id: str, prompt: str) -> str:
+    def get_retriever(self, kb_id: str) -> KBHandler:
+        """
+        Returns the KB Handler of a knowledge base, creating it on first use.
+
+        Args:
+            kb_id (str): Knowledge base ID.
+
+        Returns:
+            KBHandler: Retriever for the knowledge base.
+        """
+        if kb_id not in self._retrievers:
+            self._retrievers[kb_id] = KBHandler(
+                self.bedrock_agent_runtime_client, self.kb_configs, kb_id=kb_id
+            )
+        return self._retrievers[kb_id]
+
+    def retrieve(self, kb_id: str, prompt: str) -> list[dict]:
+        """
+        Retrieves the relevant documents for the prompt, serving repeated queries from the retrieval cache.
+
+        Args:
+            kb_id (str): Knowledge base ID.
+            prompt (str): User prompt for retrieval.
+
+        Returns:
+            list[dict]: Retrieved documents in the knowledge base "retrievalResults" format.
+        """
+        # A local index is rebuilt without an ingestion job, key its cache entries by the index content
+        index_key = getattr(self.bedrock_agent_runtime_client, "index_key", None)
+        cache_kb_id = f"{kb_id}-{index_key}" if index_key else kb_id
+
+        docs = self.retrieval_cache.get(cache_kb_id, prompt, self.kb_configs)
+        if docs is None:
+            docs = self.safe_retrieve(self.get_retriever(kb_id), prompt)
+            self.retrieval_cache.put(cache_kb_id, prompt, self.kb_configs, docs)
+        return docs
+
+    def assemble_context(self, docs: list[dict], model_id: Optional[str] = None) -> str:
+        """
+        Turns retrieved documents into the context string of a prompt.
+
+        Args:
+            docs (list[dict]): Retrieved documents.
+            model_id (str, optional): Model the prompt is sent to, selects the context token budget.
+
+        Returns:
+            str: Context as a string.
+        """
+        if self.context_assembler is None:
+            return KBHandler.parse_kb_output_to_string(docs)
+        return self.context_assembler.assemble(docs, model_id)
+
+    def get_context(self, kb_id: str, prompt: str, model_id: Optional[str] = None) -> str:
         """
         Retrieves the relevant context from the knowledge base based on the prompt.
 
         Args:
             kb_id (str): Knowledge base ID.
             prompt (str): User prompt for retrieval.
+            model_id (str, optional): Model the context is sent to, selects the context token budget.
 
         Returns:
             str: Retrieved context as a string.
         """
-        # Initialize retriever (KB Handler)
-        retriever = KBHandler(
-            self.bedrock_agent_runtime_client, self.kb_configs, kb_id=kb_id
-        )
-        
         # Retrieve documents from the knowledge base
-        docs = retriever.get_relevant_docs(prompt)
+        docs = self.retrieve(kb_id, prompt)
         
         # Parse the knowledge base output to a string
-        context = retriever.parse_kb_output_to_string(docs)
+        context = self.assemble_context(docs, model_id)
         
         return context
 
 
+    @retry(
+        retry=retry_if_exception(is_throttling_exception),
+        wait=wait_exponential(multiplier=1, min=2, max=30),
+        stop=stop_after_attempt(5),
+        reraise=True
+    )
+    def safe_retrieve(self, retriever, prompt):
+        return retriever.get_relevant_docs(prompt)
+
     @retry(
         retry=retry_if_exception(is_throttling_exception),
         wait=wait_exponential(multiplier=1, min=2, max=30),
@@ -142,6 +221,70 @@ class Rag:
     def safe_invoke_model(self, bedrock_handler, messages):
         return bedrock_handler.invoke_model(messages)
 
+    @retry(
+        retry=retry_if_exception(is_throttling_exception),
+        wait=wait_exponential(multiplier=1, min=2, max=30),
+        stop=stop_after_attempt(5),
+        reraise=True
+    )
+    def safe_invoke_model_stream(self, bedrock_handler, messages):
+        return bedrock_handler.invoke_model_stream(messages)
+
+
+    def evaluate_question(self, bedrock_handler, knowledge_base_id: str, product_data: dict,
+                          docs: Optional[list] = None, retrieve_time: Optional[float] = None) -> tuple:
+        """
+        Run retrieval and generation for a single test question.
+
+        Args:
+            bedrock_handler (BedrockHandler): Handler for the generation model.
+            knowledge_base_id (str): Knowledge base ID.
+            product_data (dict): Test record with "question" and "answer" fields.
+            docs (list, optional): Documents already retrieved for the question, skips retrieval.
+            retrieve_time (float, optional): Time it took to retrieve docs, reported as the retrieve stage.
+
+        Returns:
+            tuple: The result record and the inference time of this question in seconds.
+        """
+        question = product_data.get("question")
+        ground_truth = product_data.get("answer")
+
+        timer = StageTimer()
+        if docs is None:
+            with timer.stage('retrieve'):
+                docs = self.retrieve(knowledge_base_id, question)
+        else:
+            timer.timings['retrieve'] = retrieve_time or 0.0
+
+        with timer.stage('context_assembly'):
+            context = self.assemble_context(docs, bedrock_handler.model_id)
+            prompt = self.rag_template.format(question=question, context=context)
+            bedrock_messages = [bedrock_handler.user_message(prompt)]
+
+        stream_metrics = {}
+        with timer.stage('model_call'):
+            if self.streaming:
+                response = self.safe_invoke_model_stream(bedrock_handler, bedrock_messages)
+            else:
+                response = self.safe_invoke_model(bedrock_handler, bedrock_messages)
+
+        with timer.stage('response_parsing'):
+            if self.streaming:
+                response_text = response['text']
+                stream_metrics = response['metrics']
+            else:
+                response_text = response['output']['message']['content'][0]['text']
+        inference_time = timer.total()
+
+        results_dict = {
+            'input_text': question,
+            'ground_truth': ground_truth,
+            'llm_response': response_text,
+            'context': context,
+            'stage_timings': timer.timings
+        }
+        results_dict.update(stream_metrics)
+        return results_dict, inference_time
 
     def evaluate_rag(self,knowledge_base_id, model_name, model_id):
         bedrock_handler = BedrockHandler(
@@ -156,45 +299,15 @@ class Rag:
 
         with open(test_data_path, 'r') as file:
             data = json.load(file)
-            results = []
-            inference_times = []
-            for product_data in data: 
-                # Parse each line as a JSON object
-                question = product_data.get("question")
-                ground_truth = product_data.get("answer")
-
-                bedrock_messages = []
-                start_time = time.time()
-                context = self.get_context(knowledge_base_id, question)
-
-                prompt = self.rag_template.format(question=question, context=context)
-                #print(f"======Prompt: {prompt}")
-
-                bedrock_messages.append(
-                    bedrock_handler.user_message(prompt)
-                )
-
-                response = self.safe_invoke_model(bedrock_handler, bedrock_messages)
-                end_time = time.time()
-                inference_time = end_time - start_time
-                inference_times.append(inference_time)
-                #print(f"RESPONSE: {response}")
-                response_text = response['output']['message']['content'][0]['text']
 
-                results_dict = {
-                    'input_text': question,
-                    'ground_truth': ground_truth,
-                    'llm_response': response_text,
-                    'context': context
-                }
-                results.append(results_dict)
-                """
-                print(f'Input: {question}')
-                print(f'Ground_truth: {ground_truth}')
-                print(f'LLM response: {response_text}')
-                
-                print(f'Context: {context}')
-                """
+        # Results come back in input order regardless of the number of workers
+        outputs = map_concurrently(
+            lambda product_data: self.evaluate_question(bedrock_handler, knowledge_base_id, product_data),
+            data,
+            self.max_workers
+        )
+        results = [results_dict for results_dict, _ in outputs]
+        inference_times = [inference_time for _, inference_time in outputs]
         
         avg_inference_time = sum(inference_times)/ len(inference_times)
 
@@ -204,4 +317,4 @@ class Rag:
         with open(results_file_path, 'w') as json_file:
             json.dump(results, json_file, indent=4)
             
-        return avg_inference_time
\ No newline at end of file
+        return avg_inference_time
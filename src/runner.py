@@ -0,0 +1,126 @@
+import os, json, glob, time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.bedrock import BedrockHandler
+from utils.helpers import logger, map_concurrently
+from utils.latency import StageTimer
+
+
+class MultiStrategyRunner:
+    """
+    A class to evaluate RAG, finetuned and hybrid approaches in a single pass over the test data.
+
+    Every question is retrieved once. The RAG generation (Bedrock), the finetuned-only generation and
+    the hybrid generation (both on the SageMaker endpoint) are then dispatched concurrently with the
+    shared documents. The three result files keep the schema of Rag.evaluate_rag,
+    Finetuning.evaluate_finetuned_model and Hybrid.evaluate_hybrid_model, so evaluation and summary
+    steps work unchanged.
+    """
+
+    def __init__(self, rag_obj, finetuning_obj, hybrid_obj, knowledge_base_id: str, rag_model_id: str,
+                 max_workers: int = 1):
+        """
+        Initialize the runner.
+
+        Args:
+            rag_obj (Rag): RAG approach, also provides retrieval for the hybrid approach.
+            finetuning_obj (Finetuning): Finetuned-only approach.
+            hybrid_obj (Hybrid): Hybrid approach.
+            knowledge_base_id (str): Knowledge base ID.
+            rag_model_id (str): Bedrock model ID of the RAG approach.
+            max_workers (int): Number of questions processed concurrently. Each question runs its
+                three generations at the same time, so up to 3 * max_workers requests are in flight.
+        """
+        self.rag_obj = rag_obj
+        self.finetuning_obj = finetuning_obj
+        self.hybrid_obj = hybrid_obj
+        self.knowledge_base_id = knowledge_base_id
+        self.max_workers = max(1, max_workers)
+
+        self.bedrock_handler = BedrockHandler(self.rag_obj.bedrock_runtime, rag_model_id)
+
+    def evaluate_question(self, executor: ThreadPoolExecutor, predictor, product_data: dict) -> tuple:
+        """
+        Retrieve once for a question and run the three generations concurrently.
+
+        Args:
+            executor (ThreadPoolExecutor): Pool running the generations.
+            predictor (sagemaker.predictor.Predictor): Predictor of the finetuned endpoint.
+            product_data (dict): Test record with "question" and "answer" fields.
+
+        Returns:
+            tuple: RAG (record, inference time), finetuned record and hybrid record.
+        """
+        timer = StageTimer()
+        with timer.stage('retrieve'):
+            docs = self.rag_obj.retrieve(self.knowledge_base_id, product_data.get("question"))
+        retrieve_time = timer.timings['retrieve']
+
+        rag_future = executor.submit(
+            self.rag_obj.evaluate_question, self.bedrock_handler, self.knowledge_base_id, product_data, docs, retrieve_time
+        )
+        finetuned_future = executor.submit(self.finetuning_obj.evaluate_question, predictor, product_data)
+        hybrid_future = executor.submit(
+            lambda: self.hybrid_obj.generate(product_data, self.hybrid_obj.retrieve_context(product_data, docs, retrieve_time))
+        )
+        return rag_future.result(), finetuned_future.result(), hybrid_future.result()
+
+    def run(self, predictor) -> dict:
+        """
+        Evaluate the three approaches and write rag_results.json, <finetuning_method>_results.json and
+        hybrid_results.json.
+
+        Args:
+            predictor (sagemaker.predictor.Predictor): Predictor of the finetuned endpoint.
+
+        Returns:
+            dict: Average inference time per approach, keyed by "rag", the finetuning method and "hybrid".
+        """
+        test_data_dir = f"data/test/"
+        json_files = glob.glob(os.path.join(test_data_dir, "*.json"))
+        if len(json_files) != 1:
+            raise ValueError("There should be exactly one JSON file in the directory.")
+        with open(json_files[0], 'r') as file:
+            data = json.load(file)
+
+        # Finetuned and hybrid requests of every worker share the endpoint connection pool
+        predictor = self.finetuning_obj.create_predictor(predictor.endpoint_name, 2 * self.max_workers)
+        self.hybrid_obj.predictor = predictor
+
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=3 * self.max_workers) as executor:
+            outputs = map_concurrently(
+                lambda product_data: self.evaluate_question(executor, predictor, product_data),
+                data,
+                self.max_workers
+            )
+        wall_time = time.time() - start_time
+
+        rag_results = [results_dict for (results_dict, _), _, _ in outputs]
+        rag_inference_times = [inference_time for (_, inference_time), _, _ in outputs]
+        finetuned_results = [finetuned_result for _, finetuned_result, _ in outputs]
+        hybrid_results = [hybrid_result for _, _, hybrid_result in outputs]
+
+        self.hybrid_obj.log_routing_summary(hybrid_results)
+        self.finetuning_obj.requests_per_second = len(finetuned_results) / wall_time
+        logger.info(
+            f"Single-pass evaluation: {len(data)} questions in {wall_time:.2f} seconds, "
+            f"retrieval cache hits/misses: {self.rag_obj.retrieval_cache.hits}/{self.rag_obj.retrieval_cache.misses}"
+        )
+
+        output_dir = "data/output"
+        os.makedirs(output_dir, exist_ok=True)
+        result_files = {
+            "rag_results.json": rag_results,
+            f"{self.finetuning_obj.finetuning_method}_results.json": finetuned_results,
+            "hybrid_results.json": hybrid_results,
+        }
+        for file_name, results in result_files.items():
+            with open(os.path.join(output_dir, file_name), 'w') as json_file:
+                json.dump(results, json_file, indent=4)
+
+        return {
+            'rag': sum(rag_inference_times) / len(rag_inference_times),
+            f'{self.finetuning_obj.finetuning_method}': sum(result['inference_time'] for result in finetuned_results) / len(finetuned_results),
+            'hybrid': sum(result['inference_time'] for result in hybrid_results) / len(hybrid_results),
+        }
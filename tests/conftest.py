@@ -0,0 +1,39 @@
+import pytest
+
+from src.evaluation import Evaluation
+
+
+PROMPT_TEMPLATE = "{ground_truth} | {finetuning_text} | {rag_text} | {hybrid_text}"
+SCORE_PATTERN = r'<output>(.*?)</output>'
+
+
+class StubJudgeCache:
+    """Judge cache answering every prompt with fixed responses per model, so no judge is called."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.prompts = []
+
+    def get(self, model_id, prompt):
+        self.prompts.append((model_id, prompt))
+        response = self.responses[model_id]
+        return response(prompt) if callable(response) else response
+
+    def put(self, model_id, prompt, response_text):
+        raise AssertionError("Stubbed judges are never called")
+
+
+@pytest.fixture
+def make_evaluation():
+    """Build an Evaluation whose judges answer from a StubJudgeCache."""
+    def make(responses, **kwargs):
+        evaluator_models = {name: name for name in responses}
+        return Evaluation(
+            "us-east-1",
+            evaluator_models,
+            PROMPT_TEMPLATE,
+            SCORE_PATTERN,
+            judge_cache=StubJudgeCache(responses),
+            **kwargs
+        )
+    return make
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from src.batch_inference import BatchInference, LocalBatchRunner
+
+
+MODEL_ID = "meta.llama3-1-8b-instruct-v1:0"
+
+
+class StubRag:
+    rag_template = "Context: {context}\nQuestion: {question}"
+
+    def retrieve(self, kb_id, question):
+        return [{"content": {"text": f"doc about {question}"}}]
+
+    def assemble_context(self, docs, model_id=None):
+        return docs[0]["content"]["text"]
+
+
+class StubBedrockClient:
+    def __init__(self, statuses, message=""):
+        self.statuses = list(statuses)
+        self.message = message
+
+    def get_model_invocation_job(self, jobIdentifier):
+        return {"status": self.statuses.pop(0), "message": self.message}
+
+
+def fake_llama(model_id, model_input):
+    if "fail" in model_input["prompt"]:
+        raise RuntimeError("model error")
+    return {"generation": "answer", "prompt_token_count": 10, "generation_token_count": 2}
+
+
+@pytest.fixture
+def batch(tmp_path):
+    return BatchInference("us-east-1", StubRag(), MODEL_ID, "bucket", "role", output_dir=str(tmp_path / "batch"))
+
+
+def test_local_runner_writes_bedrock_output_format(tmp_path):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    input_path.write_text(
+        json.dumps({"recordId": "1", "modelInput": {"prompt": "hi"}}) + "\n\n"
+        + json.dumps({"recordId": "2", "modelInput": {"prompt": "fail"}}) + "\n"
+    )
+    LocalBatchRunner(fake_llama).run(MODEL_ID, str(input_path), str(output_path))
+    outputs = [json.loads(line) for line in output_path.read_text().splitlines()]
+
+    assert outputs[0]["modelOutput"]["generation"] == "answer"
+    assert outputs[1]["error"] == {"errorMessage": "model error"}
+
+
+def test_evaluate_rag_batch_with_local_runner(batch, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "test").mkdir(parents=True)
+    (tmp_path / "data" / "test" / "test.json").write_text(json.dumps([
+        {"question": "price of x", "answer": "1"},
+        {"question": "fail on y", "answer": "2"},
+    ]))
+
+    batch.evaluate_rag_batch("kb", local_runner=LocalBatchRunner(fake_llama))
+    results = json.loads((tmp_path / "data" / "output" / "rag_results.json").read_text())
+
+    assert results[0] == {"input_text": "price of x", "ground_truth": "1", "llm_response": "answer",
+                          "context": "doc about price of x", "input_tokens": 10, "output_tokens": 2}
+    assert results[1]["llm_response"] == ""
+    assert results[1]["batch_error"] == "model error"
+
+
+def test_wait_for_job_returns_completed_status(batch):
+    batch.bedrock_client = StubBedrockClient(["InProgress", "PartiallyCompleted"])
+    assert batch.wait_for_job("arn:job/1", poll_interval=0) == "PartiallyCompleted"
+
+
+@pytest.mark.parametrize("status", ["Failed", "Stopped", "Expired"])
+def test_wait_for_job_raises_on_failed_job(batch, status):
+    batch.bedrock_client = StubBedrockClient(["Submitted", status], message="role cannot read the bucket")
+    with pytest.raises(RuntimeError, match="role cannot read the bucket"):
+        batch.wait_for_job("arn:job/1", poll_interval=0)
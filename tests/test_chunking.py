@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+from config import CHUNKING_STRATEGIES
+from utils.chunking import (
+    DEFAULT_CHUNKING_MAX_TOKENS, chunking_stats, count_tokens, iter_chunks, iter_file_chunks, iter_tokens,
+    resolve_chunking_params,
+)
+
+
+FIXED_SIZE = CHUNKING_STRATEGIES[1]
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text(" ".join(f"w{i}" for i in range(25)), encoding="utf-8")
+    return str(path)
+
+
+def test_resolve_chunking_params():
+    assert resolve_chunking_params(FIXED_SIZE, 10, 20) == (10, 2)
+    assert resolve_chunking_params(CHUNKING_STRATEGIES[0], 10, 50) == (DEFAULT_CHUNKING_MAX_TOKENS, 60)
+    assert resolve_chunking_params(CHUNKING_STRATEGIES[2], 10, 20) is None
+    with pytest.raises(ValueError):
+        resolve_chunking_params(FIXED_SIZE, 10, 100)
+    with pytest.raises(ValueError):
+        resolve_chunking_params("Semantic chunking", 10, 20)
+
+
+def test_iter_tokens_joins_tokens_split_across_blocks():
+    text = "alpha beta  gamma\ndelta"
+    tokens = list(iter_tokens(io.StringIO(text), block_size=3))
+    assert "".join(tokens) == text
+    assert [token.strip() for token in tokens] == ["alpha", "beta", "gamma", "delta"]
+
+
+def test_fixed_size_chunks_stay_within_budget_and_overlap(document):
+    chunks = list(iter_file_chunks(document, FIXED_SIZE, 10, 20))
+
+    assert all(chunk.token_count <= 10 for chunk in chunks)
+    assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+    for first, second in zip(chunks, chunks[1:]):
+        # The last two tokens of a chunk start the next one
+        assert first.text.split()[-2:] == second.text.split()[:2]
+    # Every token is indexed, the tail chunk holds the remainder
+    assert chunks[-1].text.split()[-1] == "w24"
+    assert [chunk.token_count for chunk in chunks] == [10, 10, 9]
+
+
+def test_no_overlap_chunks_partition_the_document(document):
+    chunks = list(iter_file_chunks(document, FIXED_SIZE, 10, 0))
+    assert " ".join(chunk.text for chunk in chunks).split() == [f"w{i}" for i in range(25)]
+
+
+def test_no_chunking_yields_the_whole_file(document):
+    chunks = list(iter_file_chunks(document, CHUNKING_STRATEGIES[2], 10, 20))
+    assert len(chunks) == 1
+    assert chunks[0].token_count == count_tokens(chunks[0].text) == 25
+
+
+def test_iter_chunks_walks_directories_in_sorted_order(tmp_path):
+    (tmp_path / "b.txt").write_text("second file", encoding="utf-8")
+    (tmp_path / "a.txt").write_text("first file", encoding="utf-8")
+    chunks = list(iter_chunks([str(tmp_path)], FIXED_SIZE, 10, 20))
+    assert [chunk.text for chunk in chunks] == ["first file", "second file"]
+
+
+def test_chunking_stats_context_tokens(document):
+    stats = chunking_stats([document], FIXED_SIZE, 10, 20, number_of_results=2)
+    assert stats["chunk_count"] == 3
+    assert stats["max_tokens_per_chunk"] == 10
+    assert stats["indexed_tokens"] == 29
+    assert stats["avg_context_tokens_per_prompt"] == pytest.approx(29 / 3 * 2, abs=0.01)
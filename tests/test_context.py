@@ -0,0 +1,59 @@
+from utils.context import ContextAssembler
+
+
+WORDS = [f"w{i}" for i in range(30)]
+
+
+def doc(words, score, source="s3://bucket/doc.txt"):
+    return {
+        "content": {"text": " ".join(words)},
+        "score": score,
+        "location": {"type": "S3", "s3Location": {"uri": source}},
+    }
+
+
+def documents(context):
+    return [entry.split(": ", 1)[1] for entry in context.split("\n\n")] if context else []
+
+
+def test_overlapping_chunks_of_a_source_are_merged():
+    assembler = ContextAssembler(min_overlap_tokens=4)
+    context = assembler.assemble([doc(WORDS[10:30], 0.4), doc(WORDS[:16], 0.9)])
+    assert documents(context) == [" ".join(WORDS)]
+
+
+def test_chunks_of_different_sources_are_not_merged():
+    assembler = ContextAssembler(min_overlap_tokens=4)
+    context = assembler.assemble([doc(WORDS[:16], 0.9), doc(WORDS[10:30], 0.4, source="s3://bucket/other.txt")])
+    assert documents(context) == [" ".join(WORDS[:16]), " ".join(WORDS[10:30])]
+
+
+def test_short_overlaps_are_not_merged():
+    assembler = ContextAssembler(min_overlap_tokens=8)
+    context = assembler.assemble([doc(WORDS[:12], 0.9), doc(WORDS[8:20], 0.4)])
+    assert len(documents(context)) == 2
+
+
+def test_near_duplicates_keep_the_highest_score():
+    assembler = ContextAssembler()
+    duplicate = doc(WORDS[:10], 0.3, source="s3://bucket/copy.txt")
+    context = assembler.assemble([duplicate, doc(WORDS[:10], 0.8), doc(["unrelated", "text"], 0.5)])
+    assert documents(context) == [" ".join(WORDS[:10]), "unrelated text"]
+
+
+def test_token_budget_packs_by_score_and_truncates():
+    assembler = ContextAssembler(token_budgets={"small": 12}, default_token_budget=None)
+    docs = [doc(["low"] * 5, 0.1, "s3://a"), doc(WORDS[:6], 0.9, "s3://b"), doc(WORDS[20:30], 0.5, "s3://c")]
+
+    context = assembler.assemble(docs, model_id="small")
+    # 2 tokens per "Document i: " prefix, 6 + 2 for the best chunk leaves 2 words of the next one
+    assert documents(context) == [" ".join(WORDS[:6]), "w20 w21"]
+
+    unlimited = documents(assembler.assemble(docs, model_id="large"))
+    assert unlimited == [" ".join(WORDS[:6]), " ".join(WORDS[20:30]), "low low low low low"]
+
+
+def test_untouched_chunks_keep_their_formatting():
+    text = "Line one.\nLine two."
+    context = ContextAssembler(default_token_budget=100).assemble([{"content": {"text": text}, "score": 1.0}])
+    assert context == f"Document 1: {text}"
@@ -0,0 +1,137 @@
+import json
+import time
+
+import pytest
+
+from src.evaluation import EvaluationResults
+
+
+def output(finetuning, rag, hybrid):
+    return f'<output>{{"text1_score": {finetuning}, "text2_score": {rag}, "text3_score": {hybrid}}}</output>'
+
+
+JUDGES = {"cheap": output(0.9, 0.1, 0.9), "medium": output(0.9, 0.1, 0.9), "expensive": output(1.0, 0.0, 1.0)}
+SAMPLE = ("truth", "finetuned answer", "rag answer", "hybrid answer")
+
+
+@pytest.fixture
+def cascade(make_evaluation):
+    return make_evaluation(JUDGES, cascade=True, uncertainty_band=(0.3, 0.7), disagreement_threshold=0.2)
+
+
+@pytest.mark.parametrize("judge_scores, escalate", [
+    ([(0.9, 0.1, 0.9)], False),
+    ([(0.9, 0.5, 0.9)], True),  # inside the uncertainty band
+    ([(0.9, -1, 0.9)], True),  # unparsable score
+    ([(0.9, 0.1, 0.9), (0.8, 0.1, 0.9)], False),
+    ([(0.9, 0.1, 0.9), (0.9, 0.1, 0.2)], True),  # first two judges disagree
+])
+def test_needs_escalation(cascade, judge_scores, escalate):
+    assert cascade.needs_escalation(judge_scores) is escalate
+
+
+def test_share_duplicate_scores(cascade):
+    assert cascade.share_duplicate_scores(("truth", "same", "other", "same"), (0.9, 0.1, 0.8)) == (0.9, 0.1, 0.9)
+    assert cascade.share_duplicate_scores(SAMPLE, (0.9, 0.1, 0.8)) == (0.9, 0.1, 0.8)
+
+
+def test_cascade_stops_at_first_clear_judge(cascade):
+    scores, judges_consulted = cascade.calculate_llm_evaluator_cascade(*[[text] for text in SAMPLE])
+    assert scores["rag"][0] == {"cheap": 0.1, "llm_evaluator_score": 0.1, "failed_judges": 0}
+    assert judges_consulted == [["cheap"]]
+
+
+def test_cascade_escalates_unclear_sample(make_evaluation):
+    evaluation = make_evaluation(dict(JUDGES, cheap=output(0.9, 0.5, 0.9)), cascade=True)
+    scores, judges_consulted = evaluation.calculate_llm_evaluator_cascade(*[[text] for text in SAMPLE])
+    # cheap and medium disagree by 0.4 on RAG, so the expensive judge decides
+    assert judges_consulted == [["cheap", "medium", "expensive"]]
+    assert scores["rag"][0]["llm_evaluator_score"] == pytest.approx(0.2)
+
+
+def test_cascade_shares_judgements_of_duplicates(make_evaluation):
+    # The judge scores two identical responses differently, they share the first score instead
+    evaluation = make_evaluation(dict(JUDGES, cheap=output(0.9, 0.1, 0.8)), cascade=True)
+    samples = [("truth", "same", "rag", "same"), ("truth2", "a", "b", "c"), ("truth", "same", "rag", "same")]
+    scores, judges_consulted = evaluation.calculate_llm_evaluator_cascade(*[list(texts) for texts in zip(*samples)])
+
+    assert judges_consulted == [["cheap"]] * 3
+    assert [sample["llm_evaluator_score"] for sample in scores["hybrid"]] == [0.9, 0.8, 0.9]
+    # The repeated sample is judged once
+    assert len(evaluation.llm_evaluator_obj.judge_cache.prompts) == 2
+
+
+def test_save_scores_records_judges_consulted(make_evaluation, tmp_path):
+    files = []
+    for approach in ["finetuning", "rag", "hybrid"]:
+        path = tmp_path / f"{approach}_results.json"
+        path.write_text(json.dumps([{"ground_truth": "t", "llm_response": "r"}] * 2))
+        files.append(str(path))
+    llm_scores = [{"cheap": 0.9, "llm_evaluator_score": 0.9, "failed_judges": 0}] * 2
+    results = EvaluationResults({approach: [0.5, 0.6] for approach in ["finetuning", "rag", "hybrid"]},
+                                {approach: llm_scores for approach in ["finetuning", "rag", "hybrid"]},
+                                judges_consulted=[["cheap"], ["cheap", "medium"]])
+
+    make_evaluation(JUDGES).save_scores(results, *files)
+    records = json.loads((tmp_path / "rag_results.json").read_text())
+    assert records[1] == {"ground_truth": "t", "llm_response": "r", "bert_score": 0.6, "cheap": 0.9,
+                          "llm_evaluator_score": 0.9, "failed_judges": 0, "judges_consulted": ["cheap", "medium"]}
+
+
+def test_cascade_rejects_batched_judging(make_evaluation):
+    with pytest.raises(ValueError):
+        make_evaluation(JUDGES, cascade=True, judge_batch_size=4, batch_prompt_template="{samples}",
+                        batch_sample_template="{index}")
+
+
+def test_aggregate_judge_scores_follows_evaluator_models_order(make_evaluation):
+    evaluation = make_evaluation(JUDGES)
+    scores = evaluation.aggregate_judge_scores({"expensive": (1.0, 0.0, 0.5), "cheap": (0.5, 0.5, 0.5), "medium": (0.0, 1.0, 0.5)})
+    assert list(scores["finetuning"]) == ["cheap", "medium", "expensive", "llm_evaluator_score", "failed_judges"]
+    assert scores["finetuning"]["llm_evaluator_score"] == pytest.approx(0.5)
+    assert scores["hybrid"]["llm_evaluator_score"] == pytest.approx(0.5)
+
+
+def test_aggregate_judge_scores_leaves_failed_judges_out(make_evaluation):
+    evaluation = make_evaluation(JUDGES)
+    scores = evaluation.aggregate_judge_scores({"cheap": (-1, 0.2, -1), "medium": (0.6, 0.4, -1), "expensive": (0.8, -1, -1)})
+    assert scores["finetuning"]["llm_evaluator_score"] == pytest.approx(0.7)
+    assert scores["finetuning"]["failed_judges"] == 1
+    assert scores["rag"]["llm_evaluator_score"] == pytest.approx(0.3)
+    # Every judge failed, the sample keeps the -1 sentinel
+    assert scores["hybrid"] == {"cheap": -1, "medium": -1, "expensive": -1, "llm_evaluator_score": -1, "failed_judges": 3}
+
+
+def test_parallel_judging_matches_serial_loop(make_evaluation):
+    def judge(delay, offset):
+        def respond(prompt):
+            # Later samples finish first, so completion order differs from sample order
+            index = int(prompt.split(" | ")[1][len("ft"):])
+            time.sleep(delay * (20 - index))
+            return output(round(index / 20, 2), offset, round(1 - index / 20, 2))
+        return respond
+
+    ground_truth = [f"truth{i}" for i in range(20)]
+    responses = [[f"{prefix}{i}" for i in range(20)] for prefix in ("ft", "rag", "hybrid")]
+    evaluation = make_evaluation({"cheap": judge(0.001, 0.1), "medium": judge(0.0005, 0.2), "expensive": judge(0, 0.3)},
+                                 judge_max_workers={"cheap": 4, "medium": 2}, default_judge_max_workers=3)
+
+    parallel = evaluation.calculate_llm_evaluator_parallel(ground_truth, *responses)
+    serial = [evaluation.calculate_llm_evaluator(*sample) for sample in zip(ground_truth, *responses)]
+    for approach in ["finetuning", "rag", "hybrid"]:
+        assert parallel[approach] == [scores[approach] for scores in serial]
+
+
+def test_judge_batch_falls_back_to_single_sample_judging(make_evaluation):
+    def respond(prompt):
+        if prompt.startswith("batch"):
+            return '<output>[{"sample": 1, "text1_score": 0.1, "text2_score": 0.2, "text3_score": 0.3}]</output>'
+        return output(0.4, 0.5, 0.6)
+
+    evaluation = make_evaluation({"judge": respond}, judge_batch_size=2, batch_prompt_template="batch {samples}",
+                                 batch_sample_template="[{index}: {ground_truth} {finetuning_text} {rag_text} {hybrid_text}]")
+    scores = evaluation.calculate_llm_evaluator_parallel(["t1", "t2", "t3"], ["f1", "f2", "f3"], ["r1", "r2", "r3"], ["h1", "h2", "h3"])
+
+    assert [sample["judge"] for sample in scores["rag"]] == [0.2, 0.5, 0.2]
+    report = evaluation.judge_batching_report()
+    assert (report["judge_calls"], report["fallback_calls"], report["single_sample_judge_calls"]) == (3, 1, 3)
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from utils.hedging import Hedger
+
+
+DELAY = 0.2
+
+
+class SlowThenFast:
+    """Service whose first attempt hangs until released or primary_seconds passed, later attempts take hedge_seconds."""
+
+    def __init__(self, primary_error=None, hedge_error=None, primary_seconds=5.0, hedge_seconds=0.0):
+        self.release = threading.Event()
+        self.call_times = []
+        self.primary_error = primary_error
+        self.hedge_error = hedge_error
+        self.primary_seconds = primary_seconds
+        self.hedge_seconds = hedge_seconds
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        with self._lock:
+            self.call_times.append(time.perf_counter())
+            attempt = len(self.call_times)
+        if attempt == 1:
+            self.release.wait(self.primary_seconds)
+            if self.primary_error is not None:
+                raise self.primary_error
+            return f"primary {value}"
+        time.sleep(self.hedge_seconds)
+        if self.hedge_error is not None:
+            raise self.hedge_error
+        return f"hedge {value}"
+
+
+def make_hedger(budget=1.0, latency=DELAY):
+    hedger = Hedger(percentile=95, budget=budget, window_size=10, min_samples=10)
+    for _ in range(10):
+        hedger._record_latency(latency)
+    return hedger
+
+
+def test_no_hedging_before_min_samples():
+    hedger = Hedger(min_samples=3, budget=1.0)
+    calls = []
+    for _ in range(3):
+        assert hedger.hedge_delay() is None
+        assert hedger.call(lambda: calls.append(threading.current_thread())) is None
+    assert calls == [threading.main_thread()] * 3
+    assert hedger.hedge_delay() is not None
+    assert hedger.hedges_issued == 0
+
+
+def test_hedge_fires_only_after_the_delay():
+    hedger = make_hedger()
+    service = SlowThenFast()
+    start = time.perf_counter()
+    try:
+        assert hedger.call(service, 1) == "hedge 1"
+    finally:
+        service.release.set()
+
+    assert len(service.call_times) == 2
+    assert service.call_times[1] - start >= DELAY * 0.95
+    assert (hedger.request_count, hedger.hedges_issued, hedger.hedges_won) == (1, 1, 1)
+
+
+def test_fast_calls_are_not_hedged():
+    hedger = make_hedger()
+    calls = []
+    for i in range(5):
+        assert hedger.call(lambda x: calls.append(x) or x, i) == i
+    assert calls == list(range(5))
+    assert hedger.hedges_issued == 0
+
+
+def test_budget_caps_hedges():
+    hedger = make_hedger(budget=0.0)
+    service = SlowThenFast()
+    threading.Timer(2 * DELAY, service.release.set).start()
+
+    assert hedger.call(service, 1) == "primary 1"
+    assert len(service.call_times) == 1
+    assert hedger.hedges_issued == 0
+
+
+def test_fast_failing_primary_is_not_hedged():
+    hedger = make_hedger()
+    service = SlowThenFast(primary_error=RuntimeError("primary failed"), primary_seconds=0.0)
+    with pytest.raises(RuntimeError, match="primary failed"):
+        hedger.call(service, 1)
+    assert len(service.call_times) == 1
+
+
+def test_failed_primary_falls_back_to_the_hedge():
+    hedger = make_hedger()
+    service = SlowThenFast(primary_error=RuntimeError("primary failed"), primary_seconds=2 * DELAY,
+                           hedge_seconds=4 * DELAY)
+    assert hedger.call(service, 1) == "hedge 1"
+    assert hedger.hedges_won == 1
+
+
+def test_primary_error_is_raised_when_every_attempt_fails():
+    hedger = make_hedger()
+    service = SlowThenFast(primary_error=RuntimeError("primary failed"), hedge_error=ValueError("hedge failed"),
+                           primary_seconds=2 * DELAY)
+    with pytest.raises(RuntimeError, match="primary failed"):
+        hedger.call(service, 1)
+    assert len(service.call_times) == 2
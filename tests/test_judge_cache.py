@@ -0,0 +1,33 @@
+import json
+
+from utils.judge_cache import JudgeCache
+
+
+def test_cache_round_trip(tmp_path):
+    path = str(tmp_path / "cache" / "judge_cache.jsonl")
+    cache = JudgeCache(path)
+    assert cache.get("judge", "prompt") is None
+    cache.put("judge", "prompt", "response")
+
+    resumed = JudgeCache(path)
+    assert resumed.get("judge", "prompt") == "response"
+    assert resumed.get("other judge", "prompt") is None
+    assert (resumed.hits, resumed.misses) == (1, 1)
+
+
+def test_resume_after_truncated_last_line(tmp_path):
+    path = tmp_path / "judge_cache.jsonl"
+    cache = JudgeCache(str(path))
+    cache.put("judge", "first", "one")
+    cache.put("judge", "second", "two")
+    # A run killed mid-write leaves half a record without a newline
+    path.write_text(path.read_text()[:-20])
+
+    resumed = JudgeCache(str(path))
+    assert resumed.get("judge", "first") == "one"
+    assert resumed.get("judge", "second") is None
+    resumed.put("judge", "second", "two again")
+
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[-1])["response_text"] == "two again"
+    assert JudgeCache(str(path)).get("judge", "second") == "two again"
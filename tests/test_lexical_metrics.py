@@ -0,0 +1,90 @@
+import json
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from utils.lexical_metrics import correlation_with, lcs_length, lexical_scores, normalize_tokens
+
+
+def lcs_reference(first, second):
+    table = [[0] * (len(second) + 1) for _ in range(len(first) + 1)]
+    for i, a in enumerate(first):
+        for j, b in enumerate(second):
+            table[i + 1][j + 1] = table[i][j] + 1 if a == b else max(table[i][j + 1], table[i + 1][j])
+    return table[-1][-1]
+
+
+def f1_reference(reference, prediction):
+    overlap = sum((Counter(reference) & Counter(prediction)).values())
+    return 2 * overlap / (len(reference) + len(prediction)) if reference or prediction else 1.0
+
+
+def test_normalize_tokens():
+    assert normalize_tokens("The price is $25.99, an OFFER!") == ["price", "is", "25", "99", "offer"]
+
+
+def test_lcs_length_matches_dynamic_programming():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        first = rng.integers(0, 5, rng.integers(0, 80)).tolist()
+        second = rng.integers(0, 5, rng.integers(0, 80)).tolist()
+        assert lcs_length(first, second) == lcs_reference(first, second)
+
+
+def test_lexical_scores_match_reference_implementations():
+    rng = np.random.default_rng(1)
+    words = ["red", "blue", "shirt", "size", "large", "cotton", "price", "10"]
+    references = [" ".join(rng.choice(words, rng.integers(0, 12))) for _ in range(100)]
+    predictions = [" ".join(rng.choice(words, rng.integers(0, 12))) for _ in range(100)]
+    scores = lexical_scores(references, predictions)
+
+    for i, (reference, prediction) in enumerate(zip(references, predictions)):
+        reference_tokens, prediction_tokens = reference.split(), prediction.split()
+        assert scores["token_f1"][i] == pytest.approx(f1_reference(reference_tokens, prediction_tokens))
+        lengths = len(reference_tokens) + len(prediction_tokens)
+        expected_rouge = 2 * lcs_reference(reference_tokens, prediction_tokens) / lengths if lengths else 1.0
+        assert scores["rouge_l"][i] == pytest.approx(expected_rouge)
+
+
+def test_exact_and_contains_match():
+    scores = lexical_scores(
+        ["Blue shirt", "size large", "red", ""],
+        ["the blue shirt.", "It comes in size large!", "reduced", "anything"]
+    )
+    assert scores["exact_match"].tolist() == [1.0, 0.0, 0.0, 0.0]
+    assert scores["contains_match"].tolist() == [1.0, 1.0, 0.0, 0.0]
+
+
+def test_lexical_scores_rejects_misaligned_inputs():
+    with pytest.raises(ValueError):
+        lexical_scores(["a", "b"], ["a"])
+
+
+def test_correlation_with():
+    correlations = correlation_with({"token_f1": np.array([0.1, 0.4, 0.2, 0.9]), "exact_match": np.ones(4)},
+                                    np.array([1.0, 8.0, 4.0, 16.0]))
+    assert correlations["token_f1_spearman"] == 1.0
+    assert 0.9 < correlations["token_f1_pearson"] < 1.0
+    assert correlations["exact_match_pearson"] is None
+
+
+def test_calculate_quick_scores(make_evaluation, tmp_path):
+    records = [
+        {"ground_truth": "blue shirt", "llm_response": "blue shirt", "bert_score": 0.9},
+        {"ground_truth": "size large", "llm_response": "size small", "bert_score": 0.7},
+        {"ground_truth": "red", "llm_response": "green", "bert_score": 0.5},
+    ]
+    rag_file = tmp_path / "rag_results.json"
+    rag_file.write_text(json.dumps(records))
+    hybrid_file = tmp_path / "hybrid_results.json"
+    hybrid_file.write_text(json.dumps([{key: value for key, value in record.items() if key != "bert_score"} for record in records]))
+
+    summary = make_evaluation({}).calculate_quick_scores(
+        str(tmp_path / "missing.json"), str(rag_file), str(hybrid_file), str(tmp_path / "quick_summary.csv")
+    )
+    assert summary["approach"].tolist() == ["rag", "hybrid"]
+    assert summary.loc[0, "token_f1"] == pytest.approx(0.5)
+    assert summary.loc[0, "token_f1_spearman"] == 1.0
+    assert np.isnan(summary.loc[1, "bert_score"])
+    assert (tmp_path / "quick_summary.csv").exists()
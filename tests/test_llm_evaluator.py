@@ -0,0 +1,56 @@
+from src.llm_evaluator import LLMEvaluator
+from tests.conftest import SCORE_PATTERN, StubJudgeCache
+
+
+def evaluate(response_text):
+    evaluator = LLMEvaluator(None, StubJudgeCache({"judge": response_text}))
+    return evaluator.evaluate("judge", "ft", "rag", "hybrid", "truth", "prompt", SCORE_PATTERN)
+
+
+def test_evaluate_parses_scores():
+    assert evaluate('<output>{"text1_score": 0.2, "text2_score": "0.5", "text3_score": 1}</output>') == (0.2, 0.5, 1.0)
+
+
+def test_evaluate_missing_score_is_sentinel():
+    assert evaluate('<output>{"text1_score": 0.5, "text2_score": 0.5}</output>') == (0.5, 0.5, -1)
+
+
+def test_evaluate_non_numeric_score_is_sentinel():
+    assert evaluate('<output>{"text1_score": "high", "text2_score": null, "text3_score": 0.7}</output>') == (-1, -1, 0.7)
+
+
+def test_evaluate_unparsable_response_is_sentinel():
+    assert evaluate("no scores here") == (-1, -1, -1)
+
+
+def test_missing_score_does_not_abort_aggregation(make_evaluation):
+    evaluation = make_evaluation({
+        "judge_a": '<output>{"text1_score": 0.5, "text2_score": 0.5}</output>',
+        "judge_b": '<output>{"text1_score": 1.0, "text2_score": 0.0, "text3_score": 0.5}</output>',
+    })
+    scores = evaluation.calculate_llm_evaluator_parallel(["truth"], ["ft"], ["rag"], ["hybrid"])
+    # The failed judge is reported but left out of the mean
+    assert scores["hybrid"][0] == {"judge_a": -1, "judge_b": 0.5, "llm_evaluator_score": 0.5, "failed_judges": 1}
+    assert scores["finetuning"][0] == {"judge_a": 0.5, "judge_b": 1.0, "llm_evaluator_score": 0.75, "failed_judges": 0}
+
+
+def test_evaluate_batch_keeps_parsable_samples():
+    response_text = (
+        '<output>[{"sample": 1, "text1_score": 0.1, "text2_score": 0.2, "text3_score": 0.3},'
+        ' {"sample": 2, "text1_score": 0.4, "text2_score": oops, "text3_score": 0.6},'
+        " {'sample': '3', 'text1_score': 0.7', 'text2_score': 0.8, 'text3_score': 0.9,},"
+        ' {"sample": 9, "text1_score": 1, "text2_score": 1, "text3_score": 1}]</output>'
+    )
+    evaluator = LLMEvaluator(None, StubJudgeCache({"judge": response_text}))
+    scores = evaluator.evaluate_batch("judge", "prompt", SCORE_PATTERN, 4)
+    assert scores == [(0.1, 0.2, 0.3), None, (0.7, 0.8, 0.9), None]
+
+
+def test_evaluate_batch_without_scores():
+    evaluator = LLMEvaluator(None, StubJudgeCache({"judge": "I cannot judge these"}))
+    assert evaluator.evaluate_batch("judge", "prompt", SCORE_PATTERN, 2) == [None, None]
+
+
+def test_evaluate_repairs_dangling_quotes():
+    assert evaluate('<output>{"text1_score": 0.5", "text2_score": 0.7", "text3_score": 0.9"}</output>') == (0.5, 0.7, 0.9)
+    assert evaluate('<output>{"text1_score": 1", "text2_score": "0.7", "text3_score": 0}</output>') == (1.0, 0.7, 0.0)
@@ -0,0 +1,17 @@
+import gc
+import weakref
+
+from utils.local_retriever import HashingEmbedder, token_bucket
+
+
+def test_token_bucket_cache_does_not_keep_embedders_alive():
+    embedder = HashingEmbedder(dim=64)
+    vectors = embedder.embed(["red cotton shirt", "blue shirt"])
+    reference = weakref.ref(embedder)
+    del embedder
+    gc.collect()
+
+    assert reference() is None
+    assert token_bucket.cache_info().maxsize is not None
+    assert vectors.shape == (2, 64)
+    assert HashingEmbedder(dim=64).embed(["red cotton shirt"])[0].tolist() == vectors[0].tolist()
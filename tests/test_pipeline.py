@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from utils.helpers import run_pipeline
+
+
+def run_with_timeout(timeout=10, **kwargs):
+    """Run the pipeline in a thread, so a deadlock fails the test instead of hanging it."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = run_pipeline(**kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "run_pipeline deadlocked"
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+@pytest.mark.parametrize("producer_workers, consumer_workers", [(1, 1), (3, 2), (2, 4)])
+def test_results_keep_the_item_order(producer_workers, consumer_workers):
+    def produce(item):
+        time.sleep(0.001 * (item % 3))
+        return item * 10
+
+    results = run_with_timeout(
+        items=range(40), produce=produce, consume=lambda item, produced: (item, produced + 1), queue_depth=2,
+        producer_workers=producer_workers, consumer_workers=consumer_workers,
+    )
+    assert results == [(i, i * 10 + 1) for i in range(40)]
+
+
+def test_stages_overlap():
+    def produce(item):
+        time.sleep(0.05)
+        return item
+
+    def consume(item, produced):
+        time.sleep(0.05)
+        return produced
+
+    start = time.perf_counter()
+    assert run_with_timeout(items=range(6), produce=produce, consume=consume) == list(range(6))
+    # Sequential stages would take 0.6 s
+    assert time.perf_counter() - start < 0.5
+
+
+def test_producer_error_stops_the_pipeline():
+    produced = []
+
+    def produce(item):
+        if item == 3:
+            raise ValueError("retrieval failed")
+        produced.append(item)
+        return item
+
+    with pytest.raises(ValueError, match="retrieval failed"):
+        run_with_timeout(items=range(100), produce=produce, consume=lambda item, p: p, queue_depth=1)
+    assert len(produced) < 100
+
+
+@pytest.mark.parametrize("consumer_workers", [1, 3])
+def test_consumer_error_does_not_deadlock_producers(consumer_workers):
+    consumed = []
+
+    def consume(item, produced):
+        if item == 2:
+            raise RuntimeError("generation failed")
+        consumed.append(item)
+        return produced
+
+    # More items than the queue holds, producers must not block on a queue nobody drains
+    with pytest.raises(RuntimeError, match="generation failed"):
+        run_with_timeout(
+            items=range(50), produce=lambda item: item, consume=consume, queue_depth=1,
+            producer_workers=2, consumer_workers=consumer_workers,
+        )
+    assert 2 not in consumed
+
+
+def test_empty_input():
+    assert run_with_timeout(items=[], produce=lambda item: item, consume=lambda item, p: p) == []
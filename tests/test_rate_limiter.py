@@ -0,0 +1,104 @@
+import botocore.exceptions
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import AdaptiveRateLimiter, is_throttling_exception
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # Like a real sleep, always let some time pass, rounding errors leave waits of about 1e-16 s
+        self.now += max(seconds, 1e-6)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "perf_counter", clock.perf_counter)
+    monkeypatch.setattr(rate_limiter.time, "sleep", clock.sleep)
+    return clock
+
+
+def client_error(code):
+    return botocore.exceptions.ClientError({"Error": {"Code": code, "Message": code}}, "Converse")
+
+
+def make_limiter(**kwargs):
+    params = dict(initial_rate=4.0, min_rate=0.5, max_rate=8.0, additive_increase=1.0, multiplicative_decrease=0.5)
+    params.update(kwargs)
+    return AdaptiveRateLimiter(**params)
+
+
+def test_is_throttling_exception():
+    assert is_throttling_exception(client_error("ThrottlingException"))
+    assert is_throttling_exception(client_error("TooManyRequestsException"))
+    assert not is_throttling_exception(client_error("ValidationException"))
+    assert not is_throttling_exception(RuntimeError("ThrottlingException"))
+
+
+def test_success_increases_the_rate_additively(clock):
+    limiter = make_limiter()
+    # One second of traffic at rate r is r calls of additive_increase / r each
+    for _ in range(4):
+        limiter.on_success()
+    assert 4.9 < limiter.rate < 5.0
+    assert limiter.success_count == 4
+
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 8.0
+
+
+def test_throttle_decreases_the_rate_multiplicatively_once_per_cooldown(clock):
+    limiter = make_limiter(decrease_cooldown=1.0)
+    limiter.on_throttle()
+    assert limiter.rate == 2.0
+
+    # Throttles of requests already in flight do not compound
+    clock.now += 0.5
+    limiter.on_throttle()
+    assert limiter.rate == 2.0
+
+    clock.now += 1.0
+    limiter.on_throttle()
+    assert limiter.rate == 1.0
+    for _ in range(5):
+        clock.now += 1.0
+        limiter.on_throttle()
+    assert limiter.rate == 0.5
+    assert limiter.throttle_count == 8
+
+
+def test_acquire_paces_calls_at_the_current_rate(clock):
+    limiter = make_limiter(initial_rate=2.0)
+    start = clock.now
+    for _ in range(5):
+        limiter.acquire()
+    # The initial token is spent at once, then one call every 1 / rate seconds
+    assert clock.now - start == pytest.approx(2.0)
+
+
+def test_call_adapts_to_the_outcome_and_reraises(clock):
+    limiter = make_limiter()
+    assert limiter.call(lambda x: x + 1, 1) == 2
+    assert limiter.success_count == 1
+
+    def throttled():
+        raise client_error("ThrottlingException")
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        limiter.call(throttled)
+    assert limiter.throttle_count == 1
+    assert limiter.rate < 4.0
+
+    rate = limiter.rate
+    with pytest.raises(ValueError):
+        limiter.call(lambda: int("not a number"))
+    assert limiter.rate == rate
+    assert (limiter.success_count, limiter.throttle_count) == (1, 1)
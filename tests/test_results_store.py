@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from utils.results_store import ResultsStore
+
+
+RECORDS = [
+    {"input_text": "q0", "ground_truth": "a0", "llm_response": "r0", "inference_time": 1.5, "output_tokens": 12,
+     "stage_timings": {"retrieve": 0.1, "generate": 0.2}},
+    {"input_text": "q1", "ground_truth": "a1", "llm_response": {"error": "endpoint failed"}, "inference_time": 2.0,
+     "output_tokens": None},
+    {"ground_truth": "a2", "input_text": "q2", "llm_response": "r2", "inference_time": 0.5,
+     "bert_score": 0.1, "llm_evaluator_score": 0.2},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "store"))
+    store.append("rag", RECORDS)
+    return store
+
+
+def test_dict_response_is_stored_as_text(store):
+    df = store.load("rag", columns=["ground_truth", "llm_response"])
+    assert df.columns.tolist() == ["question_index", "approach", "ground_truth", "llm_response"]
+    assert json.loads(df.loc[1, "llm_response"]) == {"error": "endpoint failed"}
+
+
+def test_nested_stage_timings_are_flattened(store):
+    df = store.load("rag")
+    assert df.loc[0, "stage_timings.retrieve"] == 0.1
+    assert "_record" not in df.columns
+
+
+def test_export_round_trip_without_scores(store, tmp_path):
+    path = tmp_path / "rag_results.json"
+    store.export_json("rag", str(path))
+    exported = json.loads(path.read_text())
+    # Records are unchanged, stale scores of unscored records are dropped like Evaluation.save_scores does
+    assert exported[:2] == RECORDS[:2]
+    assert [list(record) for record in exported[:2]] == [list(record) for record in RECORDS[:2]]
+    assert exported[2] == {key: value for key, value in RECORDS[2].items() if "score" not in key}
+
+
+def test_export_with_latest_scores(store, tmp_path):
+    store.append_scores("rag", [0, 2], [{"bert_score": 0.5, "judge": 0.5, "llm_evaluator_score": 0.5}] * 2)
+    store.append_scores("rag", [0], [{"bert_score": 0.9, "judge": 1.0, "llm_evaluator_score": 1.0}])
+    path = tmp_path / "rag_results.json"
+    store.export_json("rag", str(path))
+    exported = json.loads(path.read_text())
+
+    assert exported[0] == {**RECORDS[0], "bert_score": 0.9, "judge": 1.0, "llm_evaluator_score": 1.0}
+    assert exported[1] == RECORDS[1]
+    # Scores of a record that was scored before keep their position
+    assert list(exported[2]) == list(RECORDS[2]) + ["judge"]
+    assert exported[2]["bert_score"] == 0.5
+
+
+def test_aggregate_only_averages_scored_rows(store):
+    store.append_scores("rag", [0, 1], [{"bert_score": 0.8, "llm_evaluator_score": 1.0},
+                                        {"bert_score": 0.6, "llm_evaluator_score": 0.0}])
+    aggregated = store.aggregate(["bert_score", "llm_evaluator_score", "inference_time"])
+    assert aggregated.loc["rag", "samples"] == 2
+    assert aggregated.loc["rag", "bert_score"] == pytest.approx(0.7)
+    assert aggregated.loc["rag", "inference_time"] == pytest.approx(1.75)
+
+
+def test_export_list_valued_scores(store, tmp_path):
+    store.append_scores("rag", [0, 1], [{"bert_score": 0.9, "judges_consulted": ["cheap"]},
+                                        {"bert_score": 0.8, "judges_consulted": ["cheap", "medium"]}])
+    path = tmp_path / "rag_results.json"
+    store.export_json("rag", str(path))
+    exported = json.loads(path.read_text())
+
+    assert exported[0]["judges_consulted"] == ["cheap"]
+    assert exported[1]["judges_consulted"] == ["cheap", "medium"]
+    assert "judges_consulted" not in exported[2]
@@ -0,0 +1,30 @@
+from src.rag import Rag
+from utils.chunking import CHUNKING_STRATEGIES
+from utils.local_retriever import LocalKnowledgeBase
+
+
+KB_CONFIGS = {"vectorSearchConfiguration": {"numberOfResults": 1}}
+
+
+def make_rag(data_dir, cache_dir, max_tokens):
+    kb_client = LocalKnowledgeBase(str(data_dir), CHUNKING_STRATEGIES[1], max_tokens, 0)
+    return Rag("us-east-1", KB_CONFIGS, {"prompt": "{context} {question}"}, retrieval_cache_dir=str(cache_dir),
+               kb_client=kb_client)
+
+
+def test_rebuilt_local_index_is_not_served_from_disk_cache(tmp_path):
+    data_dir = tmp_path / "kb"
+    data_dir.mkdir()
+    (data_dir / "catalog.txt").write_text(" ".join(f"product{i} costs {i} dollars." for i in range(200)))
+    cache_dir = tmp_path / "cache"
+
+    first = make_rag(data_dir, cache_dir, 512).retrieve("local", "product7 price")
+    # Same settings in a new process: served from the disk tier
+    rag = make_rag(data_dir, cache_dir, 512)
+    assert rag.retrieve("local", "product7 price") == first
+    assert rag.retrieval_cache.hits == 1
+
+    rebuilt = make_rag(data_dir, cache_dir, 64)
+    docs = rebuilt.retrieve("local", "product7 price")
+    assert rebuilt.retrieval_cache.hits == 0
+    assert len(docs[0]["content"]["text"].split()) < len(first[0]["content"]["text"].split())
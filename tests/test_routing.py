@@ -0,0 +1,67 @@
+import pytest
+
+from utils.routing import ScoreRouter
+
+
+def doc(score, text="some retrieved text"):
+    return {"content": {"text": text}, "score": score}
+
+
+@pytest.mark.parametrize("top_score, route", [
+    (0.2, "no_context"),
+    (0.49, "no_context"),
+    (0.5, "full_context"),
+    (0.74, "full_context"),
+    (0.75, "trimmed_context"),
+    (0.9, "trimmed_context"),
+])
+def test_route_follows_the_top_score(top_score, route):
+    router = ScoreRouter(no_context_threshold=0.5, trim_threshold=0.75)
+    assert router.route([doc(0.1), doc(top_score)])[0] == route
+
+
+def test_route_documents():
+    router = ScoreRouter(no_context_threshold=0.5, trim_threshold=0.75, trimmed_max_chunks=2)
+    docs = [doc(0.6), doc(0.8), doc(0.95), doc(0.77)]
+
+    route, routed = router.route(docs)
+    assert route == "trimmed_context"
+    assert [d["score"] for d in routed] == [0.95, 0.8]
+
+    route, routed = router.route([doc(0.6), doc(0.3)])
+    assert route == "full_context"
+    assert [d["score"] for d in routed] == [0.6, 0.3]
+
+    assert router.route([]) == ("no_context", [])
+    assert router.route([doc(0.3)]) == ("no_context", [])
+
+
+def test_thresholds_must_be_ordered():
+    with pytest.raises(ValueError):
+        ScoreRouter(no_context_threshold=0.8, trim_threshold=0.7)
+
+
+def test_context_tokens():
+    assert ScoreRouter.context_tokens([doc(0.5, "one two three"), doc(0.4, "four")]) == 4
+
+
+def test_summarize_estimates_latency_saved_against_full_context():
+    records = [
+        {"route": "full_context", "tokens_saved": 0, "inference_time": 2.0},
+        {"route": "full_context", "tokens_saved": 0, "inference_time": 4.0},
+        {"route": "trimmed_context", "tokens_saved": 300, "inference_time": 2.5},
+        {"route": "no_context", "tokens_saved": 900, "inference_time": 1.0},
+        {"route": None, "inference_time": 9.0},
+    ]
+    summary = ScoreRouter.summarize(records)
+
+    assert summary["full_context"] == {"count": 2, "avg_inference_time": 3.0, "tokens_saved": 0}
+    assert summary["no_context"]["tokens_saved"] == 900
+    assert [record.get("latency_saved") for record in records] == [0.0, 0.0, 0.5, 2.0, None]
+    assert summary["latency_saved"] == 2.5
+
+
+def test_summarize_without_full_context_records():
+    records = [{"route": "no_context", "tokens_saved": 10, "inference_time": 1.0}]
+    assert ScoreRouter.summarize(records)["latency_saved"] is None
+    assert "latency_saved" not in records[0]
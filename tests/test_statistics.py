@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from utils.statistics import alpha_spending, bootstrap_mean_ci, pairwise_difference_intervals, ranking_settled
+
+
+def test_bootstrap_mean_ci_contains_mean():
+    values = np.random.default_rng(0).normal(1.0, 0.5, 500)
+    lower, upper = bootstrap_mean_ci(values, 1000, rng=np.random.default_rng(1))
+    assert lower < values.mean() < upper
+    assert upper - lower == pytest.approx(2 * 1.96 * values.std() / np.sqrt(len(values)), rel=0.2)
+
+
+def test_bootstrap_mean_ci_blocks_match_single_pass():
+    values = np.random.default_rng(0).random((200, 3))
+    full = bootstrap_mean_ci(values, 300, rng=np.random.default_rng(5))
+    blocked = bootstrap_mean_ci(values, 300, rng=np.random.default_rng(5), max_block_elements=200 * 3 * 7)
+    assert full[0].shape == (3,)
+    np.testing.assert_allclose(full, blocked)
+
+
+def test_bootstrap_mean_ci_rejects_empty_sample():
+    with pytest.raises(ValueError):
+        bootstrap_mean_ci(np.array([]))
+
+
+def test_ranking_settled_only_when_every_pair_is_separated():
+    rng = np.random.default_rng(0)
+    separated = {"a": rng.normal(0.9, 0.1, 300), "b": rng.normal(0.5, 0.1, 300), "c": rng.normal(0.1, 0.1, 300)}
+    assert ranking_settled(pairwise_difference_intervals(separated, 500, rng=rng))
+
+    tied = dict(separated, c=separated["b"] + rng.normal(0, 0.01, 300))
+    intervals = pairwise_difference_intervals(tied, 500, rng=rng)
+    assert not ranking_settled(intervals)
+    assert [interval["separated"] for interval in intervals] == [True, True, False]
+
+
+@pytest.mark.parametrize("spending", ["obrien_fleming", "uniform"])
+def test_alpha_spending_sums_to_alpha(spending):
+    fractions = [n / 400 for n in range(60, 420, 20)]
+    alphas = alpha_spending(fractions, 0.05, spending)
+    assert len(alphas) == len(fractions)
+    assert all(alpha > 0 for alpha in alphas)
+    assert sum(alphas) == pytest.approx(0.05)
+
+
+def test_obrien_fleming_keeps_alpha_for_the_last_look():
+    alphas = alpha_spending([0.25, 0.5, 0.75, 1.0], 0.05)
+    assert alphas == sorted(alphas)
+    assert alphas[0] < 0.001
+
+
+def test_alpha_spending_rejects_unknown_function():
+    with pytest.raises(ValueError):
+        alpha_spending([1.0], 0.05, "pocock")
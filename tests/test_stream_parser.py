@@ -0,0 +1,86 @@
+import json
+from types import SimpleNamespace
+
+from utils.helpers import template_and_predict_stream
+
+
+TEMPLATE = {"prompt": "{context}\n{question}"}
+
+
+class FakeStreamBody:
+    """Event stream of invoke_endpoint_with_response_stream, yielding the given byte parts."""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        for part in self.parts:
+            if self.closed:
+                return
+            self.sent += 1
+            yield {"PayloadPart": {"Bytes": part}}
+
+
+def make_predictor(body):
+    calls = []
+
+    def invoke_endpoint_with_response_stream(**kwargs):
+        calls.append(kwargs)
+        return {"Body": body}
+
+    body.close = lambda: setattr(body, "closed", True)
+    runtime = SimpleNamespace(invoke_endpoint_with_response_stream=invoke_endpoint_with_response_stream)
+    predictor = SimpleNamespace(
+        endpoint_name="endpoint",
+        sagemaker_session=SimpleNamespace(sagemaker_runtime_client=runtime),
+    )
+    return predictor, calls
+
+
+def sse(*tokens, special=()):
+    return b"".join(
+        b"data:" + json.dumps({"token": {"text": text, "special": text in special}}).encode() + b"\n\n"
+        for text in tokens
+    )
+
+
+def split_every(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def predict(parts, **kwargs):
+    body = FakeStreamBody(parts)
+    predictor, calls = make_predictor(body)
+    _, ground_truth, response = template_and_predict_stream(predictor, TEMPLATE, "q", "c", "truth", **kwargs)
+    assert ground_truth == "truth"
+    return response, body, calls
+
+
+def test_frames_split_across_reads_are_reassembled():
+    stream = sse("Hello", ",", " world", "</s>", special=("</s>",))
+    for size in (1, 3, 7, len(stream)):
+        response, _, _ = predict(split_every(stream, size))
+        assert response["generated_text"] == "Hello, world"
+        assert response["metrics"]["output_tokens"] == 3
+
+
+def test_several_frames_in_one_read():
+    response, _, calls = predict([sse("a", "b") + sse("c")[:4], sse("c")[4:]])
+    assert response["generated_text"] == "abc"
+    assert json.loads(calls[0]["Body"])["stream"] is True
+
+
+def test_final_frame_without_trailing_newline_is_parsed():
+    response, _, _ = predict([sse("a"), sse("b").rstrip(b"\n")])
+    assert response["generated_text"] == "ab"
+
+
+def test_stop_sequence_spanning_tokens_closes_the_stream():
+    parts = [sse(token) for token in ("Answer", " here", "\n#", "## Question", " more")]
+    response, body, calls = predict(parts, stop_sequences=["\n###"])
+
+    assert response["generated_text"] == "Answer here"
+    assert body.closed and body.sent == 4
+    assert json.loads(calls[0]["Body"])["parameters"]["stop"] == ["\n###"]
@@ -4,9 +4,13 @@ Handles communication to Bedrock and KnowledgeBases
 """
 import base64
 import json
-from typing import Optional
+from typing import Iterator, Optional
 import os
 
+from utils.latency import StreamMetrics
+from utils.rate_limiter import rate_limited_call
+from utils.hedging import hedged_call
+
 class BedrockHandler:
     """
     A class to handle interactions with Bedrock models and manage messages.
@@ -59,11 +63,61 @@ class BedrockHandler:
         Returns:
             dict: The response from the Bedrock model.
         """
-        return self.client.converse(
+        # The rate limiter admits the request once, a hedged duplicate does not take another token
+        return rate_limited_call(
+            "converse",
+            self.model_id,
+            hedged_call,
+            "converse",
+            self.model_id,
+            self.client.converse,
+            modelId=self.model_id,
+            messages=messages,
+            inferenceConfig={"temperature": 0.0},
+        )
+
+    def stream_model(self, messages: list, metrics: Optional[StreamMetrics] = None) -> Iterator[str]:
+        """
+        Invoke the Bedrock model with converse_stream and yield the generated text as it arrives.
+
+        Args:
+            messages (list): A list of message dictionaries containing the conversation history.
+            metrics (StreamMetrics, optional): Collects time-to-first-token and decode timings.
+
+        Yields:
+            str: Text deltas of the response.
+        """
+        # converse and converse_stream share the model quota
+        response = rate_limited_call(
+            "converse",
+            self.model_id,
+            self.client.converse_stream,
             modelId=self.model_id,
             messages=messages,
             inferenceConfig={"temperature": 0.0},
         )
+        for event in response["stream"]:
+            if "contentBlockDelta" in event:
+                text = event["contentBlockDelta"]["delta"].get("text", "")
+                if metrics is not None:
+                    metrics.record_delta()
+                yield text
+            elif "metadata" in event and metrics is not None:
+                metrics.set_output_tokens(event["metadata"].get("usage", {}).get("outputTokens"))
+
+    def invoke_model_stream(self, messages: list) -> dict:
+        """
+        Invoke the Bedrock model in streaming mode and collect the full response.
+
+        Args:
+            messages (list): A list of message dictionaries containing the conversation history.
+
+        Returns:
+            dict: The response text under "text" and the StreamMetrics summary under "metrics".
+        """
+        metrics = StreamMetrics()
+        text = "".join(self.stream_model(messages, metrics))
+        return {"text": text, "metrics": metrics.summary()}
 
 
 class KBHandler:
@@ -94,15 +148,24 @@ class KBHandler:
         Returns:
             list[dict]: A list of dictionaries representing the retrieved documents.
         """
-        return (
-            self.client.retrieve(
+        if not self.kb_id:
+            return []
+
+        if not getattr(self.client, "rate_limited", True):
+            return self.client.retrieve(
                 retrievalQuery={"text": prompt},
                 knowledgeBaseId=self.kb_id,
                 retrievalConfiguration=self.params,
             )["retrievalResults"]
-            if self.kb_id
-            else []
-        )
+
+        return rate_limited_call(
+            "retrieve",
+            self.kb_id,
+            self.client.retrieve,
+            retrievalQuery={"text": prompt},
+            knowledgeBaseId=self.kb_id,
+            retrievalConfiguration=self.params,
+        )["retrievalResults"]
 
     @staticmethod
     def parse_kb_output_to_string(docs: list[dict]) -> str:
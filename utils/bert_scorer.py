@@ -0,0 +1,100 @@
+"""
+Long-lived BERTScore scorer for the evaluation step
+"""
+import threading
+from typing import Dict, List, Optional
+
+
+class BertScorer:
+    """
+    Scores the responses of several approaches against the same references in one batched pass.
+
+    The underlying bert_score.BERTScorer is loaded once, on first use, from model_type, which may be a
+    local model directory so the evaluation runs without network access. bert_score deduplicates the
+    sentences of a pass before encoding them, so a reference shared by every approach is encoded once.
+
+    Scores match evaluate.load("bertscore").compute(..., lang="en") for the same model and layer.
+    """
+
+    def __init__(self, model_type: str = "roberta-large", num_layers: Optional[int] = 17, batch_size: int = 64,
+                 torch_threads: Optional[int] = None, device: Optional[str] = None):
+        """
+        Initialize the scorer.
+
+        Args:
+            model_type (str): Hugging Face model name or local model directory.
+            num_layers (int, optional): Layer whose embeddings are compared. Required for local model
+                directories, bert_score only knows the default layer of named models.
+            batch_size (int): Sentences encoded per forward pass.
+            torch_threads (int, optional): torch CPU threads, None keeps the torch default.
+            device (str, optional): "cpu" or "cuda", None picks cuda when available.
+        """
+        self.model_type = model_type
+        self.num_layers = num_layers
+        self.batch_size = batch_size
+        self.torch_threads = torch_threads
+        self.device = device
+
+        self._scorer = None
+        self._lock = threading.Lock()
+
+    @property
+    def scorer(self):
+        """The bert_score.BERTScorer, loaded on first access. torch and bert_score are only imported here."""
+        with self._lock:
+            if self._scorer is None:
+                import torch
+                from bert_score import BERTScorer
+
+                if self.torch_threads:
+                    torch.set_num_threads(self.torch_threads)
+                self._scorer = BERTScorer(
+                    model_type=self.model_type,
+                    num_layers=self.num_layers,
+                    batch_size=self.batch_size,
+                    device=self.device,
+                    lang="en",
+                )
+            return self._scorer
+
+    def score(self, references: List[str], predictions: List[str]) -> Dict[str, List[float]]:
+        """
+        Score predictions against references.
+
+        Args:
+            references (List[str]): Reference texts.
+            predictions (List[str]): Generated texts, one per reference.
+
+        Returns:
+            Dict[str, List[float]]: "precision", "recall" and "f1" per prediction.
+        """
+        precision, recall, f1 = self.scorer.score(predictions, references, batch_size=self.batch_size)
+        return {
+            "precision": precision.tolist(),
+            "recall": recall.tolist(),
+            "f1": f1.tolist(),
+        }
+
+    def score_approaches(self, references: List[str], predictions: Dict[str, List[str]]) -> Dict[str, Dict[str, List[float]]]:
+        """
+        Score the predictions of every approach against the same references in one pass.
+
+        Args:
+            references (List[str]): Reference texts.
+            predictions (Dict[str, List[str]]): Generated texts per approach, each aligned with references.
+
+        Returns:
+            Dict[str, Dict[str, List[float]]]: Output of score() per approach.
+        """
+        for approach, texts in predictions.items():
+            if len(texts) != len(references):
+                raise ValueError(f"{approach} has {len(texts)} predictions for {len(references)} references")
+
+        all_predictions = [text for texts in predictions.values() for text in texts]
+        scores = self.score(references * len(predictions), all_predictions)
+
+        results = {}
+        for i, approach in enumerate(predictions):
+            start, end = i * len(references), (i + 1) * len(references)
+            results[approach] = {metric: values[start:end] for metric, values in scores.items()}
+        return results
@@ -0,0 +1,220 @@
+"""
+Local implementation of the Knowledge Base chunking strategies configured in KbConfig.
+
+The KB infra stack maps KbConfig.CHUNKING_STRATEGY to the data source chunking configuration:
+    "Fixed-size chunking"  FIXED_SIZE with KbConfig.MAX_TOKENS and KbConfig.OVERLAP_PERCENTAGE
+    "Default chunking"     FIXED_SIZE with 300 tokens and 20% overlap
+    "No chunking"          NONE, every file is a single chunk
+
+Tokens are approximated by whitespace-delimited words, so chunk boundaries are close to, but not
+identical with, the ones Bedrock computes with the embedding model tokenizer.
+"""
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from config import CHUNKING_STRATEGIES
+
+
+# Bump when chunk boundaries change, so persisted local indexes are rebuilt
+CHUNKER_VERSION = 1
+
+DEFAULT_CHUNKING_MAX_TOKENS = 300
+DEFAULT_CHUNKING_OVERLAP_PERCENTAGE = 20
+
+# A token keeps its trailing whitespace, so joining tokens gives back the original text
+TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+
+@dataclass
+class Chunk:
+    """A chunk of a source document"""
+    text: str
+    source: str
+    chunk_index: int
+    token_count: int
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens the same way the chunker does.
+
+    Args:
+        text (str): Input text.
+
+    Returns:
+        int: Number of whitespace-delimited tokens.
+    """
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def resolve_chunking_params(chunking_strategy: str, max_tokens: int, overlap_percentage: int) -> Optional[Tuple[int, int]]:
+    """
+    Resolve the effective chunk size and overlap of a chunking strategy.
+
+    Args:
+        chunking_strategy (str): One of the values of CHUNKING_STRATEGIES.
+        max_tokens (int): KbConfig.MAX_TOKENS, used by "Fixed-size chunking".
+        overlap_percentage (int): KbConfig.OVERLAP_PERCENTAGE, used by "Fixed-size chunking".
+
+    Returns:
+        Tuple[int, int] or None: (max tokens per chunk, overlapping tokens), or None for "No chunking".
+
+    Raises:
+        ValueError: If the chunking strategy is unknown.
+    """
+    if chunking_strategy == CHUNKING_STRATEGIES[2]:
+        return None
+    if chunking_strategy == CHUNKING_STRATEGIES[0]:
+        max_tokens, overlap_percentage = DEFAULT_CHUNKING_MAX_TOKENS, DEFAULT_CHUNKING_OVERLAP_PERCENTAGE
+    elif chunking_strategy != CHUNKING_STRATEGIES[1]:
+        raise ValueError(f"Unknown chunking strategy: {chunking_strategy}")
+
+    if max_tokens < 1 or not 0 <= overlap_percentage < 100:
+        raise ValueError("max_tokens must be positive and overlap_percentage in [0, 100)")
+    return max_tokens, int(max_tokens * overlap_percentage / 100)
+
+
+def iter_tokens(file: TextIO, block_size: int = 1 << 16) -> Iterator[str]:
+    """
+    Stream tokens from a text file in fixed-size blocks.
+
+    Args:
+        file (TextIO): Open text file.
+        block_size (int): Number of characters read at a time.
+
+    Yields:
+        str: Tokens with their trailing whitespace.
+    """
+    carry = ""
+    for block in iter(lambda: file.read(block_size), ""):
+        tokens = TOKEN_PATTERN.findall(carry + block)
+        if not tokens:
+            carry = ""
+            continue
+        # The last token may continue in the next block
+        carry = tokens.pop()
+        yield from tokens
+    if carry.strip():
+        yield carry
+
+
+def iter_file_chunks(file_path: str, chunking_strategy: str, max_tokens: int, overlap_percentage: int) -> Iterator[Chunk]:
+    """
+    Stream the chunks of a single file. Memory is bounded by the chunk size, except for
+    "No chunking" where the whole file is one chunk.
+
+    Args:
+        file_path (str): Path of the source document.
+        chunking_strategy (str): One of the values of CHUNKING_STRATEGIES.
+        max_tokens (int): KbConfig.MAX_TOKENS
+        overlap_percentage (int): KbConfig.OVERLAP_PERCENTAGE
+
+    Yields:
+        Chunk: Chunks in document order.
+    """
+    params = resolve_chunking_params(chunking_strategy, max_tokens, overlap_percentage)
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        if params is None:
+            tokens = list(iter_tokens(f))
+            if tokens:
+                yield Chunk("".join(tokens).strip(), file_path, 0, len(tokens))
+            return
+
+        chunk_size, overlap = params
+        window = deque()
+        new_tokens = 0
+        chunk_index = 0
+        for token in iter_tokens(f):
+            window.append(token)
+            new_tokens += 1
+            if len(window) == chunk_size:
+                yield Chunk("".join(window).strip(), file_path, chunk_index, chunk_size)
+                chunk_index += 1
+                # Keep the overlapping tail as the head of the next chunk
+                for _ in range(chunk_size - overlap):
+                    window.popleft()
+                new_tokens = 0
+
+        if new_tokens:
+            yield Chunk("".join(window).strip(), file_path, chunk_index, len(window))
+
+
+def iter_chunks(paths: Iterable[str], chunking_strategy: str, max_tokens: int, overlap_percentage: int) -> Iterator[Chunk]:
+    """
+    Stream the chunks of several files, or of every file of a directory.
+
+    Args:
+        paths (Iterable[str]): Files or directories (not recursive) to chunk.
+        chunking_strategy (str): One of the values of CHUNKING_STRATEGIES.
+        max_tokens (int): KbConfig.MAX_TOKENS
+        overlap_percentage (int): KbConfig.OVERLAP_PERCENTAGE
+
+    Yields:
+        Chunk: Chunks of all files, file by file in sorted order.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            file_paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+        else:
+            file_paths = [path]
+        for file_path in file_paths:
+            if os.path.isfile(file_path):
+                yield from iter_file_chunks(file_path, chunking_strategy, max_tokens, overlap_percentage)
+
+
+def chunking_stats(paths: Iterable[str], chunking_strategy: str, max_tokens: int, overlap_percentage: int,
+                   number_of_results: int) -> dict:
+    """
+    Summarize the chunks a strategy produces without keeping them in memory.
+
+    Args:
+        paths (Iterable[str]): Files or directories to chunk.
+        chunking_strategy (str): One of the values of CHUNKING_STRATEGIES.
+        max_tokens (int): KbConfig.MAX_TOKENS
+        overlap_percentage (int): KbConfig.OVERLAP_PERCENTAGE
+        number_of_results (int): RAGConfig.NUMBER_OF_RESULTS, chunks added to every prompt.
+
+    Returns:
+        dict: Chunk count, token totals and the expected context tokens per prompt.
+    """
+    chunk_count = 0
+    chunk_tokens = 0
+    max_chunk_tokens = 0
+    for chunk in iter_chunks(paths, chunking_strategy, max_tokens, overlap_percentage):
+        chunk_count += 1
+        chunk_tokens += chunk.token_count
+        max_chunk_tokens = max(max_chunk_tokens, chunk.token_count)
+
+    avg_chunk_tokens = chunk_tokens / chunk_count if chunk_count else 0
+    return {
+        'chunking_strategy': chunking_strategy,
+        'chunk_count': chunk_count,
+        'indexed_tokens': chunk_tokens,
+        'avg_tokens_per_chunk': round(avg_chunk_tokens, 2),
+        'max_tokens_per_chunk': max_chunk_tokens,
+        'avg_context_tokens_per_prompt': round(avg_chunk_tokens * min(number_of_results, chunk_count), 2),
+    }
+
+
+def compare_chunking_strategies(paths: List[str], max_tokens: int, overlap_percentage: int,
+                                number_of_results: int) -> List[dict]:
+    """
+    Run chunking_stats for every strategy of CHUNKING_STRATEGIES.
+
+    Args:
+        paths (List[str]): Files or directories to chunk.
+        max_tokens (int): KbConfig.MAX_TOKENS
+        overlap_percentage (int): KbConfig.OVERLAP_PERCENTAGE
+        number_of_results (int): RAGConfig.NUMBER_OF_RESULTS
+
+    Returns:
+        List[dict]: One summary per strategy.
+    """
+    return [
+        chunking_stats(paths, strategy, max_tokens, overlap_percentage, number_of_results)
+        for strategy in CHUNKING_STRATEGIES.values()
+    ]
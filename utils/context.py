@@ -0,0 +1,161 @@
+"""
+Assembles retrieved knowledge base chunks into a prompt context under a token budget
+"""
+import json
+from typing import List, Optional
+
+
+class ContextAssembler:
+    """
+    Builds the context string of RAG and Hybrid prompts from retrieval results.
+
+    Compared to KBHandler.parse_kb_output_to_string it
+        1. merges chunks of the same source whose text overlaps (fixed-size chunking repeats
+           OVERLAP_PERCENTAGE of every chunk in the next one) into a single span,
+        2. drops chunks that are near-duplicates of a higher scored chunk,
+        3. packs the remaining chunks by decreasing score into the token budget of the target model.
+
+    The output keeps the "Document i: ..." format of parse_kb_output_to_string. Tokens are counted as
+    whitespace-delimited words, like in utils.chunking.
+    """
+
+    def __init__(self, token_budgets: Optional[dict] = None, default_token_budget: Optional[int] = None,
+                 similarity_threshold: float = 0.9, min_overlap_tokens: int = 8, shingle_size: int = 5):
+        """
+        Initialize the context assembler.
+
+        Args:
+            token_budgets (dict, optional): Context token budget per target model ID.
+            default_token_budget (int, optional): Budget for models missing from token_budgets. None means unlimited.
+            similarity_threshold (float): Jaccard similarity of word shingles above which a chunk is a near-duplicate.
+            min_overlap_tokens (int): Minimum number of shared tokens for two chunks to be merged.
+            shingle_size (int): Number of words per shingle for near-duplicate detection.
+        """
+        self.token_budgets = token_budgets or {}
+        self.default_token_budget = default_token_budget
+        self.similarity_threshold = similarity_threshold
+        self.min_overlap_tokens = min_overlap_tokens
+        self.shingle_size = shingle_size
+
+    def token_budget(self, model_id: Optional[str]) -> Optional[int]:
+        """
+        Args:
+            model_id (str, optional): Target model ID.
+
+        Returns:
+            int or None: Context token budget of the model, None if unlimited.
+        """
+        return self.token_budgets.get(model_id, self.default_token_budget)
+
+    def _overlap(self, head: List[str], tail: List[str]) -> int:
+        """Length of the longest suffix of head that is a prefix of tail."""
+        if not head or not tail:
+            return 0
+        start = max(0, len(head) - len(tail))
+        for i in range(start, len(head) - self.min_overlap_tokens + 1):
+            if head[i] == tail[0] and head[i:] == tail[:len(head) - i]:
+                return len(head) - i
+        return 0
+
+    def merge_overlapping(self, spans: List[dict]) -> List[dict]:
+        """
+        Merge spans of the same source whose text overlaps.
+
+        Args:
+            spans (List[dict]): Spans with "text", "words", "score" and "source" keys.
+
+        Returns:
+            List[dict]: Merged spans. A merged span keeps the highest score of its parts.
+        """
+        merged = True
+        while merged:
+            merged = False
+            for i, first in enumerate(spans):
+                for j, second in enumerate(spans):
+                    if i == j or first["source"] != second["source"]:
+                        continue
+                    overlap = self._overlap(first["words"], second["words"])
+                    if overlap:
+                        first["words"] = first["words"] + second["words"][overlap:]
+                        first["text"] = None
+                        first["score"] = max(first["score"], second["score"])
+                        del spans[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return spans
+
+    def _shingles(self, words: List[str]) -> set:
+        size = min(self.shingle_size, len(words)) or 1
+        return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+    def drop_near_duplicates(self, spans: List[dict]) -> List[dict]:
+        """
+        Keep only the highest scored span of every group of near-duplicates.
+
+        Args:
+            spans (List[dict]): Spans sorted by decreasing score.
+
+        Returns:
+            List[dict]: Spans without near-duplicates.
+        """
+        kept = []
+        for span in spans:
+            shingles = self._shingles(span["words"])
+            is_duplicate = False
+            for other in kept:
+                union = len(shingles | other["shingles"])
+                overlap = len(shingles & other["shingles"])
+                # A span fully contained in a kept span is a duplicate as well
+                if union and (overlap / union >= self.similarity_threshold or overlap == len(shingles)):
+                    is_duplicate = True
+                    break
+            if not is_duplicate:
+                span["shingles"] = shingles
+                kept.append(span)
+        return kept
+
+    def assemble(self, docs: List[dict], model_id: Optional[str] = None) -> str:
+        """
+        Assemble retrieval results into a context string.
+
+        Args:
+            docs (List[dict]): Retrieval results in the knowledge base "retrievalResults" format.
+            model_id (str, optional): Target model ID, selects the token budget.
+
+        Returns:
+            str: Context string with one "Document i: ..." entry per kept span.
+        """
+        spans = [
+            {
+                "text": doc["content"]["text"],
+                "words": doc["content"]["text"].split(),
+                "score": doc.get("score", 0.0),
+                "source": json.dumps(doc.get("location"), sort_keys=True, default=str),
+            }
+            for doc in docs
+        ]
+
+        spans = self.merge_overlapping(spans)
+        spans = sorted(spans, key=lambda span: span["score"], reverse=True)
+        spans = self.drop_near_duplicates(spans)
+
+        budget = self.token_budget(model_id)
+        texts = []
+        for span in spans:
+            words = span["words"]
+            if budget is not None:
+                # "Document i: " costs two tokens
+                available = budget - 2
+                if available <= 0:
+                    break
+                words = words[:available]
+                budget -= len(words) + 2
+            # Keep the original formatting of chunks that were neither merged nor truncated
+            if span["text"] is not None and len(words) == len(span["words"]):
+                texts.append(span["text"])
+            else:
+                texts.append(" ".join(words))
+
+        return "\n\n".join(f"Document {i + 1}: {text}" for i, text in enumerate(texts))
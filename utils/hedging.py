@@ -0,0 +1,193 @@
+"""
+Process-wide request hedging for Bedrock and SageMaker calls.
+
+A call that has not returned after a high percentile of the recently observed latency of its
+(API, resource) pair is issued a second time, and whichever attempt finishes first wins. The number of
+hedges is capped at a fraction of the traffic, so hedging cuts the tail latency for a bounded extra load.
+The losing attempt cannot be cancelled and runs to completion in the background, its result is dropped.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from config import HedgingConfig
+
+
+class Hedger:
+    """
+    Hedges calls after a percentile of a sliding window of call latencies.
+
+    Attributes:
+        request_count (int): Calls made through the hedger
+        hedges_issued (int): Duplicate attempts sent
+        hedges_won (int): Calls answered by the duplicate attempt
+    """
+
+    def __init__(self, percentile: float = 95, budget: float = 0.05, window_size: int = 200, min_samples: int = 20):
+        """
+        Initialize the hedger.
+
+        Args:
+            percentile (float): Latency percentile after which a duplicate is sent.
+            budget (float): Maximum hedges as a fraction of the calls, e.g. 0.05 for 5%.
+            window_size (int): Number of recent attempt latencies the percentile is computed over.
+            min_samples (int): Calls are not hedged before this many latencies were observed.
+        """
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+
+        self.request_count = 0
+        self.hedges_issued = 0
+        self.hedges_won = 0
+
+        self._latencies = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Returns:
+            float or None: Seconds to wait before hedging, None while there are too few samples.
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = np.fromiter(self._latencies, dtype=float)
+        return float(np.percentile(latencies, self.percentile))
+
+    def _record_latency(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _try_reserve_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges_issued + 1 > self.budget * self.request_count:
+                return False
+            self.hedges_issued += 1
+            return True
+
+    def _start_attempt(self, func: Callable, args: tuple, kwargs: dict) -> Future:
+        """Run func in a daemon thread, so an abandoned attempt never blocks the caller or the interpreter exit."""
+        future = Future()
+
+        def attempt():
+            start_time = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            self._record_latency(time.perf_counter() - start_time)
+            future.set_result(result)
+
+        threading.Thread(target=attempt, daemon=True).start()
+        return future
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call func, sending a duplicate if it is slower than the hedge delay and the budget allows it.
+
+        Args:
+            func (Callable): The service call. It must be safe to send twice.
+
+        Returns:
+            The return value of the first attempt that succeeds.
+
+        Raises:
+            Exception: The error of the primary attempt if every attempt failed.
+        """
+        with self._lock:
+            self.request_count += 1
+
+        delay = self.hedge_delay()
+        if delay is None:
+            start_time = time.perf_counter()
+            result = func(*args, **kwargs)
+            self._record_latency(time.perf_counter() - start_time)
+            return result
+
+        primary = self._start_attempt(func, args, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._try_reserve_hedge():
+            return primary.result()
+
+        hedge = self._start_attempt(func, args, kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result()
+        return primary.result()
+
+
+_hedgers: Dict[Tuple[str, str], Hedger] = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(api: str, resource_id: str) -> Optional[Hedger]:
+    """
+    Return the process-wide hedger of an API and resource, creating it on first use.
+
+    Args:
+        api (str): API name, e.g. "converse" or "predict".
+        resource_id (str): Model ID or endpoint name.
+
+    Returns:
+        Hedger or None: None when hedging is disabled in HedgingConfig.
+    """
+    if not HedgingConfig.ENABLED:
+        return None
+
+    with _hedgers_lock:
+        key = (api, resource_id)
+        if key not in _hedgers:
+            _hedgers[key] = Hedger(
+                percentile=HedgingConfig.PERCENTILE,
+                budget=HedgingConfig.BUDGET_PERCENT / 100,
+                window_size=HedgingConfig.WINDOW_SIZE,
+                min_samples=HedgingConfig.MIN_SAMPLES,
+            )
+        return _hedgers[key]
+
+
+def hedged_call(api: str, resource_id: str, func: Callable, *args, **kwargs):
+    """
+    Call func through the hedger of an API and resource.
+
+    Args:
+        api (str): API name, e.g. "converse" or "predict".
+        resource_id (str): Model ID or endpoint name.
+        func (Callable): The service call.
+
+    Returns:
+        The return value of func.
+    """
+    hedger = get_hedger(api, resource_id)
+    if hedger is None:
+        return func(*args, **kwargs)
+    return hedger.call(func, *args, **kwargs)
+
+
+def hedging_stats() -> Dict[str, dict]:
+    """
+    Returns:
+        Dict[str, dict]: Calls, hedges issued and hedges won of every hedger, keyed by "api:resource".
+    """
+    with _hedgers_lock:
+        return {
+            f"{api}:{resource_id}": {
+                'request_count': hedger.request_count,
+                'hedges_issued': hedger.hedges_issued,
+                'hedges_won': hedger.hedges_won,
+                'hedge_delay': hedger.hedge_delay(),
+            }
+            for (api, resource_id), hedger in _hedgers.items()
+        }
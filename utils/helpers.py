@@ -1,7 +1,11 @@
-import logging, boto3, os, json, re
-from typing import Dict, List, Tuple
+import logging, boto3, os, json, re, queue, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Tuple
 import pandas as pd
 
+from utils.latency import STAGES, latency_percentiles, stage_percentiles, StreamMetrics
+from utils.hedging import hedged_call
+
 
 # Configure logging
 logging.basicConfig(
@@ -36,15 +40,168 @@ def json_to_jsonl(json_file_path, output_file_path):
             json.dump(record, outfile)
             outfile.write('\n') 
 
-def template_and_predict(predictor, template, question, context, ground_truth, input_output_demarkation_key="\n\n### Response:\n"):
+def run_pipeline(items: Iterable, produce: Callable, consume: Callable, queue_depth: int = 8,
+                 producer_workers: int = 1, consumer_workers: int = 1) -> List:
+    """
+    Run a two stage producer/consumer pipeline over items.
+
+    Producers call produce(item) and put the outputs on a bounded queue, consumers take them and call
+    consume(item, produced). Both stages run at the same time, so the slower stage bounds the total time
+    instead of the sum of both.
+
+    Args:
+        items (Iterable): Inputs to process.
+        produce (Callable): First stage, called once per item.
+        consume (Callable): Second stage, called with the item and the output of produce.
+        queue_depth (int): Maximum number of produced items waiting for a consumer.
+        producer_workers (int): Number of producer threads.
+        consumer_workers (int): Number of consumer threads.
+
+    Returns:
+        List: Outputs of consume, in the same order as items.
 
+    Raises:
+        Exception: The first exception raised by a stage, after all threads stopped.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    work_queue = queue.Queue(maxsize=queue_depth)
+    pending = iter(enumerate(items))
+    pending_lock = threading.Lock()
+    errors = []
+
+    def producer():
+        while not errors:
+            with pending_lock:
+                next_item = next(pending, None)
+            if next_item is None:
+                return
+            index, item = next_item
+            try:
+                work_queue.put((index, item, produce(item)))
+            except Exception as e:
+                errors.append(e)
+
+    def consumer():
+        while True:
+            entry = work_queue.get()
+            if entry is None:
+                return
+            index, item, produced = entry
+            if errors:
+                continue
+            try:
+                results[index] = consume(item, produced)
+            except Exception as e:
+                errors.append(e)
+
+    producers = [threading.Thread(target=producer) for _ in range(max(1, producer_workers))]
+    consumers = [threading.Thread(target=consumer) for _ in range(max(1, consumer_workers))]
+    for thread in producers + consumers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    for _ in consumers:
+        work_queue.put(None)
+    for thread in consumers:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+def build_finetuned_payload(template, question, context, input_output_demarkation_key="\n\n### Response:\n",
+                            max_new_tokens=2048, stop_sequences=None):
+    """
+    Render the request payload of the finetuned model endpoint.
+
+    Returns:
+        tuple: The prompt text and the payload sent to the endpoint.
+    """
     inputs = template["prompt"].format(question=question, context=context)
     inputs += input_output_demarkation_key
-    payload = {"inputs": inputs, "parameters": {"max_new_tokens": 2048}}
+    payload = {"inputs": inputs, "parameters": {"max_new_tokens": max_new_tokens}}
+    if stop_sequences:
+        payload["parameters"]["stop"] = list(stop_sequences)
+    return inputs, payload
 
-    response = predictor.predict(payload)
+def template_and_predict(predictor, template, question, context, ground_truth, input_output_demarkation_key="\n\n### Response:\n"):
+
+    inputs, payload = build_finetuned_payload(template, question, context, input_output_demarkation_key)
+
+    response = hedged_call("predict", predictor.endpoint_name, predictor.predict, payload)
     return inputs, ground_truth, response
 
+def map_concurrently(func: Callable, items: Iterable, max_workers: int = 1) -> List:
+    """
+    Apply func to every item, optionally fanning the calls out over a thread pool.
+
+    Args:
+        func (Callable): Function called once per item.
+        items (Iterable): Inputs to process.
+        max_workers (int): Size of the thread pool. Values <= 1 run serially in the calling thread.
+
+    Returns:
+        List: Results of func, in the same order as items.
+    """
+    if max_workers <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, items))
+
+def template_and_predict_stream(predictor, template, question, context, ground_truth, stop_sequences=None,
+                                max_new_tokens=2048, input_output_demarkation_key="\n\n### Response:\n"):
+    """
+    Streaming variant of template_and_predict based on invoke_endpoint_with_response_stream.
+
+    The TGI container sends one server-sent event per generated token. Generation is cut short on the
+    client side as soon as the text contains one of the stop sequences.
+
+    Returns:
+        tuple: The prompt text, the ground truth and a response dict with "generated_text" and the
+        StreamMetrics summary under "metrics".
+    """
+    inputs, payload = build_finetuned_payload(
+        template, question, context, input_output_demarkation_key, max_new_tokens, stop_sequences
+    )
+    payload["stream"] = True
+
+    metrics = StreamMetrics()
+    response = predictor.sagemaker_session.sagemaker_runtime_client.invoke_endpoint_with_response_stream(
+        EndpointName=predictor.endpoint_name,
+        Body=json.dumps(payload),
+        ContentType="application/json",
+    )
+
+    def iter_lines():
+        buffer = b""
+        for event in response["Body"]:
+            buffer += event.get("PayloadPart", {}).get("Bytes", b"")
+            # Events may split or merge lines, only parse complete ones
+            *lines, buffer = buffer.split(b"\n")
+            yield from lines
+        # The last event may not end with a newline
+        yield buffer
+
+    generated_text = ""
+    for line in iter_lines():
+        line = line.strip()
+        if not line.startswith(b"data:"):
+            continue
+        token = json.loads(line[len(b"data:"):]).get("token", {})
+        if token.get("special"):
+            continue
+        metrics.record_delta()
+        generated_text += token.get("text", "")
+        stop_indexes = [generated_text.index(s) for s in stop_sequences or [] if s in generated_text]
+        if stop_indexes:
+            generated_text = generated_text[:min(stop_indexes)]
+            response["Body"].close()
+            break
+
+    return inputs, ground_truth, {"generated_text": generated_text, "metrics": metrics.summary()}
+
 def load_json_file(file_path: str) -> List[Dict]:
         """Load and parse a JSON file."""
         with open(file_path, 'r', encoding='utf-8') as file:
@@ -67,40 +224,105 @@ def get_stack_outputs(stack_name: str, region: str) -> dict:
     
     return {output['OutputKey']: output['OutputValue'] for output in outputs}
 
-def create_summary_table(inference_times, finetuning_method, output_dir, summary_file):
+def summarize_results_frame(df: pd.DataFrame) -> dict:
+    """
+    Vectorized counterpart of the per-file averages of create_summary_table for a ResultsStore frame.
+
+    Args:
+        df (pd.DataFrame): Rows of one approach, nested fields flattened like "stage_timings.retrieve"
+
+    Returns:
+        dict: Average scores, streaming metrics and stage percentiles
+    """
+    summary = {}
+    # With early stopping only part of the rows are scored
+    for column in ['bert_score', 'llm_evaluator_score']:
+        values = df[column].dropna() if column in df.columns else []
+        summary[column] = float(values.mean()) if len(values) else 0
+    for metric in ['time_to_first_token', 'inter_token_latency', 'output_tokens_per_second']:
+        value = df[metric].mean() if metric in df.columns else None
+        summary[metric] = round(float(value), 4) if value is not None and not pd.isna(value) else None
+    for stage in STAGES:
+        column = f'stage_timings.{stage}'
+        values = df[column].dropna().to_numpy() if column in df.columns else []
+        for p, value in latency_percentiles(values).items():
+            summary[f'{stage}_p{p}'] = round(value, 3) if value is not None else None
+    return summary
+
+def create_summary_table(inference_times, finetuning_method, output_dir, summary_file, requests_per_second=None,
+                         results_store=None):
     """
-    Creates a summary table with average scores from the three JSON files.
+    Creates a summary table with average scores from the three JSON files, together with
+    the latency percentiles of every request stage.
     
     Args:
+        inference_times (dict): Average inference time per method
+        finetuning_method (str): Finetuning method, prefix of the finetuning results file
         output_dir (str): Directory containing the JSON files
         summary_file (str): Name of the output summary file
+        requests_per_second (dict, optional): Achieved throughput per method
+        results_store (ResultsStore, optional): Read the results from the columnar store instead of the JSON files
     """
+    requests_per_second = requests_per_second or {}
     # Dictionary to store results
     results = {
         'method': [],
         'avg_bert_score': [],
         'avg_llm_evaluator_score': [],
-        'avg_inference_time': []
+        'avg_inference_time': [],
+        'requests_per_second': [],
+        'avg_time_to_first_token': [],
+        'avg_inter_token_latency': [],
+        'avg_output_tokens_per_second': []
     }
+    stage_columns = list(stage_percentiles([]).keys())
+    for column in stage_columns:
+        results[column] = []
+    # Streaming metrics are only present when the approach was evaluated in streaming mode
+    streaming_metrics = ['time_to_first_token', 'inter_token_latency', 'output_tokens_per_second']
     
     # List of files to process
     files = ['rag_results.json', f'{finetuning_method}_results.json', 'hybrid_results.json'] 
     
     # Process each file
     for file in files:
+        method = file.replace('_results.json', '') # Extract method name from filename
+        if results_store is not None:
+            # Approaches are stored under the Evaluation names
+            df_method = results_store.load(
+                'finetuning' if method == finetuning_method else method,
+                columns=['bert_score', 'llm_evaluator_score'] + streaming_metrics + [f'stage_timings.{stage}' for stage in STAGES]
+            )
+            if df_method.empty:
+                print(f"Warning: no {method} results in {results_store.root_dir}")
+                continue
+            summary = summarize_results_frame(df_method)
+            results['method'].append(method)
+            results['avg_bert_score'].append(round(summary['bert_score'], 4))
+            results['avg_llm_evaluator_score'].append(round(summary['llm_evaluator_score'], 4))
+            results['avg_inference_time'].append(inference_times[method])
+            throughput = requests_per_second.get(method)
+            results['requests_per_second'].append(round(throughput, 3) if throughput is not None else None)
+            for metric in streaming_metrics:
+                results[f'avg_{metric}'].append(summary[metric])
+            for column in stage_columns:
+                results[column].append(summary[column])
+            continue
+
         file_path = os.path.join(output_dir, file)
         if not os.path.exists(file_path):  # Check if the file exists
             print(f"Warning: {file} not found in {output_dir}")
             continue
-        method = file.replace('_results.json', '') # Extract method name from filename
                 
         try:
             with open(file_path, 'r') as f:
                 data = json.load(f)
             
             # Calculate averages
-            bert_scores = [sample.get('bert_score', 0) for sample in data]
-            llm_scores = [sample.get('llm_evaluator_score', 0) for sample in data]
+            # With early stopping only part of the records are scored
+            scored = [sample for sample in data if 'bert_score' in sample] or data
+            bert_scores = [sample.get('bert_score', 0) for sample in scored]
+            llm_scores = [sample.get('llm_evaluator_score', 0) for sample in scored]
             
             avg_bert = sum(bert_scores) / len(bert_scores) if bert_scores else 0
             avg_llm = sum(llm_scores) / len(llm_scores) if llm_scores else 0
@@ -110,6 +332,14 @@ def create_summary_table(inference_times, finetuning_method, output_dir, summary
             results['avg_bert_score'].append(round(avg_bert, 4))
             results['avg_llm_evaluator_score'].append(round(avg_llm, 4))
             results['avg_inference_time'].append(inference_times[method])
+            throughput = requests_per_second.get(method)
+            results['requests_per_second'].append(round(throughput, 3) if throughput is not None else None)
+            for metric in streaming_metrics:
+                values = [sample[metric] for sample in data if sample.get(metric) is not None]
+                results[f'avg_{metric}'].append(round(sum(values) / len(values), 4) if values else None)
+            # p50/p95/p99 per stage, records without stage timings (e.g. finetuning) give None
+            for column, value in stage_percentiles(data).items():
+                results[column].append(value)
             
         except json.JSONDecodeError:
             print(f"Warning: Error decoding {file}")
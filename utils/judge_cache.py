@@ -0,0 +1,98 @@
+"""
+Persistent cache of LLM judge responses, so an interrupted evaluation resumes without repeating judge calls
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from utils.helpers import logger
+
+
+class JudgeCache:
+    """
+    Append-only JSONL store of judge responses keyed by sha256(model ID, prompt).
+
+    Every response is appended and flushed as soon as it arrives, so a crash loses at most the calls in
+    flight. A rerun finds every already judged (model, prompt) pair, and replacing one judge model in
+    EvaluationConfig.MODELS_EVAL only re-queries that model. The raw response text is stored, so the
+    scores are parsed again on every run and parsing fixes apply to cached responses too.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the cache and load the responses stored by previous runs.
+
+        Args:
+            path (str): JSONL file of the cache, created if missing.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A run killed mid-write leaves a truncated last line
+                        logger.warning(f"Skipping corrupt judge cache line in {path}")
+                        continue
+                    self._responses[record["key"]] = record["response_text"]
+                truncated = f.tell() > 0 and not line.endswith('\n')
+            if truncated:
+                # Start the next record on a fresh line
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write('\n')
+            logger.info(f"Loaded {len(self._responses)} judge responses from {path}")
+
+    @staticmethod
+    def key(model_id: str, prompt: str) -> str:
+        """
+        Args:
+            model_id (str): Judge model ID.
+            prompt (str): Judge prompt.
+
+        Returns:
+            str: Hex sha256 of the model ID and the prompt.
+        """
+        return hashlib.sha256(json.dumps([model_id, prompt]).encode('utf-8')).hexdigest()
+
+    def get(self, model_id: str, prompt: str) -> Optional[str]:
+        """
+        Args:
+            model_id (str): Judge model ID.
+            prompt (str): Judge prompt.
+
+        Returns:
+            str or None: The stored response text, None on a miss.
+        """
+        with self._lock:
+            response_text = self._responses.get(self.key(model_id, prompt))
+            if response_text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response_text
+
+    def put(self, model_id: str, prompt: str, response_text: str) -> None:
+        """
+        Store a judge response and append it to the cache file.
+
+        Args:
+            model_id (str): Judge model ID.
+            prompt (str): Judge prompt.
+            response_text (str): Text of the judge response.
+        """
+        key = self.key(model_id, prompt)
+        record = {"key": key, "model_id": model_id, "response_text": response_text}
+        with self._lock:
+            self._responses[key] = response_text
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
@@ -0,0 +1,143 @@
+"""
+Latency measurement helpers shared by the RAG, finetuning and hybrid evaluations
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+# Stages of a RAG or hybrid request, in execution order
+STAGES = ("retrieve", "context_assembly", "model_call", "response_parsing")
+PERCENTILES = (50, 95, 99)
+
+
+class StageTimer:
+    """
+    Measures the duration of the stages of a single request with time.perf_counter().
+
+    Example:
+        timer = StageTimer()
+        with timer.stage("retrieve"):
+            docs = rag_obj.retrieve(kb_id, question)
+        timer.timings  # {"retrieve": 0.21}
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the enclosed block and add its duration to the stage.
+
+        Args:
+            name (str): Stage name, usually one of STAGES.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start_time
+
+    def total(self) -> float:
+        """
+        Returns:
+            float: Sum of all stage durations in seconds.
+        """
+        return sum(self.timings.values())
+
+
+def latency_percentiles(values: Iterable[float], percentiles: Iterable[int] = PERCENTILES) -> Dict[int, Optional[float]]:
+    """
+    Compute latency percentiles.
+
+    Args:
+        values (Iterable[float]): Latencies in seconds.
+        percentiles (Iterable[int]): Percentiles to compute.
+
+    Returns:
+        Dict[int, Optional[float]]: Percentile to latency, None for every percentile if there are no values.
+    """
+    values = np.asarray([v for v in values if v is not None], dtype=float)
+    if values.size == 0:
+        return {p: None for p in percentiles}
+    return {p: float(np.percentile(values, p)) for p in percentiles}
+
+
+def stage_percentiles(records: List[dict], stages: Iterable[str] = STAGES, percentiles: Iterable[int] = PERCENTILES) -> Dict[str, Optional[float]]:
+    """
+    Compute per-stage latency percentiles over result records holding a "stage_timings" dict.
+
+    Args:
+        records (List[dict]): Result records.
+        stages (Iterable[str]): Stages to report.
+        percentiles (Iterable[int]): Percentiles to compute.
+
+    Returns:
+        Dict[str, Optional[float]]: Keys like "retrieve_p95", values rounded to milliseconds.
+    """
+    summary = {}
+    for stage in stages:
+        values = [record.get('stage_timings', {}).get(stage) for record in records]
+        for p, value in latency_percentiles(values, percentiles).items():
+            summary[f'{stage}_p{p}'] = round(value, 3) if value is not None else None
+    return summary
+
+
+class StreamMetrics:
+    """
+    Collects the timing of a streamed generation.
+
+    Call record_delta() every time a text delta arrives and summary() once the stream is done.
+    All times use time.perf_counter().
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.first_token_time = None
+        self.last_token_time = None
+        self.delta_count = 0
+        self.output_tokens = None
+
+    def record_delta(self) -> None:
+        """Record the arrival of a text delta."""
+        now = time.perf_counter()
+        if self.first_token_time is None:
+            self.first_token_time = now
+        self.last_token_time = now
+        self.delta_count += 1
+
+    def set_output_tokens(self, output_tokens: Optional[int]) -> None:
+        """
+        Set the number of generated tokens reported by the service.
+
+        Args:
+            output_tokens (int, optional): Output token count. If never set, the number of deltas is used.
+        """
+        self.output_tokens = output_tokens
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            dict: time_to_first_token and inter_token_latency in seconds, output_tokens_per_second
+            measured over the decode phase (first to last token), and output_tokens.
+        """
+        output_tokens = self.output_tokens if self.output_tokens is not None else self.delta_count
+        if self.first_token_time is None:
+            return {
+                'time_to_first_token': None,
+                'inter_token_latency': None,
+                'output_tokens_per_second': None,
+                'output_tokens': output_tokens,
+            }
+
+        decode_time = self.last_token_time - self.first_token_time
+        inter_token_latency = decode_time / (output_tokens - 1) if output_tokens > 1 else 0.0
+        return {
+            'time_to_first_token': self.first_token_time - self.start_time,
+            'inter_token_latency': inter_token_latency,
+            'output_tokens_per_second': (output_tokens - 1) / decode_time if decode_time > 0 else None,
+            'output_tokens': output_tokens,
+        }
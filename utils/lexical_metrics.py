@@ -0,0 +1,175 @@
+"""
+Cheap lexical metrics of generated answers against the ground truth, for quick evaluation runs without BERTScore or judges
+"""
+import re
+import string
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+LEXICAL_METRICS = ("token_f1", "rouge_l", "exact_match", "contains_match")
+
+_PUNCTUATION = re.compile(f"[{re.escape(string.punctuation)}]")
+_ARTICLES = re.compile(r"\b(a|an|the)\b")
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """
+    SQuAD-style normalization: lowercase, strip punctuation and articles, split on whitespace.
+
+    Args:
+        text (str): Input text.
+
+    Returns:
+        List[str]: Normalized tokens.
+    """
+    text = _PUNCTUATION.sub(" ", str(text).lower())
+    return _ARTICLES.sub(" ", text).split()
+
+
+def _bag_of_words(token_lists: List[List[int]], vocab_size: int):
+    """Sparse bag-of-words as sorted unique (row * vocab_size + token id) keys and their counts."""
+    rows = np.repeat(np.arange(len(token_lists), dtype=np.int64), [len(tokens) for tokens in token_lists])
+    ids = np.fromiter((token for tokens in token_lists for token in tokens), dtype=np.int64, count=len(rows))
+    return np.unique(rows * vocab_size + ids, return_counts=True)
+
+
+def token_f1(reference_ids: List[List[int]], prediction_ids: List[List[int]], vocab_size: int) -> np.ndarray:
+    """
+    Token-level F1 of every (reference, prediction) pair, computed on sparse bag-of-words counts.
+
+    Args:
+        reference_ids (List[List[int]]): Token ids of the references.
+        prediction_ids (List[List[int]]): Token ids of the predictions.
+        vocab_size (int): Number of distinct token ids.
+
+    Returns:
+        np.ndarray: F1 per pair, 1.0 when both texts are empty.
+    """
+    n = len(reference_ids)
+    ref_keys, ref_counts = _bag_of_words(reference_ids, vocab_size)
+    pred_keys, pred_counts = _bag_of_words(prediction_ids, vocab_size)
+
+    # Overlap is the sum over shared tokens of the smaller count
+    shared, ref_index, pred_index = np.intersect1d(ref_keys, pred_keys, assume_unique=True, return_indices=True)
+    overlap = np.bincount(shared // vocab_size, weights=np.minimum(ref_counts[ref_index], pred_counts[pred_index]), minlength=n)
+
+    ref_lengths = np.array([len(tokens) for tokens in reference_ids], dtype=float)
+    pred_lengths = np.array([len(tokens) for tokens in prediction_ids], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f1 = np.where(ref_lengths + pred_lengths > 0, 2 * overlap / (ref_lengths + pred_lengths), 1.0)
+    return f1
+
+
+def lcs_length(first: List[int], second: List[int]) -> int:
+    """
+    Length of the longest common subsequence, with the bit-parallel algorithm of Hyyrö (2004).
+
+    Every token of second costs a few big-integer operations over len(first) bits instead of a row of
+    the dynamic programming table.
+
+    Args:
+        first (List[int]): Token ids.
+        second (List[int]): Token ids.
+
+    Returns:
+        int: LCS length.
+    """
+    if not first or not second:
+        return 0
+    match_masks = {}
+    for i, token in enumerate(first):
+        match_masks[token] = match_masks.get(token, 0) | (1 << i)
+
+    full = (1 << len(first)) - 1
+    v = full
+    for token in second:
+        u = v & match_masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(first) - bin(v).count("1")
+
+
+def rouge_l(reference_ids: List[List[int]], prediction_ids: List[List[int]]) -> np.ndarray:
+    """
+    ROUGE-L F1 of every (reference, prediction) pair.
+
+    Args:
+        reference_ids (List[List[int]]): Token ids of the references.
+        prediction_ids (List[List[int]]): Token ids of the predictions.
+
+    Returns:
+        np.ndarray: ROUGE-L F1 per pair, 1.0 when both texts are empty.
+    """
+    lcs = np.array([lcs_length(pred, ref) for ref, pred in zip(reference_ids, prediction_ids)], dtype=float)
+    ref_lengths = np.array([len(tokens) for tokens in reference_ids], dtype=float)
+    pred_lengths = np.array([len(tokens) for tokens in prediction_ids], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f1 = np.where(ref_lengths + pred_lengths > 0, 2 * lcs / (ref_lengths + pred_lengths), 1.0)
+    return f1
+
+
+def lexical_scores(references: List[str], predictions: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Compute all LEXICAL_METRICS for aligned references and predictions.
+
+    exact_match is 1 when the normalized texts are equal, contains_match when the normalized
+    reference appears as a token sequence in the normalized prediction.
+
+    Args:
+        references (List[str]): Ground truth texts.
+        predictions (List[str]): Generated texts.
+
+    Returns:
+        Dict[str, np.ndarray]: Scores per metric, one value per pair.
+    """
+    if len(references) != len(predictions):
+        raise ValueError(f"{len(predictions)} predictions for {len(references)} references")
+
+    reference_tokens = [normalize_tokens(text) for text in references]
+    prediction_tokens = [normalize_tokens(text) for text in predictions]
+
+    vocab = {}
+    reference_ids = [[vocab.setdefault(token, len(vocab)) for token in tokens] for tokens in reference_tokens]
+    prediction_ids = [[vocab.setdefault(token, len(vocab)) for token in tokens] for tokens in prediction_tokens]
+    vocab_size = max(1, len(vocab))
+
+    reference_texts = [" ".join(tokens) for tokens in reference_tokens]
+    prediction_texts = [" ".join(tokens) for tokens in prediction_tokens]
+    return {
+        "token_f1": token_f1(reference_ids, prediction_ids, vocab_size),
+        "rouge_l": rouge_l(reference_ids, prediction_ids),
+        "exact_match": np.array([ref == pred for ref, pred in zip(reference_texts, prediction_texts)], dtype=float),
+        "contains_match": np.array(
+            [bool(ref) and f" {ref} " in f" {pred} " for ref, pred in zip(reference_texts, prediction_texts)], dtype=float
+        ),
+    }
+
+
+def correlation_with(scores: Dict[str, np.ndarray], reference_scores: np.ndarray) -> Dict[str, float]:
+    """
+    Pearson and Spearman correlation of every metric with reference scores, e.g. BERTScore F1.
+
+    Args:
+        scores (Dict[str, np.ndarray]): Output of lexical_scores.
+        reference_scores (np.ndarray): Scores of the same samples.
+
+    Returns:
+        Dict[str, float]: Keys like "token_f1_pearson" and "token_f1_spearman", None for constant inputs.
+    """
+    reference = pd.Series(np.asarray(reference_scores, dtype=float))
+    correlations = {}
+    for metric, values in scores.items():
+        series = pd.Series(values)
+        if series.nunique() < 2 or reference.nunique() < 2:
+            # Correlation is undefined for constant inputs, e.g. exact_match when no answer matches
+            correlations[f"{metric}_pearson"] = correlations[f"{metric}_spearman"] = None
+            continue
+        # Spearman is Pearson on average ranks, computed here so scipy is not needed
+        for method, value in (
+            ("pearson", series.corr(reference)),
+            ("spearman", series.rank().corr(reference.rank())),
+        ):
+            correlations[f"{metric}_{method}"] = round(float(value), 4) if not pd.isna(value) else None
+    return correlations
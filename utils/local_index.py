@@ -0,0 +1,206 @@
+"""
+Versioned on-disk format for the local retriever index.
+
+An index is a directory named after its key, holding:
+    header.json     format version, key, chunk count, embedding dim/dtype, chunking parameters, source files
+    embeddings.bin  row-major (count, dim) embedding matrix, float16 or float32
+    offsets.bin     int64 byte offsets of each chunk in chunks.bin, count + 1 entries
+    chunks.bin      UTF-8 chunk texts, concatenated
+    sources.bin     int32 index into header["sources"] for each chunk
+
+The binary files are opened with mmap, so several evaluation processes reading the same index share
+one copy of the pages through the OS page cache.
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import uuid
+from typing import List
+
+import numpy as np
+
+
+INDEX_FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.bin"
+OFFSETS_FILE = "offsets.bin"
+CHUNKS_FILE = "chunks.bin"
+SOURCES_FILE = "sources.bin"
+
+
+def compute_index_key(data_dir: str, params: dict) -> str:
+    """
+    Hash the content of the source files together with the indexing parameters.
+
+    Any change in a source file, the chunking settings, the embedder or the dtype gives a new key,
+    so stale indexes are never opened.
+
+    Args:
+        data_dir (str): Directory holding the knowledge base documents.
+        params (dict): Chunking, embedding and storage parameters of the index.
+
+    Returns:
+        str: Hex digest used as the index directory name.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{INDEX_FORMAT_VERSION}".encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    for file_name in sorted(os.listdir(data_dir)):
+        file_path = os.path.join(data_dir, file_name)
+        if not os.path.isfile(file_path):
+            continue
+        digest.update(file_name.encode("utf-8"))
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+def save_index(index_dir: str, key: str, params: dict, chunk_texts: List[str], chunk_sources: List[str],
+               embeddings: np.ndarray, dtype: str = "float32") -> None:
+    """
+    Write an index to index_dir. The directory is written under a temporary name and renamed at the end.
+
+    Args:
+        index_dir (str): Target directory of the index.
+        key (str): Index key from compute_index_key.
+        params (dict): Parameters the key was computed from, stored in the header.
+        chunk_texts (List[str]): Text of every chunk.
+        chunk_sources (List[str]): Source file of every chunk.
+        embeddings (np.ndarray): Embedding matrix, one row per chunk.
+        dtype (str): Storage dtype of the embeddings, "float16" or "float32".
+    """
+    tmp_dir = f"{index_dir}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp_dir)
+
+    sources = sorted(set(chunk_sources))
+    source_ids = {source: i for i, source in enumerate(sources)}
+
+    encoded = [text.encode("utf-8") for text in chunk_texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(blob) for blob in encoded])
+
+    with open(os.path.join(tmp_dir, CHUNKS_FILE), 'wb') as f:
+        for blob in encoded:
+            f.write(blob)
+    offsets.tofile(os.path.join(tmp_dir, OFFSETS_FILE))
+    np.asarray([source_ids[s] for s in chunk_sources], dtype=np.int32).tofile(os.path.join(tmp_dir, SOURCES_FILE))
+    np.ascontiguousarray(embeddings, dtype=dtype).tofile(os.path.join(tmp_dir, EMBEDDINGS_FILE))
+
+    header = {
+        "version": INDEX_FORMAT_VERSION,
+        "key": key,
+        "count": len(chunk_texts),
+        "dim": int(embeddings.shape[1]),
+        "dtype": dtype,
+        "params": params,
+        "sources": sources,
+    }
+    with open(os.path.join(tmp_dir, HEADER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=4)
+
+    # Another process may have finished the same index first, in that case keep theirs
+    try:
+        os.rename(tmp_dir, index_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class _MappedTexts:
+    """Read-only sequence of chunk texts decoded lazily from the memory-mapped blob."""
+
+    def __init__(self, blob: mmap.mmap, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._blob[start:end].decode("utf-8")
+
+
+class _MappedSources:
+    """Read-only sequence mapping each chunk to its source file."""
+
+    def __init__(self, sources: List[str], source_ids: np.ndarray):
+        self._sources = sources
+        self._source_ids = source_ids
+
+    def __len__(self) -> int:
+        return len(self._source_ids)
+
+    def __getitem__(self, index: int) -> str:
+        return self._sources[int(self._source_ids[index])]
+
+
+class MappedIndex:
+    """
+    A read-only view of an index directory backed by mmap.
+
+    Attributes:
+        header (dict): Content of header.json
+        embeddings (np.memmap): Embedding matrix of shape (count, dim)
+        chunk_texts (Sequence[str]): Text of every chunk
+        chunk_sources (Sequence[str]): Source file of every chunk
+    """
+
+    def __init__(self, index_dir: str):
+        """
+        Open an index directory.
+
+        Args:
+            index_dir (str): Directory written by save_index.
+
+        Raises:
+            ValueError: If the index was written with a different format version.
+        """
+        with open(os.path.join(index_dir, HEADER_FILE), 'r', encoding='utf-8') as f:
+            self.header = json.load(f)
+        if self.header.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version {self.header.get('version')} in {index_dir}")
+
+        count, dim = self.header["count"], self.header["dim"]
+        self.embeddings = self._memmap(os.path.join(index_dir, EMBEDDINGS_FILE), self.header["dtype"], (count, dim))
+        offsets = self._memmap(os.path.join(index_dir, OFFSETS_FILE), np.int64, (count + 1,))
+        source_ids = self._memmap(os.path.join(index_dir, SOURCES_FILE), np.int32, (count,))
+
+        with open(os.path.join(index_dir, CHUNKS_FILE), 'rb') as f:
+            # mmap cannot map an empty file
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+        self.chunk_texts = _MappedTexts(blob, offsets)
+        self.chunk_sources = _MappedSources(self.header["sources"], source_ids)
+
+    @staticmethod
+    def _memmap(path: str, dtype, shape: tuple) -> np.ndarray:
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+def open_or_build_index(index_root: str, data_dir: str, params: dict, build_fn) -> MappedIndex:
+    """
+    Open the index matching the current source files and parameters, building it first if needed.
+
+    Args:
+        index_root (str): Directory holding one subdirectory per index key.
+        data_dir (str): Directory holding the knowledge base documents.
+        params (dict): Chunking, embedding and storage parameters; params["dtype"] is the storage dtype.
+        build_fn (Callable): Returns (chunk_texts, chunk_sources, embeddings) when the index has to be built.
+
+    Returns:
+        MappedIndex: The memory-mapped index.
+    """
+    key = compute_index_key(data_dir, params)
+    index_dir = os.path.join(index_root, key)
+
+    if not os.path.exists(os.path.join(index_dir, HEADER_FILE)):
+        os.makedirs(index_root, exist_ok=True)
+        chunk_texts, chunk_sources, embeddings = build_fn()
+        save_index(index_dir, key, params, chunk_texts, chunk_sources, embeddings, params["dtype"])
+
+    return MappedIndex(index_dir)
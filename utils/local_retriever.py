@@ -0,0 +1,252 @@
+"""
+Offline, in-process stand-in for a Bedrock Knowledge Base.
+
+LocalKnowledgeBase exposes the same retrieve() call as the bedrock-agent-runtime client, so it can be
+handed to KBHandler (or Rag) in place of the boto3 client to run retrieval without AWS or network access.
+"""
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.chunking import CHUNKER_VERSION, iter_chunks
+from utils.local_index import compute_index_key, open_or_build_index
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 16)
+def token_bucket(token: str, dim: int) -> Tuple[int, float]:
+    """
+    Hash a token to its embedding column and sign.
+
+    Bounded and keyed on (token, dim), so the cache neither grows with the vocabulary nor keeps
+    embedders alive.
+
+    Args:
+        token (str): Lower-cased word token.
+        dim (int): Dimension of the embedding vectors.
+
+    Returns:
+        Tuple[int, float]: Column index and sign (+1.0 or -1.0).
+    """
+    # crc32 is stable across processes, unlike the built-in hash()
+    h = zlib.crc32(token.encode("utf-8"))
+    return h % dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+
+class HashingEmbedder:
+    """
+    Embeds texts with the hashing trick over lower-cased word tokens.
+
+    It needs no model weights and no network, and it is deterministic across processes, which makes it
+    suitable for benchmarking retrieval latency and throughput. It is not a substitute for the
+    Titan embedding model when measuring answer quality.
+    """
+
+    def __init__(self, dim: int = 1024):
+        """
+        Args:
+            dim (int): Dimension of the embedding vectors.
+        """
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a list of texts.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            np.ndarray: Float32 matrix of shape (len(texts), dim) with L2-normalized rows.
+        """
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                col, sign = token_bucket(token, self.dim)
+                rows.append(row)
+                cols.append(col)
+                signs.append(sign)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), np.asarray(signs, dtype=np.float32))
+
+        # Sublinear term frequency keeps long chunks from dominating
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+class LocalKnowledgeBase:
+    """
+    A brute-force vector index over the local knowledge base documents.
+
+    Attributes:
+        data_dir (str): Directory holding the knowledge base documents, e.g. data/kb-data
+        index_dir (str): Directory of persisted indexes, None keeps the index in memory only
+        chunk_texts (Sequence[str]): Text of every chunk
+        chunk_sources (Sequence[str]): Source file of every chunk
+        embeddings (np.ndarray): Normalized chunk embeddings, one row per chunk
+        index_key (str): Key of the documents and index parameters, changes whenever the index is rebuilt
+    """
+
+    # Runs in process without a service quota, KBHandler skips client-side rate limiting
+    rate_limited = False
+
+    # Number of embedding rows converted to float32 at a time while searching
+    SEARCH_BLOCK_SIZE = 65536
+    # Number of chunks embedded at a time while building
+    EMBED_BATCH_SIZE = 1024
+
+    def __init__(self, data_dir: str, chunking_strategy: str, max_tokens: int, overlap_percentage: int,
+                 embedder: Optional[HashingEmbedder] = None, index_dir: Optional[str] = None,
+                 dtype: str = "float32"):
+        """
+        Initialize and build (or open) the local index.
+
+        Args:
+            data_dir (str): Directory holding the knowledge base documents.
+            chunking_strategy (str): KbConfig.CHUNKING_STRATEGY
+            max_tokens (int): KbConfig.MAX_TOKENS
+            overlap_percentage (int): KbConfig.OVERLAP_PERCENTAGE
+            embedder (HashingEmbedder, optional): Embedding function. Defaults to a HashingEmbedder.
+            index_dir (str, optional): Directory where the index is persisted and memory-mapped from.
+                Defaults to None, which rebuilds the index in memory on every run.
+            dtype (str): Storage dtype of persisted embeddings, "float16" or "float32".
+        """
+        self.data_dir = data_dir
+        self.chunking_strategy = chunking_strategy
+        self.max_tokens = max_tokens
+        self.overlap_percentage = overlap_percentage
+        self.embedder = embedder or HashingEmbedder()
+        self.index_dir = index_dir
+        self.dtype = dtype
+
+        self.chunk_texts = []
+        self.chunk_sources = []
+        self.embeddings = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self.index_key = None
+        self.build()
+
+    def index_params(self) -> dict:
+        """
+        Returns:
+            dict: Parameters that determine the content of the index, used to key persisted indexes.
+        """
+        return {
+            "chunker_version": CHUNKER_VERSION,
+            "chunking_strategy": self.chunking_strategy,
+            "max_tokens": self.max_tokens,
+            "overlap_percentage": self.overlap_percentage,
+            "embedder": type(self.embedder).__name__,
+            "dim": self.embedder.dim,
+            "dtype": self.dtype,
+        }
+
+    def build(self) -> None:
+        """
+        Load the index, from the persisted copy when index_dir is set and up to date, otherwise by
+        chunking and embedding every file of data_dir.
+        """
+        self.index_key = compute_index_key(self.data_dir, self.index_params())
+        if self.index_dir is None:
+            self.chunk_texts, self.chunk_sources, self.embeddings = self._chunk_and_embed()
+            return
+
+        index = open_or_build_index(self.index_dir, self.data_dir, self.index_params(), self._chunk_and_embed)
+        self.chunk_texts = index.chunk_texts
+        self.chunk_sources = index.chunk_sources
+        self.embeddings = index.embeddings
+
+    def _chunk_and_embed(self) -> tuple:
+        chunk_texts, chunk_sources, embedding_batches = [], [], []
+        batch = []
+        for chunk in iter_chunks([self.data_dir], self.chunking_strategy, self.max_tokens, self.overlap_percentage):
+            chunk_texts.append(chunk.text)
+            chunk_sources.append(chunk.source)
+            batch.append(chunk.text)
+            if len(batch) == self.EMBED_BATCH_SIZE:
+                embedding_batches.append(self.embedder.embed(batch))
+                batch = []
+        embedding_batches.append(self.embedder.embed(batch))
+
+        return chunk_texts, chunk_sources, np.vstack(embedding_batches)
+
+    def search(self, queries: List[str], number_of_results: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the most similar chunks for a batch of queries.
+
+        Args:
+            queries (List[str]): Query texts.
+            number_of_results (int): Number of chunks returned per query.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Chunk indices and cosine similarities, both of shape
+            (len(queries), k) and sorted by decreasing similarity.
+        """
+        k = min(number_of_results, len(self.chunk_texts))
+        if k == 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty
+
+        query_embeddings = self.embedder.embed(queries)
+        similarities = np.empty((len(queries), len(self.chunk_texts)), dtype=np.float32)
+        for start in range(0, len(self.chunk_texts), self.SEARCH_BLOCK_SIZE):
+            block = np.asarray(self.embeddings[start:start + self.SEARCH_BLOCK_SIZE], dtype=np.float32)
+            similarities[:, start:start + len(block)] = query_embeddings @ block.T
+        top_k = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarities, top_k, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_k, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def to_retrieval_result(self, index: int, similarity: float) -> dict:
+        """
+        Format a chunk like an item of the Bedrock "retrievalResults" list.
+
+        Args:
+            index (int): Chunk index.
+            similarity (float): Cosine similarity between the query and the chunk.
+
+        Returns:
+            dict: Retrieval result with content, location, metadata and score.
+        """
+        source_uri = os.path.abspath(self.chunk_sources[index])
+        return {
+            "content": {"text": self.chunk_texts[index]},
+            "location": {"type": "CUSTOM", "customDocumentLocation": {"id": source_uri}},
+            "metadata": {
+                "x-amz-bedrock-kb-source-uri": source_uri,
+                "x-amz-bedrock-kb-chunk-id": str(index),
+            },
+            # OpenSearch cosinesimil reports (1 + cosine) / 2, keep scores on the same scale
+            "score": float((1.0 + similarity) / 2.0),
+        }
+
+    def retrieve(self, retrievalQuery: dict, knowledgeBaseId: str = None, retrievalConfiguration: dict = None) -> dict:
+        """
+        Mirror of bedrock-agent-runtime retrieve(), so this object can replace the boto3 client.
+
+        Args:
+            retrievalQuery (dict): {"text": query}
+            knowledgeBaseId (str, optional): Ignored, there is a single local knowledge base.
+            retrievalConfiguration (dict, optional): Reads vectorSearchConfiguration.numberOfResults.
+
+        Returns:
+            dict: Response with a "retrievalResults" list.
+        """
+        number_of_results = (
+            (retrievalConfiguration or {})
+            .get("vectorSearchConfiguration", {})
+            .get("numberOfResults", 5)
+        )
+        indices, similarities = self.search([retrievalQuery["text"]], number_of_results)
+        return {
+            "retrievalResults": [
+                self.to_retrieval_result(int(i), float(s)) for i, s in zip(indices[0], similarities[0])
+            ]
+        }
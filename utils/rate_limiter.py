@@ -0,0 +1,181 @@
+"""
+Process-wide adaptive client-side rate limiting for Bedrock calls.
+
+Each (API, resource) pair, e.g. ("converse", model ID) or ("retrieve", knowledge base ID), gets one
+token bucket shared by every thread of the process. Its rate follows AIMD: it grows additively while
+calls succeed and is cut multiplicatively on every throttling error, so concurrent workers converge to
+the account quota instead of retrying in lockstep.
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import botocore
+
+from config import RateLimitConfig
+
+
+def is_throttling_exception(e):
+    return isinstance(e, botocore.exceptions.ClientError) and e.response['Error']['Code'] in [
+        'ThrottlingException', 'TooManyRequestsException'
+    ]
+
+
+class AdaptiveRateLimiter:
+    """
+    A token bucket with an AIMD controlled refill rate.
+
+    Attributes:
+        rate (float): Current refill rate in requests per second
+        success_count (int): Calls that completed without throttling
+        throttle_count (int): Calls rejected with a throttling error
+    """
+
+    def __init__(self, initial_rate: float, min_rate: float, max_rate: float,
+                 additive_increase: float = 0.5, multiplicative_decrease: float = 0.5,
+                 decrease_cooldown: float = 1.0):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            initial_rate (float): Starting rate in requests per second.
+            min_rate (float): Lower bound of the rate.
+            max_rate (float): Upper bound of the rate.
+            additive_increase (float): Rate increase per second of throttle-free traffic.
+            multiplicative_decrease (float): Factor applied to the rate on a throttling error.
+            decrease_cooldown (float): Minimum seconds between two decreases, so a burst of throttles
+                from requests that were already in flight only counts once.
+        """
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.decrease_cooldown = decrease_cooldown
+
+        self.success_count = 0
+        self.throttle_count = 0
+
+        self._tokens = 1.0
+        self._last_refill = time.perf_counter()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        # Allow bursts of at most one second worth of requests
+        capacity = max(1.0, self.rate)
+        self._tokens = min(capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                self._refill(time.perf_counter())
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait_time = (1.0 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+    def on_success(self) -> None:
+        """Additive increase: about additive_increase requests/s more for every second without throttling."""
+        with self._lock:
+            self.success_count += 1
+            self.rate = min(self.max_rate, self.rate + self.additive_increase / self.rate)
+
+    def on_throttle(self) -> None:
+        """Multiplicative decrease and drain of the bucket."""
+        with self._lock:
+            self.throttle_count += 1
+            now = time.perf_counter()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.rate = max(self.min_rate, self.rate * self.multiplicative_decrease)
+                self._last_decrease = now
+            self._tokens = 0.0
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call func once a token is available and adapt the rate to the outcome.
+
+        Args:
+            func (Callable): The service call.
+
+        Returns:
+            The return value of func. Exceptions, including throttling errors, are re-raised so callers
+            keep their own retry policy.
+        """
+        self.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_throttling_exception(e):
+                self.on_throttle()
+            raise
+        self.on_success()
+        return result
+
+
+_limiters: Dict[Tuple[str, str], AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api: str, resource_id: str) -> Optional[AdaptiveRateLimiter]:
+    """
+    Return the process-wide rate limiter of an API and resource, creating it on first use.
+
+    Args:
+        api (str): API name, a key of RateLimitConfig.INITIAL_RATES such as "converse" or "retrieve".
+        resource_id (str): Model ID or knowledge base ID.
+
+    Returns:
+        AdaptiveRateLimiter or None: None when rate limiting is disabled in RateLimitConfig.
+    """
+    if not RateLimitConfig.ENABLED:
+        return None
+
+    with _limiters_lock:
+        key = (api, resource_id)
+        if key not in _limiters:
+            _limiters[key] = AdaptiveRateLimiter(
+                initial_rate=RateLimitConfig.INITIAL_RATES.get(api, RateLimitConfig.DEFAULT_INITIAL_RATE),
+                min_rate=RateLimitConfig.MIN_RATE,
+                max_rate=RateLimitConfig.MAX_RATE,
+                additive_increase=RateLimitConfig.ADDITIVE_INCREASE,
+                multiplicative_decrease=RateLimitConfig.MULTIPLICATIVE_DECREASE,
+            )
+        return _limiters[key]
+
+
+def rate_limited_call(api: str, resource_id: str, func: Callable, *args, **kwargs):
+    """
+    Call func through the rate limiter of an API and resource.
+
+    Args:
+        api (str): API name, e.g. "converse" or "retrieve".
+        resource_id (str): Model ID or knowledge base ID.
+        func (Callable): The service call.
+
+    Returns:
+        The return value of func.
+    """
+    limiter = get_rate_limiter(api, resource_id)
+    if limiter is None:
+        return func(*args, **kwargs)
+    return limiter.call(func, *args, **kwargs)
+
+
+def rate_limiter_stats() -> Dict[str, dict]:
+    """
+    Returns:
+        Dict[str, dict]: Current rate, successes and throttles of every limiter, keyed by "api:resource".
+    """
+    with _limiters_lock:
+        return {
+            f"{api}:{resource_id}": {
+                'rate': round(limiter.rate, 3),
+                'success_count': limiter.success_count,
+                'throttle_count': limiter.throttle_count,
+            }
+            for (api, resource_id), limiter in _limiters.items()
+        }
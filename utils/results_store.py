@@ -0,0 +1,236 @@
+"""
+Columnar store of evaluation results, one row per (question, approach)
+"""
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from utils.helpers import load_json_file
+
+
+KEY_COLUMNS = ["question_index", "approach"]
+# Score columns are written by Evaluation.save_scores, the other columns by the generation steps
+SCORE_PREFIXES = ("bert_score", "llm_evaluator_score")
+# Nested fields flattened to "<field>.<key>" columns, other dict values are stored as JSON text
+FLATTENED_FIELDS = ("stage_timings",)
+# Original JSON of every result record, only read by export_json
+RECORD_COLUMN = "_record"
+
+
+class ResultsStore:
+    """
+    Parquet store of the results of all approaches.
+
+    Generation results and scores are kept in two append-only sets of zstd compressed Parquet part
+    files under root_dir/results and root_dir/scores. Appending never rewrites existing data, and when
+    a (question, approach) row is appended again the latest part wins. The FLATTENED_FIELDS are
+    flattened to "stage_timings.<stage>" columns, other dict values, e.g. an endpoint error response
+    stored as llm_response, are stored as JSON text. Repeated context strings are dictionary encoded
+    by Parquet.
+
+    Every result record is also kept verbatim in a RECORD_COLUMN, so export_json writes the records
+    back unchanged apart from their scores. Reads only load the requested columns of every part.
+    """
+
+    def __init__(self, root_dir: str, compression: str = "zstd"):
+        """
+        Initialize the store.
+
+        Args:
+            root_dir (str): Directory of the store, created if missing.
+            compression (str): Parquet compression codec.
+        """
+        self.root_dir = root_dir
+        self.compression = compression
+        self.results_dir = os.path.join(root_dir, "results")
+        self.scores_dir = os.path.join(root_dir, "scores")
+        os.makedirs(self.results_dir, exist_ok=True)
+        os.makedirs(self.scores_dir, exist_ok=True)
+
+    def clear(self) -> None:
+        """Delete all results and scores, e.g. before ingesting a new run."""
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        os.makedirs(self.scores_dir, exist_ok=True)
+
+    @staticmethod
+    def _to_frame(approach: str, records: List[dict], question_indices: List[int], keep_records: bool = False) -> pd.DataFrame:
+        # Serialize dict values before normalizing, json_normalize would flatten them into sparse columns
+        flat_records = [
+            {
+                key: json.dumps(value, ensure_ascii=False) if isinstance(value, dict) and key not in FLATTENED_FIELDS else value
+                for key, value in record.items()
+            }
+            for record in records
+        ]
+        df = pd.json_normalize(flat_records, sep=".")
+        if df.empty:
+            df = pd.DataFrame(index=range(len(records)))
+        df.insert(0, "question_index", np.asarray(question_indices, dtype=np.int64))
+        df.insert(1, "approach", approach)
+        if keep_records:
+            df[RECORD_COLUMN] = [json.dumps(record, ensure_ascii=False) for record in records]
+        return df
+
+    def _write_part(self, directory: str, df: pd.DataFrame) -> str:
+        # Nanosecond timestamps keep part files in append order
+        path = os.path.join(directory, f"part-{time.time_ns():020d}.parquet")
+        df.to_parquet(path, compression=self.compression, index=False)
+        return path
+
+    def append(self, approach: str, records: List[dict], question_indices: Optional[List[int]] = None) -> str:
+        """
+        Append generation results of an approach.
+
+        Args:
+            approach (str): Approach name, e.g. "finetuning", "rag" or "hybrid".
+            records (List[dict]): Result records in the format of the *_results.json files.
+            question_indices (List[int], optional): Index of every record in the test data, defaults to 0..n-1.
+
+        Returns:
+            str: Path of the written part file.
+        """
+        question_indices = question_indices if question_indices is not None else range(len(records))
+        return self._write_part(self.results_dir, self._to_frame(approach, records, question_indices, keep_records=True))
+
+    def append_json(self, approach: str, file_path: str) -> str:
+        """
+        Append the records of a *_results.json file.
+
+        Args:
+            approach (str): Approach name.
+            file_path (str): Path of the results file.
+
+        Returns:
+            str: Path of the written part file.
+        """
+        return self.append(approach, load_json_file(file_path))
+
+    def append_scores(self, approach: str, question_indices: List[int], scores: List[dict]) -> str:
+        """
+        Append evaluation scores of an approach.
+
+        Args:
+            approach (str): Approach name.
+            question_indices (List[int]): Index of the scored records.
+            scores (List[dict]): Per record "bert_score", "llm_evaluator_score" and the per-judge scores.
+
+        Returns:
+            str: Path of the written part file.
+        """
+        return self._write_part(self.scores_dir, self._to_frame(approach, scores, question_indices))
+
+    @staticmethod
+    def _read_parts(directory: str, approach: Optional[str], columns: Optional[List[str]]) -> pd.DataFrame:
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet")
+        )
+        filters = [("approach", "==", approach)] if approach is not None else None
+        frames = []
+        for path in paths:
+            # Only read the requested columns present in this part, not the long context and response text
+            schema = pq.read_schema(path).names
+            if columns is None:
+                part_columns = [column for column in schema if column != RECORD_COLUMN]
+            else:
+                part_columns = [column for column in dict.fromkeys(KEY_COLUMNS + columns) if column in schema]
+            frames.append(pd.read_parquet(path, columns=part_columns, filters=filters))
+        if not frames:
+            return pd.DataFrame(columns=KEY_COLUMNS)
+        return pd.concat(frames, ignore_index=True).drop_duplicates(KEY_COLUMNS, keep="last")
+
+    def load(self, approach: Optional[str] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Load results joined with their latest scores.
+
+        Args:
+            approach (str, optional): Only load this approach.
+            columns (List[str], optional): Columns to load besides question_index and approach.
+
+        Returns:
+            pd.DataFrame: One row per (question, approach), sorted by approach and question index.
+        """
+        results = self._read_parts(self.results_dir, approach, columns)
+        scores = self._read_parts(self.scores_dir, approach, columns)
+        score_columns = [column for column in scores.columns if column not in KEY_COLUMNS]
+        if score_columns:
+            results = results.drop(columns=[column for column in score_columns if column in results.columns])
+            results = results.merge(scores, on=KEY_COLUMNS, how="left")
+        return results.sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+    def aggregate(self, metrics: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Mean of the metrics per approach, computed over the scored rows.
+
+        Args:
+            metrics (List[str], optional): Columns to average, defaults to the score, latency and
+                streaming columns present in the store.
+
+        Returns:
+            pd.DataFrame: Indexed by approach, with a "samples" column counting the scored rows.
+        """
+        metrics = metrics or [
+            "bert_score", "llm_evaluator_score", "inference_time",
+            "time_to_first_token", "inter_token_latency", "output_tokens_per_second"
+        ]
+        df = self.load(columns=metrics)
+        metrics = [metric for metric in metrics if metric in df.columns]
+        if "bert_score" in df.columns:
+            df = df[df["bert_score"].notna()]
+        aggregated = df.groupby("approach")[metrics].mean()
+        aggregated.insert(0, "samples", df.groupby("approach").size())
+        return aggregated
+
+    @staticmethod
+    def _to_json_value(value):
+        # List columns, e.g. the judges consulted by the cascade, are read back as arrays
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def export_json(self, approach: str, file_path: str) -> None:
+        """
+        Write the rows of an approach in the format of the *_results.json files.
+
+        Records are written as they were appended, with their latest scores set like
+        Evaluation.save_scores does, so a *_results.json file can be exported over itself.
+
+        Args:
+            approach (str): Approach name.
+            file_path (str): Output path.
+        """
+        results = self._read_parts(self.results_dir, approach, [RECORD_COLUMN])
+        scores = self._read_parts(self.scores_dir, approach, None)
+        score_columns = [column for column in scores.columns if column not in KEY_COLUMNS]
+        if score_columns:
+            results = results.merge(scores, on=KEY_COLUMNS, how="left")
+        results = results.sort_values("question_index")
+
+        records = []
+        for row in results.to_dict(orient="records"):
+            record = json.loads(row[RECORD_COLUMN])
+            row_scores = {
+                column: self._to_json_value(row[column])
+                for column in score_columns if not (np.ndim(row[column]) == 0 and pd.isna(row[column]))
+            }
+            if "bert_score" in row_scores:
+                if "judges_consulted" not in row_scores:
+                    record.pop("judges_consulted", None)
+                record.update(row_scores)
+            else:
+                # Records skipped by early stopping must not keep the scores of an earlier run
+                record.pop("bert_score", None)
+                record.pop("llm_evaluator_score", None)
+                record.pop("judges_consulted", None)
+            records.append(record)
+
+        with open(file_path, 'w', encoding='utf-8') as file:
+            json.dump(records, file, ensure_ascii=False, indent=4)
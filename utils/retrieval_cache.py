@@ -0,0 +1,168 @@
+"""
+Caches knowledge base retrieval results so the same question is only retrieved once
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class RetrievalCache:
+    """
+    A two tier cache for knowledge base retrieval results.
+
+    The first tier is an in-memory LRU shared by every caller in the process (RAG and Hybrid
+    evaluation). The optional second tier persists results on disk so re-runs do not retrieve
+    again. Disk entries of a knowledge base are dropped as soon as a newer ingestion job is seen.
+    """
+
+    INGESTION_MARKER_FILE = "ingestion_job.json"
+
+    def __init__(self, max_size: int = 1024, cache_dir: Optional[str] = None):
+        """
+        Initialize the retrieval cache.
+
+        Args:
+            max_size (int): Maximum number of entries kept in memory.
+            cache_dir (str, optional): Directory of the on-disk tier. Defaults to None, which disables it.
+        """
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kb_id: str, query: str, kb_configs: dict) -> str:
+        """
+        Build a stable key from the knowledge base ID, the query text and the retrieval configuration.
+
+        Args:
+            kb_id (str): Knowledge base ID.
+            query (str): Retrieval query text.
+            kb_configs (dict): Retrieval configuration sent with the query.
+
+        Returns:
+            str: Hex digest identifying the retrieval request.
+        """
+        payload = json.dumps([kb_id, query, kb_configs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _kb_dir(self, kb_id: str) -> str:
+        return os.path.join(self.cache_dir, kb_id)
+
+    def get(self, kb_id: str, query: str, kb_configs: dict) -> Optional[list]:
+        """
+        Look up cached retrieval results, checking memory first and then disk.
+
+        Args:
+            kb_id (str): Knowledge base ID.
+            query (str): Retrieval query text.
+            kb_configs (dict): Retrieval configuration sent with the query.
+
+        Returns:
+            list or None: The cached retrieval results, or None on a cache miss.
+        """
+        key = self.make_key(kb_id, query, kb_configs)
+
+        with self._lock:
+            if (kb_id, key) in self._entries:
+                self._entries.move_to_end((kb_id, key))
+                self.hits += 1
+                return self._entries[(kb_id, key)]
+
+        docs = None
+        if self.cache_dir:
+            entry_path = os.path.join(self._kb_dir(kb_id), f"{key}.json")
+            if os.path.exists(entry_path):
+                try:
+                    with open(entry_path, 'r', encoding='utf-8') as f:
+                        docs = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    docs = None
+
+        with self._lock:
+            if docs is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(kb_id, key, docs)
+        return docs
+
+    def put(self, kb_id: str, query: str, kb_configs: dict, docs: list) -> None:
+        """
+        Store retrieval results in memory and, if enabled, on disk.
+
+        Args:
+            kb_id (str): Knowledge base ID.
+            query (str): Retrieval query text.
+            kb_configs (dict): Retrieval configuration sent with the query.
+            docs (list): Retrieval results returned by the knowledge base.
+        """
+        key = self.make_key(kb_id, query, kb_configs)
+
+        with self._lock:
+            self._store(kb_id, key, docs)
+
+        if self.cache_dir:
+            kb_dir = self._kb_dir(kb_id)
+            os.makedirs(kb_dir, exist_ok=True)
+            entry_path = os.path.join(kb_dir, f"{key}.json")
+            # Write to a temporary file first so concurrent readers never see a partial entry
+            tmp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(docs, f, default=str)
+            os.replace(tmp_path, entry_path)
+
+    def _store(self, kb_id: str, key: str, docs: list) -> None:
+        self._entries[(kb_id, key)] = docs
+        self._entries.move_to_end((kb_id, key))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, kb_id: str) -> None:
+        """
+        Drop every cached entry of a knowledge base, in memory and on disk.
+
+        Args:
+            kb_id (str): Knowledge base ID.
+        """
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == kb_id]:
+                del self._entries[entry_key]
+
+        if self.cache_dir and os.path.isdir(self._kb_dir(kb_id)):
+            shutil.rmtree(self._kb_dir(kb_id))
+
+    def sync_ingestion_job(self, kb_id: str, ingestion_job_id: str) -> bool:
+        """
+        Invalidate the cache of a knowledge base if a different ingestion job completed since it was filled.
+
+        Args:
+            kb_id (str): Knowledge base ID.
+            ingestion_job_id (str): ID of the latest completed ingestion job.
+
+        Returns:
+            bool: True if cached entries were invalidated.
+        """
+        if not self.cache_dir:
+            return False
+
+        marker_path = os.path.join(self._kb_dir(kb_id), self.INGESTION_MARKER_FILE)
+        cached_job_id = None
+        if os.path.exists(marker_path):
+            with open(marker_path, 'r', encoding='utf-8') as f:
+                cached_job_id = json.load(f).get("ingestion_job_id")
+
+        if cached_job_id == ingestion_job_id:
+            return False
+
+        self.invalidate(kb_id)
+        os.makedirs(self._kb_dir(kb_id), exist_ok=True)
+        with open(marker_path, 'w', encoding='utf-8') as f:
+            json.dump({"ingestion_job_id": ingestion_job_id}, f)
+        return True
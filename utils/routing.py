@@ -0,0 +1,110 @@
+"""
+Routes hybrid requests by knowledge base retrieval score, so low-relevance retrievals do not pay for a long context prompt
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.chunking import count_tokens
+
+
+ROUTES = ("no_context", "trimmed_context", "full_context")
+
+
+class ScoreRouter:
+    """
+    Decides per question how much of the retrieved context the finetuned model gets.
+
+    With the highest retrieval score of a question:
+        below no_context_threshold       "no_context", the finetuned model answers from its own knowledge
+        at least trim_threshold          "trimmed_context", only chunks scoring at least trim_threshold,
+                                         at most trimmed_max_chunks of them
+        otherwise                        "full_context", all retrieved chunks
+
+    Scores are the knowledge base "score" of every retrieval result, on the OpenSearch cosinesimil
+    scale (1 + cosine) / 2 for both the Bedrock and the local backend.
+    """
+
+    def __init__(self, no_context_threshold: float = 0.5, trim_threshold: float = 0.75, trimmed_max_chunks: int = 1):
+        """
+        Initialize the router.
+
+        Args:
+            no_context_threshold (float): Top score under which no context is sent.
+            trim_threshold (float): Top score from which the context is trimmed to the confident chunks.
+            trimmed_max_chunks (int): Maximum number of chunks of a trimmed context.
+        """
+        if no_context_threshold > trim_threshold:
+            raise ValueError("no_context_threshold must not be greater than trim_threshold")
+        self.no_context_threshold = no_context_threshold
+        self.trim_threshold = trim_threshold
+        self.trimmed_max_chunks = trimmed_max_chunks
+
+    def route(self, docs: List[dict]) -> Tuple[str, List[dict]]:
+        """
+        Choose the route of a question and the documents to build its context from.
+
+        Args:
+            docs (List[dict]): Retrieval results in the knowledge base "retrievalResults" format.
+
+        Returns:
+            Tuple[str, List[dict]]: One of ROUTES and the routed documents.
+        """
+        top_score = max((doc.get("score", 0.0) for doc in docs), default=None)
+        if top_score is None or top_score < self.no_context_threshold:
+            return "no_context", []
+        if top_score >= self.trim_threshold:
+            confident = sorted(
+                (doc for doc in docs if doc.get("score", 0.0) >= self.trim_threshold),
+                key=lambda doc: doc["score"],
+                reverse=True
+            )
+            return "trimmed_context", confident[:self.trimmed_max_chunks]
+        return "full_context", docs
+
+    @staticmethod
+    def context_tokens(docs: List[dict]) -> int:
+        """
+        Args:
+            docs (List[dict]): Retrieval results.
+
+        Returns:
+            int: Number of tokens of the chunk texts, counted like utils.chunking.
+        """
+        return sum(count_tokens(doc["content"]["text"]) for doc in docs)
+
+    @staticmethod
+    def summarize(records: List[dict]) -> dict:
+        """
+        Summarize the routing of an evaluation run and estimate the latency it saved.
+
+        The latency saved by a routed record is the mean inference time of the "full_context" records
+        minus its own inference time. The estimate is added to every record as "latency_saved" and is
+        None if no record took the full context route.
+
+        Args:
+            records (List[dict]): Result records with "route", "tokens_saved" and "inference_time".
+
+        Returns:
+            dict: Record count, mean inference time and tokens saved per route, and the total estimated
+            latency saved.
+        """
+        routed = [record for record in records if record.get("route") is not None]
+        full_times = [record["inference_time"] for record in routed if record["route"] == "full_context"]
+        full_mean = float(np.mean(full_times)) if full_times else None
+
+        summary = {"latency_saved": None}
+        for route in ROUTES:
+            route_records = [record for record in routed if record["route"] == route]
+            times = [record["inference_time"] for record in route_records]
+            summary[route] = {
+                "count": len(route_records),
+                "avg_inference_time": round(float(np.mean(times)), 3) if times else None,
+                "tokens_saved": sum(record["tokens_saved"] for record in route_records),
+            }
+
+        if full_mean is not None:
+            for record in routed:
+                record["latency_saved"] = full_mean - record["inference_time"] if record["route"] != "full_context" else 0.0
+            summary["latency_saved"] = round(sum(record["latency_saved"] for record in routed), 3)
+        return summary
@@ -0,0 +1,133 @@
+"""
+Bootstrap confidence intervals used to stop the evaluation once the ranking of the approaches is settled
+"""
+from itertools import combinations
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def bootstrap_mean_ci(values: np.ndarray, n_resamples: int = 2000, confidence: float = 0.95,
+                      rng: Optional[np.random.Generator] = None, max_block_elements: int = 1 << 22) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Percentile bootstrap confidence intervals of the column means of values.
+
+    Resamples are drawn as one index matrix per block and reduced with NumPy, memory is bounded by
+    max_block_elements resampled values at a time.
+
+    Args:
+        values (np.ndarray): Samples, shape (n,) or (n, k) for k statistics over the same samples.
+        n_resamples (int): Number of bootstrap resamples.
+        confidence (float): Two-sided confidence level of the intervals.
+        rng (np.random.Generator, optional): Random generator, for reproducible intervals.
+        max_block_elements (int): Maximum number of resampled values held in memory.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Lower and upper bounds, shape (k,), or scalars for 1-D values.
+    """
+    rng = rng or np.random.default_rng()
+    values = np.asarray(values, dtype=float)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+    n, k = values.shape
+    if n == 0:
+        raise ValueError("Cannot bootstrap an empty sample")
+
+    block_size = max(1, max_block_elements // (n * k))
+    means = np.empty((n_resamples, k))
+    for start in range(0, n_resamples, block_size):
+        stop = min(n_resamples, start + block_size)
+        indices = rng.integers(0, n, size=(stop - start, n))
+        means[start:stop] = values[indices].mean(axis=1)
+
+    alpha = 1.0 - confidence
+    lower, upper = np.quantile(means, [alpha / 2, 1 - alpha / 2], axis=0)
+    if squeeze:
+        return lower[0], upper[0]
+    return lower, upper
+
+
+def pairwise_difference_intervals(scores: Dict[str, np.ndarray], n_resamples: int = 2000, confidence: float = 0.95,
+                                  rng: Optional[np.random.Generator] = None) -> List[dict]:
+    """
+    Bootstrap intervals of the mean score difference of every pair of approaches.
+
+    The samples are paired (the same questions for every approach) and the confidence level is
+    Bonferroni corrected over the pairs, so all intervals hold together with probability confidence.
+
+    Args:
+        scores (Dict[str, np.ndarray]): Per-sample scores of every approach, aligned by sample.
+        n_resamples (int): Number of bootstrap resamples.
+        confidence (float): Family-wise confidence level.
+        rng (np.random.Generator, optional): Random generator.
+
+    Returns:
+        List[dict]: Per pair, "first", "second", the observed mean difference (first - second), its
+        interval and whether the interval excludes 0.
+    """
+    pairs = list(combinations(scores.keys(), 2))
+    differences = np.column_stack([np.asarray(scores[a], dtype=float) - np.asarray(scores[b], dtype=float) for a, b in pairs])
+    pair_confidence = 1.0 - (1.0 - confidence) / len(pairs)
+    lower, upper = bootstrap_mean_ci(differences, n_resamples, pair_confidence, rng)
+    mean = differences.mean(axis=0)
+
+    return [
+        {
+            'first': a,
+            'second': b,
+            'mean_difference': float(mean[i]),
+            'lower': float(lower[i]),
+            'upper': float(upper[i]),
+            'separated': bool(lower[i] > 0 or upper[i] < 0),
+        }
+        for i, (a, b) in enumerate(pairs)
+    ]
+
+
+SPENDING_FUNCTIONS = ("obrien_fleming", "uniform")
+
+
+def alpha_spending(information_fractions: Sequence[float], alpha: float = 0.05,
+                   spending: str = "obrien_fleming") -> List[float]:
+    """
+    Split the error rate alpha over the planned looks of a sequential test.
+
+    Every look gets the increment of a spending function at its information fraction (samples scored
+    over the sample budget). By the union bound the probability of a false decision at any look is at
+    most alpha, however often the data is looked at. "obrien_fleming" is the Lan-DeMets spending
+    function 2 - 2 * Phi(z_(alpha/2) / sqrt(t)), which spends little alpha on the first looks and
+    keeps most of it for the last. "uniform" gives every look alpha / len(information_fractions).
+
+    Args:
+        information_fractions (Sequence[float]): Increasing fractions in (0, 1] of the planned looks,
+            the last one is 1 when the sample budget is reached.
+        alpha (float): Family-wise error rate over all looks.
+        spending (str): One of SPENDING_FUNCTIONS.
+
+    Returns:
+        List[float]: Alpha of every look, summing to at most alpha.
+    """
+    if spending == "uniform":
+        return [alpha / len(information_fractions)] * len(information_fractions)
+    if spending != "obrien_fleming":
+        raise ValueError(f"Unknown spending function: {spending}")
+
+    normal = NormalDist()
+    z = normal.inv_cdf(1 - alpha / 2)
+    spent = [2 - 2 * normal.cdf(z / np.sqrt(min(1.0, t))) for t in information_fractions]
+    # The last look spends whatever is left, so the full alpha is used
+    spent[-1] = alpha if information_fractions[-1] >= 1 else spent[-1]
+    return [float(value) for value in np.diff(spent, prepend=0.0)]
+
+
+def ranking_settled(intervals: List[dict]) -> bool:
+    """
+    Args:
+        intervals (List[dict]): Output of pairwise_difference_intervals.
+
+    Returns:
+        bool: True if every pair of approaches is separated, i.e. the full ranking is significant.
+    """
+    return all(interval['separated'] for interval in intervals)